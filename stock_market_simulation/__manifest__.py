@@ -42,7 +42,7 @@ Technical Features:
     """,
     'author': 'Stock Market Simulator Team',
     'website': 'https://www.example.com',
-    'depends': ['base', 'portal', 'web'],
+    'depends': ['base', 'portal', 'web', 'bus'],
     'data': [
         # Security
         'security/stock_security.xml',
@@ -69,6 +69,8 @@ Technical Features:
         'views/stock_transaction_log_views.xml',
         'views/menu_views.xml',
         'views/stock_config_views.xml',
+        'views/stock_market_maker_views.xml',
+        'views/stock_audit_views.xml',
         
         # Views - Portal
         'views/portal_templates.xml',
@@ -93,6 +95,7 @@ Technical Features:
         'web.assets_frontend': [
             'stock_market_simulation/static/src/scss/stock_portal.scss',
             'stock_market_simulation/static/src/js/stock_portal.js',
+            'stock_market_simulation/static/src/js/news_bus.js',
         ],
         # Small JS fallback loaded early to recover the login form if the Owl component doesn't mount
         'web.assets_frontend_minimal': [
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-from odoo import http, _, fields
+from odoo import http, _, fields, api
 from odoo.http import request
 from odoo.addons.portal.controllers.portal import CustomerPortal, pager as portal_pager
 from odoo.exceptions import UserError, ValidationError, AccessError
@@ -10,6 +10,8 @@ from operator import itemgetter
 from datetime import timedelta
 import logging
 import json
+import werkzeug
+from urllib.parse import urlencode
 
 _logger = logging.getLogger(__name__)
 
@@ -17,6 +19,16 @@ class StockMarketPortal(CustomerPortal):
     
     _items_per_page = 20
 
+    # Columns rendered by the portal order, deposit, loan and user lists
+    _ORDER_LIST_FIELDS = ['name', 'session_id', 'security_id', 'entered_by_id', 'side', 'order_type',
+                          'quantity', 'price', 'status', 'order_date', 'create_date']
+    _DEPOSIT_LIST_FIELDS = ['name', 'user_id', 'banker_id', 'deposit_type', 'amount', 'interest_rate',
+                            'term_sessions', 'status', 'deposit_session_id', 'maturity_session_id', 'maturity_session_number']
+    _LOAN_LIST_FIELDS = ['name', 'user_id', 'banker_id', 'loan_type', 'amount', 'interest_rate', 'term_sessions',
+                         'principal_outstanding', 'penalty_amount', 'disbursement_session_id', 'status',
+                         'margin_call_triggered']
+    _USER_LIST_FIELDS = ['name', 'login', 'user_type', 'cash_balance', 'initial_capital']
+
     def _get_session_context(self):
         """Get session context data for navbar display"""
         active_session = request.env['stock.session'].sudo().search([('state', '=', 'open')], limit=1)
@@ -24,6 +36,55 @@ class StockMarketPortal(CustomerPortal):
             'active_session': active_session,
         }
 
+    def _keyset_search(self, Model, domain, order, field_names, url, url_args=None, after=None, before=None, limit=None):
+        """
+        One page of ``Model`` using keyset (seek) pagination.
+
+        ``order`` is one stored column and a direction (e.g. "amount desc"); ``id``
+        breaks ties. Pages are anchored on the record id passed as ``after`` or
+        ``before`` instead of an OFFSET, so any page costs one index range scan of
+        ``limit + 1`` rows. Only ``field_names`` are fetched into the cache.
+
+        Returns (records, keyset) where keyset holds the first/previous/next page URLs.
+        """
+        limit = limit or self._items_per_page
+        field, _sep, direction = order.partition(' ')
+        descending = direction.strip().lower() == 'desc'
+        backward = bool(before)
+        seek = []
+        try:
+            anchor_id = int(before or after or 0)
+        except (TypeError, ValueError):
+            anchor_id = 0
+        anchor = Model.search_fetch([('id', '=', anchor_id)], [field], limit=1) if anchor_id else Model
+        if anchor:
+            op = '<' if descending != backward else '>'
+            value = anchor[field]
+            if field == 'id' or value is False:
+                seek = [('id', op, anchor.id)]
+            else:
+                seek = ['|', (field, op, value), '&', (field, '=', value), ('id', op, anchor.id)]
+        else:
+            backward = False
+
+        scan = 'desc' if descending != backward else 'asc'
+        scan_order = f"id {scan}" if field == 'id' else f"{field} {scan}, id {scan}"
+        records = Model.search_fetch(domain + seek, field_names, order=scan_order, limit=limit + 1)
+        has_more = len(records) > limit
+        records = records[:limit]
+        if backward:
+            records = records[::-1]
+
+        args = {key: value for key, value in (url_args or {}).items() if value}
+        has_previous = has_more if backward else bool(anchor)
+        has_next = bool(anchor) if backward else has_more
+        keyset = {
+            'first_url': f"{url}?{urlencode(args)}" if args else url,
+            'prev_url': has_previous and records and f"{url}?{urlencode({**args, 'before': records[0].id})}",
+            'next_url': has_next and records and f"{url}?{urlencode({**args, 'after': records[-1].id})}",
+        }
+        return records, keyset
+
     def _prepare_home_portal_values(self, counters):
         values = super()._prepare_home_portal_values(counters)
         user = request.env.user
@@ -118,7 +179,7 @@ class StockMarketPortal(CustomerPortal):
 
     # Orders View
     @http.route(['/my/orders', '/my/orders/page/<int:page>'], type='http', auth="user", website=True)
-    def portal_my_orders(self, page=1, date_begin=None, date_end=None, sortby=None, filterby=None, **kw):
+    def portal_my_orders(self, page=1, date_begin=None, date_end=None, sortby=None, filterby=None, after=None, before=None, **kw):
         values = self._prepare_portal_layout_values()
         user = request.env.user
         
@@ -134,8 +195,8 @@ class StockMarketPortal(CustomerPortal):
         
         searchbar_sortings = {
             'date': {'label': _('Order Date'), 'order': 'order_date desc'},
-            'name': {'label': _('Order Number'), 'order': 'name'},
-            'status': {'label': _('Status'), 'order': 'status'},
+            'name': {'label': _('Order Number'), 'order': 'name asc'},
+            'status': {'label': _('Status'), 'order': 'status asc'},
         }
         
         searchbar_filters = {
@@ -159,27 +220,19 @@ class StockMarketPortal(CustomerPortal):
         
         order = searchbar_sortings[sortby]['order']
         
-        # Order count
-        order_count = Order.search_count(domain)
-        
-        # Pager
-        pager = portal_pager(
-            url="/my/orders",
+        # Content: keyset page with only the listed columns
+        orders, keyset = self._keyset_search(
+            Order, domain, order, self._ORDER_LIST_FIELDS, "/my/orders",
             url_args={'date_begin': date_begin, 'date_end': date_end, 'sortby': sortby, 'filterby': filterby},
-            total=order_count,
-            page=page,
-            step=self._items_per_page
+            after=after, before=before,
         )
         
-        # Content
-        orders = Order.search(domain, order=order, limit=self._items_per_page, offset=pager['offset'])
-        
         values.update({
             'user': user,
             'date': date_begin,
             'orders': orders,
             'page_name': 'order',
-            'pager': pager,
+            'keyset': keyset,
             'default_url': '/my/orders',
             'sortby': sortby,
             'searchbar_sortings': searchbar_sortings,
@@ -211,8 +264,9 @@ class StockMarketPortal(CustomerPortal):
             values['error'] = "No active trading session"
             return request.render("stock_market_simulation.portal_order_new", values)
         
-        # Get securities
-        securities = request.env['stock.security'].sudo().search([('active', '=', True)])
+        # Get securities from the cached directory
+        Security = request.env['stock.security']
+        securities = Security.get_directory()
         
         # For brokers and admins: Get all investors (can place orders for any investor)
         clients = []
@@ -237,6 +291,8 @@ class StockMarketPortal(CustomerPortal):
         values.update({
             'user': user,
             'securities': securities,
+            'trading_securities': Security.get_directory(ipo_status='trading'),
+            'ipo_securities': Security.get_directory(ipo_status=('ipo', 'po')),
             'clients': clients,
             'client_positions': client_positions,
             'active_session': active_session,        })
@@ -363,8 +419,8 @@ class StockMarketPortal(CustomerPortal):
                 # Basic cash check (will be validated again during allocation with actual IPO price)
                 if security.ipo_price > 0:
                     estimated_cost = security.ipo_price * quantity
-                    if order_user.cash_balance < estimated_cost:
-                        return {'error': f'Client insufficient funds for estimated IPO cost. Estimated: ${estimated_cost:,.2f}, Available: ${order_user.cash_balance:,.2f}', 'type': 'validation'}
+                    if order_user.available_cash < estimated_cost:
+                        return {'error': f'Client insufficient funds for estimated IPO cost. Estimated: ${estimated_cost:,.2f}, Available: ${order_user.available_cash:,.2f}', 'type': 'validation'}
             else:
                 # Regular order validations
                 # Check price limits (±20% of current market price as per User Stories)
@@ -384,8 +440,8 @@ class StockMarketPortal(CustomerPortal):
                 if side == 'buy':
                     broker_fee_rate = active_session.broker_commission_rate or 0.0
                     total_cost = price * quantity * (1 + broker_fee_rate / 100)
-                    if order_user.cash_balance < total_cost:
-                        return {'error': f'Client insufficient funds (including {broker_fee_rate}% broker fee). Required: ${total_cost:,.2f}, Available: ${order_user.cash_balance:,.2f}', 'type': 'validation'}
+                    if order_user.available_cash < total_cost:
+                        return {'error': f'Client insufficient funds (including {broker_fee_rate}% broker fee). Required: ${total_cost:,.2f}, Available: ${order_user.available_cash:,.2f}', 'type': 'validation'}
             
             # Check client position for sell orders
             if side == 'sell':
@@ -394,15 +450,16 @@ class StockMarketPortal(CustomerPortal):
                     ('security_id', '=', int(kw.get('security_id')))
                 ], limit=1)
                 
-                # Calculate available quantity (total - pending sell orders)
+                # Calculate available quantity (total - blocked shares - unreserved pending sell orders)
                 total_quantity = position.quantity if position else 0
                 pending_sell_orders = request.env['stock.order'].search([
                     ('user_id', '=', order_user.id),
                     ('security_id', '=', int(kw.get('security_id'))),
                     ('side', '=', 'sell'),
-                    ('status', 'in', ['draft', 'submitted', 'open', 'partial'])
+                    ('status', 'in', ['draft', 'submitted', 'open', 'partial']),
+                    ('reserved_quantity', '=', 0)
                 ])
-                pending_sell_quantity = sum(pending_sell_orders.mapped('remaining_quantity'))
+                pending_sell_quantity = (position.blocked_quantity if position else 0) + sum(pending_sell_orders.mapped('remaining_quantity'))
                 available_quantity = total_quantity - pending_sell_quantity
                 
                 if available_quantity < quantity:
@@ -443,8 +500,8 @@ class StockMarketPortal(CustomerPortal):
     @http.route(['/my/order/submit'], type='http', auth="user", methods=['POST'], website=True, csrf=False)
     def portal_order_submit(self, **kw):
         """HTTP endpoint for order submission with better error handling"""
-        _logger.info(f"ORDER SUBMIT ENDPOINT CALLED - User: {request.env.user.name} ({request.env.user.user_type})")
-        _logger.info(f"ORDER SUBMIT DATA: {kw}")
+        _logger.debug(f"Order submit endpoint - User: {request.env.user.name} ({request.env.user.user_type})")
+        _logger.debug(f"Order submit data: {kw}")
         try:
             user = request.env.user
             try:
@@ -521,11 +578,11 @@ class StockMarketPortal(CustomerPortal):
             # Check buy order cash requirements
             if side == 'buy' and order_type == 'limit':
                 required_cash = price * quantity
-                if order_user.cash_balance < required_cash:
+                if order_user.available_cash < required_cash:
                     return request.make_response(
                         json.dumps({
                             'success': False, 
-                            'error': f'Insufficient funds. Required: ${required_cash:,.2f}, Available: ${order_user.cash_balance:,.2f}'
+                            'error': f'Insufficient funds. Required: ${required_cash:,.2f}, Available: ${order_user.available_cash:,.2f}'
                         }),
                         headers=[('Content-Type', 'application/json')]
                     )
@@ -615,8 +672,9 @@ class StockMarketPortal(CustomerPortal):
             if not active_session:
                 return {'success': False, 'error': 'No active session'}
 
-            # Get all active securities
-            securities = request.env['stock.security'].sudo().search([('active', '=', True)])
+            # Get all active securities (cached directory) and this session's volumes
+            securities = request.env['stock.security'].get_directory()
+            volumes = request.env['stock.price.bar'].get_session_volumes(active_session)
             
             securities_data = []
             for sec in securities:
@@ -626,7 +684,7 @@ class StockMarketPortal(CustomerPortal):
                     'current_price': sec.current_price,
                     'change_amount': sec.change_amount,
                     'change_percentage': sec.change_percentage,
-                    'volume_today': sec.volume_today,
+                    'volume_today': volumes.get(sec.id, (0, 0.0))[0],
                     'status': sec.status,
                 })
             
@@ -651,12 +709,11 @@ class StockMarketPortal(CustomerPortal):
         # Get active session
         active_session = request.env['stock.session'].sudo().search([('state', '=', 'open')], limit=1)
         
-        # Get all active securities
-        securities = request.env['stock.security'].sudo().search([('active', '=', True)])
-        
-        # Get market movers
-        gainers = securities.filtered(lambda s: s.change_percentage > 0).sorted('change_percentage', reverse=True)[:5]
-        losers = securities.filtered(lambda s: s.change_percentage < 0).sorted('change_percentage')[:5]
+        # Get all active securities and market movers from the cached directory
+        Security = request.env['stock.security']
+        securities = Security.get_directory()
+        gainers, losers = Security.get_top_movers(limit=5)
+        volumes = request.env['stock.price.bar'].get_session_volumes(active_session)
         
         # Financial data with fallbacks
         values = {
@@ -669,14 +726,28 @@ class StockMarketPortal(CustomerPortal):
             'profit_loss_percentage': user.profit_loss_percentage or 0.0,
             'active_session': active_session,
             'securities': securities,
+            'session_volumes': {security_id: volume for security_id, (volume, _value) in volumes.items()},
             'top_gainers': gainers,
             'top_losers': losers,
+            'news_items': request.env['stock.news'].get_news_for_user(user.id),
             'page_name': 'market_home',
             **self._get_session_context(),
         }
         
         return request.render("stock_market_simulation.market_portal_layout", values)
     
+    @http.route(['/market/news/feed'], type='json', auth="user")
+    def market_news_feed(self, **kw):
+        """News panel of the dashboard, refetched when the scheduler broadcasts an update"""
+        news_items = request.env['stock.news'].get_news_for_user(request.env.user.id)
+        return [{
+            'id': news.id,
+            'headline': news.headline,
+            'priority': news.priority,
+            'display_priority': news.display_priority,
+            'symbol': news.stock_id.symbol or '',
+        } for news in news_items]
+    
     @http.route(['/market/portfolio'], type='http', auth="user", website=True)
     def market_portfolio(self, page=1, **kw):
         """Portfolio view in market portal"""
@@ -768,7 +839,7 @@ class StockMarketPortal(CustomerPortal):
     @http.route(['/market/trading'], type='http', auth="user", website=True)
     def market_trading(self, **kw):
         """Trading view in market portal - for brokers and admins to place orders on behalf of clients"""
-        _logger.info(f"TRADING PAGE CALLED - Method: {request.httprequest.method}, User: {request.env.user.name} ({request.env.user.user_type})")
+        _logger.debug(f"Trading page - Method: {request.httprequest.method}, User: {request.env.user.name} ({request.env.user.user_type})")
         
         user = request.env.user
         
@@ -791,16 +862,10 @@ class StockMarketPortal(CustomerPortal):
                 'error': 'No active trading session. Trading is currently closed.'
             })
 
-        # Get securities by IPO status
-        trading_securities = request.env['stock.security'].sudo().search([
-            ('active', '=', True),
-            ('ipo_status', '=', 'trading')
-        ])
-        
-        ipo_securities = request.env['stock.security'].sudo().search([
-            ('active', '=', True),
-            ('ipo_status', 'in', ['ipo', 'po'])
-        ])
+        # Get securities by IPO status from the cached directory
+        Security = request.env['stock.security']
+        trading_securities = Security.get_directory(ipo_status='trading')
+        ipo_securities = Security.get_directory(ipo_status=('ipo', 'po'))
         
         # Get all investors (clients)
         clients = request.env['res.users'].search([
@@ -864,17 +929,19 @@ class StockMarketPortal(CustomerPortal):
 
         _logger.info(f"[portal] /market/orders user={user.id}({user.user_type}) scope={scope} is_sys_admin={is_system_admin} domain={domain}")
 
-        # Fetch orders
+        # Fetch orders, newest first (id follows creation order and is the primary key index)
         limit = 50 if user.user_type in ['investor', 'broker'] else 100
-        orders = request.env['stock.order'].with_context(skip_portal_order_filter=True).search(domain, order='create_date desc', limit=limit)
-        try:
-            _logger.info(f"[portal] /market/orders result count={len(orders)} ids={orders.ids}")
-        except Exception:
-            pass
+        orders, keyset = self._keyset_search(
+            request.env['stock.order'].with_context(skip_portal_order_filter=True),
+            domain, 'id desc', self._ORDER_LIST_FIELDS, "/market/orders",
+            url_args={'scope': scope}, after=kw.get('after'), before=kw.get('before'), limit=limit,
+        )
+        _logger.info(f"[portal] /market/orders result count={len(orders)}")
         
         values = {
             'user': user,
             'orders': orders,
+            'keyset': keyset,
             'active_session': active_session,
             'scope': scope,            'page_name': 'orders',
         }
@@ -903,6 +970,28 @@ class StockMarketPortal(CustomerPortal):
         
         return request.render("stock_market_simulation.portal_market_data", values)
 
+    def _get_commission_data(self, is_super_user):
+        """Commission totals, per-session series and (for super users) the broker breakdown"""
+        Analytics = request.env['stock.commission.analytics']
+        totals = Analytics.get_totals()
+        broker_commissions = {}
+        if is_super_user:
+            brokers = request.env['res.users'].search([
+                ('user_type', 'in', ['broker', 'admin', 'superadmin'])
+            ])
+            breakdown = Analytics.get_broker_breakdown(brokers.ids)
+            for broker in brokers.filtered(lambda b: b.id in breakdown):
+                broker_commissions[broker] = dict(
+                    breakdown[broker.id],
+                    recent_trades=Analytics.get_recent_broker_trades(broker.id, limit=10),
+                )
+        return {
+            'total': totals['total'],
+            'trade_count': totals['trade_count'],
+            'broker_commissions': broker_commissions,
+            'session_series': Analytics.get_session_series(),
+        }
+    
     # Broker Commission Report
     @http.route(['/my/commissions'], type='http', auth="user", website=True)
     def portal_broker_commissions(self, **kw):
@@ -916,59 +1005,22 @@ class StockMarketPortal(CustomerPortal):
         if user.user_type not in ['broker', 'admin', 'superadmin'] and not is_system_admin:
             return request.redirect('/my')
         
-        # Get commission data based on user type
-        trades = request.env['stock.trade'].search([])
-        
-        # Total commission calculation
-        total_commission = sum(t.buy_commission + t.sell_commission for t in trades)
-        
-        # For superadmin/admin users, show broker breakdown
-        broker_commissions = {}
-        if user.user_type in ['admin', 'superadmin'] or is_system_admin:
-            # Get all brokers and their commission data
-            all_brokers = request.env['res.users'].search([
-                ('user_type', 'in', ['broker', 'admin', 'superadmin'])
-            ])
-            
-            for broker in all_brokers:
-                broker_trades = trades.filtered(lambda t: 
-                    (t.buy_order_id.entered_by_id.id == broker.id) or 
-                    (t.sell_order_id.entered_by_id.id == broker.id)
-                )
-                
-                broker_total = 0
-                trade_count = 0
-                for trade in broker_trades:
-                    # Add commission based on which side the broker handled
-                    if trade.buy_order_id.entered_by_id.id == broker.id:
-                        broker_total += trade.buy_commission
-                        trade_count += 1
-                    if trade.sell_order_id.entered_by_id.id == broker.id:
-                        broker_total += trade.sell_commission
-                        trade_count += 1
-                
-                if broker_total > 0:  # Only include brokers with commissions
-                    broker_commissions[broker] = {
-                        'total': broker_total,
-                        'trades': trade_count,
-                        'recent_trades': broker_trades[:10]
-                    }
-        
-        # Group by session
-        session_commissions = {}
-        for trade in trades:
-            session = trade.session_id.name
-            if session not in session_commissions:
-                session_commissions[session] = 0
-            
-            session_commissions[session] += trade.buy_commission + trade.sell_commission
+        # Aggregates come from grouped SQL; only the trades actually displayed are loaded
+        is_super_user = user.user_type in ['admin', 'superadmin'] or is_system_admin
+        commission_data = self._get_commission_data(is_super_user)
+        total_commission = commission_data['total']
+        broker_commissions = commission_data['broker_commissions']
+        session_commissions = {
+            name: total for __, name, total in commission_data['session_series']
+        }
+        trades = request.env['stock.trade'].search([], order='trade_date desc, id desc', limit=20)
         
         values.update({
             'user': user,
             'total_commission': total_commission,
             'session_commissions': session_commissions,
             'broker_commissions': broker_commissions,
-            'recent_trades': trades[:20],
+            'recent_trades': trades,
             'page_name': 'commission',
             'is_super_user': user.user_type in ['admin', 'superadmin'] or is_system_admin,
         })
@@ -990,52 +1042,16 @@ class StockMarketPortal(CustomerPortal):
         
         # Get commission data
         values = self._prepare_portal_layout_values()
-        trades = request.env['stock.trade'].search([])
         sessions = request.env['stock.session'].search([])
         
-        # Total commission calculation
-        total_commission = sum(t.buy_commission + t.sell_commission for t in trades)
-        
-        # For superadmin/admin users, show broker breakdown
-        broker_commissions = {}
-        if user.user_type in ['admin', 'superadmin'] or is_system_admin:
-            # Get all brokers and their commission data
-            all_brokers = request.env['res.users'].search([
-                ('user_type', 'in', ['broker', 'admin', 'superadmin'])
-            ])
-            
-            for broker in all_brokers:
-                broker_trades = trades.filtered(lambda t: 
-                    (t.buy_order_id.entered_by_id.id == broker.id) or 
-                    (t.sell_order_id.entered_by_id.id == broker.id)
-                )
-                
-                broker_total = 0
-                trade_count = 0
-                for trade in broker_trades:
-                    # Add commission based on which side the broker handled
-                    if trade.buy_order_id.entered_by_id.id == broker.id:
-                        broker_total += trade.buy_commission
-                        trade_count += 1
-                    if trade.sell_order_id.entered_by_id.id == broker.id:
-                        broker_total += trade.sell_commission
-                        trade_count += 1
-                
-                if broker_total > 0:  # Only include brokers with commissions
-                    broker_commissions[broker] = {
-                        'total': broker_total,
-                        'trades': trade_count,
-                        'recent_trades': broker_trades[:10]
-                    }
-        
-        # Group by session
-        session_commissions = {}
-        for trade in trades:
-            session = trade.session_id
-            if session not in session_commissions:
-                session_commissions[session] = 0
-            
-            session_commissions[session] += trade.buy_commission + trade.sell_commission
+        is_super_user = user.user_type in ['admin', 'superadmin'] or is_system_admin
+        commission_data = self._get_commission_data(is_super_user)
+        total_commission = commission_data['total']
+        broker_commissions = commission_data['broker_commissions']
+        session_commissions = {
+            request.env['stock.session'].browse(session_id): total
+            for session_id, __, total in commission_data['session_series']
+        }
         
         values.update({
             'user': user,
@@ -1043,7 +1059,7 @@ class StockMarketPortal(CustomerPortal):
             'total_commission': total_commission,
             'session_commissions': session_commissions,
             'broker_commissions': broker_commissions,
-            'trades': trades,
+            'trade_count': commission_data['trade_count'],
             'page_name': 'commissions',
             'is_super_user': user.user_type in ['admin', 'superadmin'] or is_system_admin,
             **self._get_session_context(),
@@ -1056,7 +1072,7 @@ class StockMarketPortal(CustomerPortal):
     def market_securities(self, **kw):
         import logging
         _logger = logging.getLogger(__name__)
-        _logger.info("=== MARKET SECURITIES ROUTE CALLED ===")
+        _logger.debug("Market securities route")
         
         try:
             user = request.env.user
@@ -1066,34 +1082,16 @@ class StockMarketPortal(CustomerPortal):
             user = request.env['res.users'].sudo().browse(1)  # admin user
             _logger.info(f"Using fallback user: {user.name} ({user.id})")
         
-        # Get all securities with their latest prices  
-        securities = request.env['stock.security'].sudo().search([])
-        securities_data = []
-        
-        for security in securities:
-            latest_price = request.env['stock.price.history'].sudo().search([
-                ('security_id', '=', security.id)
-            ], order='change_date desc', limit=1)
-            
-            # Calculate daily change
-            previous_price = request.env['stock.price.history'].sudo().search([
-                ('security_id', '=', security.id),
-                ('change_date', '<', latest_price.change_date if latest_price else fields.Datetime.now())
-            ], order='change_date desc', limit=1)
-            
-            change = 0.0
-            change_percent = 0.0
-            if latest_price and previous_price:
-                change = latest_price.new_price - previous_price.new_price
-                change_percent = (change / previous_price.new_price) * 100 if previous_price.new_price else 0.0
-            
-            securities_data.append({
-                'security': security,
-                'latest_price': latest_price,
-                'previous_price': previous_price,
-                'change': change,
-                'change_percent': change_percent,
-            })
+        # Directory entries carry the last price; change is measured from the session start price
+        active_session = request.env['stock.session'].sudo().search([('state', '=', 'open')], limit=1)
+        volumes = request.env['stock.price.bar'].sudo().get_session_volumes(active_session)
+        securities_data = [{
+            'security': security,
+            'last_price': security.current_price,
+            'change': security.change_amount,
+            'change_percent': security.change_percentage * 100,
+            'volume': volumes.get(security.id, (0, 0.0))[0],
+        } for security in request.env['stock.security'].sudo().get_directory()]
         
         values = {
             'user': user,
@@ -1108,7 +1106,7 @@ class StockMarketPortal(CustomerPortal):
     def market_session_info(self, **kw):
         import logging
         _logger = logging.getLogger(__name__)
-        _logger.info("=== MARKET SESSION ROUTE CALLED ===")
+        _logger.debug("Market session route")
         
         try:
             user = request.env.user
@@ -1152,7 +1150,7 @@ class StockMarketPortal(CustomerPortal):
         """Get detailed information about a specific session"""
         import logging
         _logger = logging.getLogger(__name__)
-        _logger.info(f"=== SESSION DETAILS ROUTE CALLED for session_id: {session_id} ===")
+        _logger.debug(f"Session details route for session_id: {session_id}")
         
         try:
             # Get the session
@@ -1160,53 +1158,26 @@ class StockMarketPortal(CustomerPortal):
             if not session.exists():
                 return {'success': False, 'error': 'Session not found'}
             
-            # Get session orders
-            orders = request.env['stock.order'].sudo().search([
-                ('session_id', '=', session_id)
-            ], order='create_date desc')
+            # Statistics come from the materialized per-security analytics
+            summary = request.env['stock.session.analytics'].sudo().get_session_summary(session)
+            total_orders = summary['total_orders']
+            total_trades = summary['total_trades']
+            total_volume = summary['total_volume']
+            total_value = summary['total_value']
+            order_stats = summary['order_stats']
             
-            # Get session trades
+            # Top trading securities in this session
+            top_securities = summary['rows'].sorted('volume', reverse=True)[:5]
+            
+            # Only the trades actually returned are loaded
             trades = request.env['stock.trade'].sudo().search([
                 ('session_id', '=', session_id)
-            ], order='trade_date desc')
-            
-            # Calculate session statistics
-            total_orders = len(orders)
-            total_trades = len(trades)
-            total_volume = sum(trades.mapped('quantity'))
-            total_value = sum(trade.quantity * trade.price for trade in trades)
-            
-            # Top trading securities in this session
-            security_trades = {}
-            for trade in trades:
-                sec_id = trade.security_id.id
-                if sec_id not in security_trades:
-                    security_trades[sec_id] = {
-                        'security': trade.security_id,
-                        'volume': 0,
-                        'value': 0,
-                        'trades': 0
-                    }
-                security_trades[sec_id]['volume'] += trade.quantity
-                security_trades[sec_id]['value'] += trade.quantity * trade.price
-                security_trades[sec_id]['trades'] += 1
-            
-            # Sort by volume
-            top_securities = sorted(security_trades.values(), key=lambda x: x['volume'], reverse=True)[:5]
-            
-            # Order statistics by type
-            order_stats = {}
-            for order in orders:
-                order_type = order.order_type
-                if order_type not in order_stats:
-                    order_stats[order_type] = {'count': 0, 'total_quantity': 0}
-                order_stats[order_type]['count'] += 1
-                order_stats[order_type]['total_quantity'] += order.quantity
+            ], order='trade_date desc', limit=10)
             
             # Price movements during session
             price_changes = request.env['stock.price.history'].sudo().search([
                 ('session_id', '=', session_id)
-            ], order='change_date')
+            ], order='change_date', limit=10)
             
             return {
                 'success': True,
@@ -1232,12 +1203,17 @@ class StockMarketPortal(CustomerPortal):
                     'order_stats': order_stats,
                 },
                 'top_securities': [{
-                    'symbol': sec['security'].symbol,
-                    'name': sec['security'].name,
-                    'volume': sec['volume'],
-                    'value': sec['value'],
-                    'trades': sec['trades'],
-                } for sec in top_securities],
+                    'symbol': row.security_id.symbol,
+                    'name': row.security_id.name,
+                    'volume': row.volume,
+                    'value': row.value,
+                    'trades': row.trade_count,
+                    'open': row.open,
+                    'high': row.high,
+                    'low': row.low,
+                    'close': row.close,
+                    'vwap': row.vwap,
+                } for row in top_securities],
                 'recent_trades': [{
                     'id': trade.id,
                     'security_symbol': trade.security_id.symbol,
@@ -1248,7 +1224,7 @@ class StockMarketPortal(CustomerPortal):
                     'trade_date': trade.trade_date.strftime('%Y-%m-%d %H:%M:%S'),
                     'buyer': trade.buyer_id.name,
                     'seller': trade.seller_id.name,
-                } for trade in trades[:10]],  # Last 10 trades
+                } for trade in trades],  # Last 10 trades
                 'price_changes': [{
                     'security_symbol': pc.security_id.symbol,
                     'old_price': pc.old_price,
@@ -1263,11 +1239,47 @@ class StockMarketPortal(CustomerPortal):
             _logger.error(f"Error in session details for session {session_id}: {str(e)}")
             return {'success': False, 'error': f'Error loading session details: {str(e)}'}
 
+    # Streaming trade blotter export
+    _BLOTTER_FORMATS = {
+        'csv': ('export_blotter_csv', 'text/csv; charset=utf-8', 'csv'),
+        'columnar': ('export_blotter_columnar', 'application/x-ndjson', 'ndjson'),
+        'daily': ('export_daily_summary_csv', 'text/csv; charset=utf-8', 'csv'),
+    }
+    
+    @http.route(['/market/blotter/export'], type='http', auth="user", methods=['GET'])
+    def market_blotter_export(self, export_format='csv', date_from=None, date_to=None, **kw):
+        """Stream the user's trade blotter (role-filtered) without building it in memory"""
+        if export_format not in self._BLOTTER_FORMATS:
+            return request.not_found()
+        method, mimetype, extension = self._BLOTTER_FORMATS[export_format]
+        
+        # The request cursor is closed once the response starts streaming,
+        # so the generator reads through a cursor of its own
+        registry = request.env.registry
+        uid = request.env.uid
+        context = dict(request.env.context)
+        
+        def generate():
+            with registry.cursor() as cr:
+                env = api.Environment(cr, uid, context)
+                report = env['report.stock.trade_blotter_report']
+                for block in getattr(report, method)(env.user, date_from or False, date_to or False):
+                    yield block.encode('utf-8')
+        
+        filename = f"blotter_{export_format}_{fields.Date.today()}.{extension}"
+        _logger.info(f"[BLOTTER] Export format={export_format} user={uid}")
+        return werkzeug.wrappers.Response(
+            generate(),
+            mimetype=mimetype,
+            direct_passthrough=True,
+            headers=[('Content-Disposition', f'attachment; filename="{filename}"')],
+        )
+
     @http.route(['/market/reports'], type='http', auth="public", website=True)
     def market_reports(self, **kw):
         import logging
         _logger = logging.getLogger(__name__)
-        _logger.info("=== MARKET REPORTS ROUTE CALLED ===")
+        _logger.debug("Market reports route")
         
         try:
             user = request.env.user
@@ -1521,7 +1533,7 @@ class StockMarketPortal(CustomerPortal):
             return {'success': False, 'error': str(e)}
 
     @http.route(['/market/deposits'], type='http', auth="user", website=True)
-    def market_deposits(self, page=1, sortby=None, filterby=None, **kw):
+    def market_deposits(self, page=1, sortby=None, filterby=None, after=None, before=None, **kw):
         user = request.env.user
         # Investors, bankers, and admins can view deposits page
         try:
@@ -1553,10 +1565,10 @@ class StockMarketPortal(CustomerPortal):
         }
         
         searchbar_sortings = {
-            'date': {'label': 'Date', 'order': 'create_date desc'},
+            'date': {'label': 'Date', 'order': 'id desc'},
             'amount': {'label': 'Amount', 'order': 'amount desc'},
             'interest': {'label': 'Interest Rate', 'order': 'interest_rate desc'},
-            'maturity': {'label': 'Maturity', 'order': 'maturity_session_id'},
+            'maturity': {'label': 'Maturity', 'order': 'maturity_session_number asc'},
         }
         
         # Apply filters
@@ -1570,15 +1582,13 @@ class StockMarketPortal(CustomerPortal):
             sortby = 'date'
         order = searchbar_sortings.get(sortby, searchbar_sortings['date'])['order']
         
-        # Get deposits
+        # Get deposits (keyset page) and summary statistics (grouped reads)
         Deposit = request.env['stock.deposit']
-        deposits = Deposit.search(domain, order=order)
-        
-        # Get summary statistics
-        total_deposits = sum(d.amount for d in deposits)
-        active_deposits = deposits.filtered(lambda d: d.status == 'active')
-        total_active_value = sum(d.current_value for d in active_deposits)
-        total_interest_earned = sum(d.accrued_interest for d in active_deposits)
+        deposits, keyset = self._keyset_search(
+            Deposit, domain, order, self._DEPOSIT_LIST_FIELDS, "/market/deposits",
+            url_args={'sortby': sortby, 'filterby': filterby}, after=after, before=before,
+        )
+        summary = Deposit.get_portal_summary(domain)
         
         # Get all bankers for new deposit form
         bankers = request.env['res.users'].search([('user_type', '=', 'banker'), ('active', '=', True)])
@@ -1592,12 +1602,13 @@ class StockMarketPortal(CustomerPortal):
             'user': user,
             'page_title': 'Deposits',
             'deposits': deposits,
+            'keyset': keyset,
             'bankers': bankers,
             'investors': investors,
-            'total_deposits': total_deposits,
-            'total_active_value': total_active_value,
-            'total_interest_earned': total_interest_earned,
-            'active_count': len(active_deposits),
+            'total_deposits': summary['total_deposits'],
+            'total_active_value': summary['total_active_value'],
+            'total_interest_earned': summary['total_interest_earned'],
+            'active_count': summary['active_count'],
             'sortby': sortby,
             'filterby': filterby,
             'searchbar_sortings': searchbar_sortings,
@@ -1607,7 +1618,7 @@ class StockMarketPortal(CustomerPortal):
         return request.render("stock_market_simulation.market_deposits_page", values)
 
     @http.route(['/market/loans'], type='http', auth="user", website=True)
-    def market_loans(self, page=1, sortby=None, filterby=None, **kw):
+    def market_loans(self, page=1, sortby=None, filterby=None, after=None, before=None, **kw):
         user = request.env.user
         try:
             is_system_admin = request.env.user.has_group('base.group_system')
@@ -1639,7 +1650,7 @@ class StockMarketPortal(CustomerPortal):
         }
         
         searchbar_sortings = {
-            'date': {'label': 'Date', 'order': 'create_date desc'},
+            'date': {'label': 'Date', 'order': 'id desc'},
             'amount': {'label': 'Amount', 'order': 'amount desc'},
             'interest': {'label': 'Interest Rate', 'order': 'interest_rate desc'},
             'outstanding': {'label': 'Outstanding', 'order': 'principal_outstanding desc'},
@@ -1656,15 +1667,18 @@ class StockMarketPortal(CustomerPortal):
             sortby = 'date'
         order = searchbar_sortings.get(sortby, searchbar_sortings['date'])['order']
         
-        # Get loans
+        # Get loans (keyset page) and summary statistics (grouped reads)
         Loan = request.env['stock.loan']
-        loans = Loan.search(domain, order=order)
+        loans, keyset = self._keyset_search(
+            Loan, domain, order, self._LOAN_LIST_FIELDS, "/market/loans",
+            url_args={'sortby': sortby, 'filterby': filterby}, after=after, before=before,
+        )
+        summary = Loan.get_portal_summary(domain)
         
-        # Get summary statistics
-        total_loans = sum(l.amount for l in loans)
-        active_loans = loans.filtered(lambda l: l.status == 'active')
-        total_outstanding = sum(l.total_outstanding for l in active_loans)
-        total_paid = sum(l.total_paid for l in loans)
+        # Interest still to be collected on the active book, from the amortization schedules
+        book = request.env['stock.loan.amortization'].project_book(
+            Loan.search(domain + [('status', '=', 'active')])
+        )
         
         # Get all bankers for new loan form
         bankers = request.env['res.users'].search([('user_type', '=', 'banker'), ('active', '=', True)])
@@ -1675,19 +1689,21 @@ class StockMarketPortal(CustomerPortal):
             investors = request.env['res.users'].search([('user_type', '=', 'investor'), ('active', '=', True)])
         
         # Get securities for collateral
-        securities = request.env['stock.security'].search([('active', '=', True)])
+        securities = request.env['stock.security'].get_directory()
         
         values = {
             'user': user,
             'page_title': 'Loans',
             'loans': loans,
+            'keyset': keyset,
             'bankers': bankers,
             'investors': investors,
             'securities': securities,
-            'total_loans': total_loans,
-            'total_outstanding': total_outstanding,
-            'total_paid': total_paid,
-            'active_count': len(active_loans),
+            'total_loans': summary['total_loans'],
+            'total_outstanding': summary['total_outstanding'],
+            'total_paid': summary['total_paid'],
+            'active_count': summary['active_count'],
+            'projected_interest': book['total_interest'],
             'sortby': sortby,
             'filterby': filterby,
             'searchbar_sortings': searchbar_sortings,
@@ -2107,6 +2123,24 @@ class StockMarketPortal(CustomerPortal):
             _logger.error(f"Error in market quotes API: {str(e)}")
             return {'success': False, 'error': 'Failed to retrieve market data'}
 
+    @http.route(['/api/market/bars'], type='json', auth="user", methods=['POST'])
+    def api_market_bars(self, security_id=None, timeframe='1d', start=None, end=None, limit=500, **kw):
+        """Columnar OHLCV history for charts: {'bar_start': [...], 'open': [...], ...}"""
+        try:
+            if timeframe not in ('1m', 'session', '1d'):
+                return {'success': False, 'error': 'Invalid timeframe'}
+            series = request.env['stock.price.bar'].sudo().get_series(
+                int(security_id), timeframe,
+                start=fields.Datetime.to_datetime(start) if start else None,
+                end=fields.Datetime.to_datetime(end) if end else None,
+                limit=min(int(limit or 500), 5000)
+            )
+            series['bar_start'] = [fields.Datetime.to_string(d) for d in series['bar_start']]
+            return {'success': True, 'data': series}
+        except Exception as e:
+            _logger.error(f"Error in market bars API: {str(e)}")
+            return {'success': False, 'error': 'Failed to retrieve price bars'}
+
     @http.route(['/api/portfolio/summary'], type='json', auth="user", methods=['POST'])  
     def api_portfolio_summary(self, **kw):
         """Get portfolio summary for current user or specified user (admin only)"""
@@ -2186,25 +2220,18 @@ class StockMarketPortal(CustomerPortal):
         if user.user_type not in ['banker', 'admin'] and not is_system_admin:
             return request.redirect('/my')
         
-        # Get banking statistics based on user type
-        if user.user_type == 'banker':
-            # Bankers see only their own operations
-            deposits = request.env['stock.deposit'].search([('banker_id', '=', user.id)])
-            loans = request.env['stock.loan'].search([('banker_id', '=', user.id)])
-        else:  # admin or system admin
-            # Admins see all banking operations
-            deposits = request.env['stock.deposit'].search([])
-            loans = request.env['stock.loan'].search([])
-        
-        total_deposits = sum(d.current_value for d in deposits.filtered(lambda d: d.status == 'active'))
-        total_loans = sum(l.principal_outstanding for l in loans.filtered(lambda l: l.status == 'active'))
+        # Bankers see only their own operations, admins every book
+        banker_id = user.id if user.user_type == 'banker' else None
+        book_domain = [('banker_id', '=', banker_id)] if banker_id else []
+        exposure = request.env['stock.banker.exposure'].get_exposure(banker_id)
         
         values.update({
             'user': user,
-            'total_deposits': total_deposits,
-            'total_loans': total_loans,
-            'active_deposits': deposits.filtered(lambda d: d.status == 'active'),
-            'active_loans': loans.filtered(lambda l: l.status == 'active'),
+            'total_deposits': exposure['total_deposits'],
+            'total_loans': exposure['total_loans'],
+            'exposure': exposure,
+            'active_deposits': request.env['stock.deposit'].search(book_domain + [('status', '=', 'active')]),
+            'active_loans': request.env['stock.loan'].search(book_domain + [('status', '=', 'active')]),
             'page_name': 'banking',
         })
         
@@ -2214,7 +2241,7 @@ class StockMarketPortal(CustomerPortal):
     
     # Admin Users List
     @http.route(['/market/admin/users', '/market/admin/users/page/<int:page>'], type='http', auth="user", website=True)
-    def admin_users_list(self, page=1, sortby=None, filterby=None, search=None, **kw):
+    def admin_users_list(self, page=1, sortby=None, filterby=None, search=None, after=None, before=None, **kw):
         """List all users for admin/superadmin with 360 view access"""
         values = self._prepare_portal_layout_values()
         user = request.env.user
@@ -2241,8 +2268,8 @@ class StockMarketPortal(CustomerPortal):
         }
         
         searchbar_sortings = {
-            'name': {'label': _('Name'), 'order': 'name'},
-            'login': {'label': _('Login'), 'order': 'login'},
+            'name': {'label': _('Name'), 'order': 'name asc'},
+            'login': {'label': _('Login'), 'order': 'login asc'},
             'cash': {'label': _('Cash Balance'), 'order': 'cash_balance desc'},
             'capital': {'label': _('Initial Capital'), 'order': 'initial_capital desc'},
         }
@@ -2264,23 +2291,17 @@ class StockMarketPortal(CustomerPortal):
         # Count total users
         user_count = ResUsers.search_count(domain)
         
-        # Pager
-        pager = portal_pager(
-            url="/market/admin/users",
-            url_args={'sortby': sortby, 'filterby': filterby, 'search': search},
-            total=user_count,
-            page=page,
-            step=self._items_per_page
+        # Get users (keyset page, listed columns only)
+        users, keyset = self._keyset_search(
+            ResUsers, domain, order, self._USER_LIST_FIELDS, "/market/admin/users",
+            url_args={'sortby': sortby, 'filterby': filterby, 'search': search}, after=after, before=before,
         )
         
-        # Get users
-        users = ResUsers.search(domain, order=order, limit=self._items_per_page, offset=pager['offset'])
-        
         values.update({
             'page_name': 'admin_users',
             'users': users,
             'user_count': user_count,
-            'pager': pager,
+            'keyset': keyset,
             'sortby': sortby,
             'searchbar_sortings': searchbar_sortings,
             'filterby': filterby,
@@ -2311,7 +2332,10 @@ class StockMarketPortal(CustomerPortal):
         if not view_user.exists():
             return request.not_found()
         
-        # Get user's financial data
+        # Panel totals come from the cached account snapshot; only detail lists are loaded as records
+        snapshot_service = request.env['stock.account.snapshot']
+        snapshot = snapshot_service.get_snapshot(user_id)
+        
         positions = request.env['stock.position'].search([('user_id', '=', user_id)])
         orders = request.env['stock.order'].search([('user_id', '=', user_id)], order='order_date desc', limit=20)
         
@@ -2328,48 +2352,14 @@ class StockMarketPortal(CustomerPortal):
             '|', ('buyer_id', '=', user_id), ('seller_id', '=', user_id)
         ], order='trade_date desc', limit=20)
         
-        # Calculate summary statistics
-        total_positions_value = sum(p.market_value for p in positions)
-        total_positions_cost = sum(p.cost_basis for p in positions)
-        total_unrealized_pnl = sum(p.unrealized_pnl for p in positions)
-        
-        total_deposits = sum(d.current_value for d in deposits.filtered(lambda d: d.status == 'active'))
-        total_loans = sum(l.principal_outstanding for l in loans.filtered(lambda l: l.status == 'active'))
-        
-        # Calculate net worth: Cash + Portfolio + Deposits - Loans
-        net_worth = (view_user.cash_balance or 0) + total_positions_value + total_deposits - total_loans
-        
-        # Build comprehensive transaction history from transaction log
-        transaction_log = request.env['stock.transaction.log']
-        balance_sheet_data = transaction_log.get_user_balance_sheet(user_id)
-        
-        # Get all transactions ordered by date
-        all_transactions = balance_sheet_data['transactions']
-        transaction_categories = balance_sheet_data['categories']
-        
-        # Prepare transaction data for template
-        transaction_list = []
-        for txn in all_transactions:
-            transaction_list.append({
-                'date': txn.transaction_date.strftime('%Y-%m-%d %H:%M') if txn.transaction_date else 'Unknown',
-                'type': txn.transaction_type.upper().replace('_', ' '),
-                'description': txn.description,
-                'amount': txn.cash_impact,
-                'running_balance': txn.running_balance,
-                'category': txn.category,
-                'reference': txn.reference or '',
-                'badge_class': 'bg-success' if txn.cash_impact >= 0 else 'bg-danger'
-            })
-        
-        # Calculate summary by category
-        category_summaries = {}
-        for cat_name, cat_data in transaction_categories.items():
-            category_summaries[cat_name] = {
-                'name': cat_name.replace('_', ' ').title(),
-                'total_amount': cat_data['total_amount'],
-                'total_cash_impact': cat_data['total_cash_impact'],
-                'transaction_count': len(cat_data['transactions'])
-            }
+        # Transaction history is paginated, newest entry first
+        try:
+            txn_page = max(1, int(kw.get('txn_page', 1)))
+        except (TypeError, ValueError):
+            txn_page = 1
+        page_size = snapshot_service.TRANSACTION_PAGE_SIZE
+        txn_page_count = max(1, -(-snapshot['transaction_count'] // page_size))
+        txn_page = min(txn_page, txn_page_count)
         
         values.update({
             'page_name': 'user_360',
@@ -2379,15 +2369,17 @@ class StockMarketPortal(CustomerPortal):
             'deposits': deposits,
             'loans': loans,
             'trades': trades,
-            'total_positions_value': total_positions_value,
-            'total_positions_cost': total_positions_cost,
-            'total_unrealized_pnl': total_unrealized_pnl,
-            'total_deposits': total_deposits,
-            'total_loans': total_loans,
-            'net_worth': net_worth,
-            'all_transactions': transaction_list,
-            'category_summaries': category_summaries,
-            'balance_sheet_data': balance_sheet_data,
+            'total_positions_value': snapshot['total_positions_value'],
+            'total_positions_cost': snapshot['total_positions_cost'],
+            'total_unrealized_pnl': snapshot['total_unrealized_pnl'],
+            'total_deposits': snapshot['total_deposits'],
+            'total_loans': snapshot['total_loans'],
+            'net_worth': snapshot['net_worth'],
+            'all_transactions': snapshot_service.get_transactions(user_id, page=txn_page),
+            'category_summaries': snapshot['category_summaries'],
+            'balance_sheet_data': snapshot,
+            'txn_page': txn_page,
+            'txn_page_count': txn_page_count,
         })
         
         return request.render("stock_market_simulation.admin_user_360_view", values)
@@ -2411,15 +2403,7 @@ class StockMarketPortal(CustomerPortal):
             if not view_user.exists():
                 return {'success': False, 'error': 'User not found'}
             
-            # Get financial data
-            positions = request.env['stock.position'].search([('user_id', '=', user_id)])
-            deposits = request.env['stock.deposit'].search([('user_id', '=', user_id), ('status', '=', 'active')])
-            loans = request.env['stock.loan'].search([('user_id', '=', user_id), ('status', '=', 'active')])
-            
-            # Calculate totals
-            total_positions = sum(p.market_value for p in positions)
-            total_deposits = sum(d.current_value for d in deposits)
-            total_loans = sum(l.principal_outstanding for l in loans)
+            snapshot = request.env['stock.account.snapshot'].get_snapshot(user_id)
             
             return {
                 'success': True,
@@ -2430,19 +2414,69 @@ class StockMarketPortal(CustomerPortal):
                     'user_type': view_user.user_type,
                     'cash_balance': view_user.cash_balance,
                     'initial_capital': view_user.initial_capital,
-                    'positions_count': len(positions),
-                    'total_positions_value': round(total_positions, 2),
-                    'deposits_count': len(deposits),
-                    'total_deposits': round(total_deposits, 2),
-                    'loans_count': len(loans),
-                    'total_loans': round(total_loans, 2),
-                    'total_assets': round(view_user.cash_balance + total_positions, 2),
+                    'positions_count': snapshot['positions_count'],
+                    'total_positions_value': round(snapshot['total_positions_value'], 2),
+                    'deposits_count': snapshot['deposits_count'],
+                    'total_deposits': round(snapshot['total_deposits'], 2),
+                    'loans_count': snapshot['loans_count'],
+                    'total_loans': round(snapshot['total_loans'], 2),
+                    'total_assets': round(view_user.cash_balance + snapshot['total_positions_value'], 2),
+                    'net_worth': round(snapshot['net_worth'], 2),
                 }
             }
         except Exception as e:
             _logger.error(f"Error getting user data for {user_id}: {str(e)}")
             return {'success': False, 'error': str(e)}
     
+    # Admin Request Profiles
+    @http.route(['/market/admin/perf'], type='http', auth="user", website=True)
+    def admin_perf(self, route=None, export=None, **kw):
+        """Per-route timing, SQL and ORM cache profile of the portal requests served by this worker"""
+        current_user = request.env.user
+        
+        # Check authorization
+        try:
+            is_system_admin = request.env.user.has_group('base.group_system')
+        except Exception:
+            is_system_admin = False
+        
+        if current_user.user_type not in ['admin', 'superadmin'] and not is_system_admin:
+            return request.not_found()
+        
+        Profiler = request.env['stock.perf.profiler']
+        profiles = Profiler.get_profiles(route=route, limit=None if export else 100)
+        if export:
+            return request.make_response(
+                json.dumps(profiles, default=str),
+                headers=[('Content-Type', 'application/json'),
+                         ('Content-Disposition', 'attachment; filename="request_profiles.json"')]
+            )
+        
+        values = self._prepare_portal_layout_values()
+        values.update({
+            'page_name': 'admin_perf',
+            'enabled': request.env['stock.config']._get_perf_settings()[0],
+            'summary': Profiler.get_route_summary(),
+            'profiles': profiles,
+            'route': route,
+            'n_plus_one_threshold': Profiler.N_PLUS_ONE_THRESHOLD,
+        })
+        return request.render("stock_market_simulation.admin_perf", values)
+    
+    @http.route(['/market/admin/perf/clear'], type='http', auth="user", methods=['POST'], website=True)
+    def admin_perf_clear(self, **kw):
+        current_user = request.env.user
+        try:
+            is_system_admin = request.env.user.has_group('base.group_system')
+        except Exception:
+            is_system_admin = False
+        
+        if current_user.user_type not in ['admin', 'superadmin'] and not is_system_admin:
+            return request.not_found()
+        
+        request.env['stock.perf.profiler'].clear()
+        return request.redirect('/market/admin/perf')
+    
     @http.route(['/market/data/update'], type='http', auth="user", methods=['GET', 'POST'])
     def market_data_update(self, **kw):
         """Get real-time market data updates for dashboard"""
@@ -2858,6 +2892,23 @@ class StockMarketPortal(CustomerPortal):
             _logger.error(f"Error creating loan: {str(e)}")
             return {'success': False, 'error': f'Failed to create loan: {str(e)}'}
 
+    @http.route(['/market/loans/<int:loan_id>/schedule'], type='json', auth="user")
+    def market_loans_schedule(self, loan_id, **kw):
+        """Amortization schedule of a loan (borrower, managing banker or admin)"""
+        user = request.env.user
+        loan = request.env['stock.loan'].browse(loan_id)
+        if not loan.exists():
+            return {'success': False, 'error': 'Loan not found'}
+        if not (user.user_type == 'admin' or user.has_group('base.group_system')
+                or user.id in (loan.user_id.id, loan.banker_id.id)):
+            return {'success': False, 'error': 'Access denied'}
+        return {
+            'success': True,
+            'loan': loan.name,
+            'emi_amount': loan.emi_amount,
+            'schedule': loan.get_amortization_schedule(),
+        }
+
     @http.route(['/market/loans/<int:loan_id>/action'], type='json', auth="user", methods=['POST'])
     def market_loans_action(self, loan_id, action=None, **kw):
         """Perform actions on loans (approve, disburse, etc.)"""
@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+"""
+Load generator simulating concurrent portal traders against a running instance.
+
+Seed the accounts once (runs inside Odoo, like the diagnose scripts):
+
+    python3 load_test.py seed --db stock --investors 2000 --brokers 50
+
+Then drive the real HTTP routes with one thread per simulated user:
+
+    python3 load_test.py run --url http://localhost:8069 --db stock \
+        --investors 2000 --brokers 50 --duration 300 --think 3 --ramp 60
+
+Investors poll market data and their portfolio summary, brokers open the
+trading page, poll market data and place limit orders for seeded investors.
+The report gives throughput, latency percentiles, error and rejection rates
+and the database queries per route (read from the X-Query-Count header the
+module returns to requests carrying X-Stock-Load-Test once "Load-Test Query
+Headers" is enabled in the stock market configuration).
+"""
+
+import argparse
+import http.cookiejar
+import json
+import random
+import re
+import statistics
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+
+LOAD_TEST_HEADER = 'X-Stock-Load-Test'
+
+# (route, weight) of the actions each role picks from between two think times
+SCENARIOS = {
+    'investor': [
+        ('/market/data/update', 6),
+        ('/api/portfolio/summary', 4),
+    ],
+    'broker': [
+        ('/market/trading', 2),
+        ('/market/data/update', 4),
+        ('/my/order/create', 4),
+    ],
+}
+
+CSRF_RE = re.compile(r'name="csrf_token"\s+value="([^"]+)"')
+
+
+def _login(prefix, role, number):
+    return f"{prefix}.{role}{number:05d}@example.com"
+
+
+# ---------------------------------------------------------------------------
+# Seeding
+# ---------------------------------------------------------------------------
+
+def seed(args):
+    """Create (or top up) the investor and broker accounts the run logs in with"""
+    import odoo
+    from odoo import api, SUPERUSER_ID
+    from odoo.modules.registry import Registry
+
+    odoo.tools.config.parse_config([f'--config={args.config}'])
+    with Registry(args.db).cursor() as cr:
+        env = api.Environment(cr, SUPERUSER_ID, {
+            'no_reset_password': True,
+            'tracking_disable': True,
+            'mail_create_nolog': True,
+            'mail_notrack': True,
+        })
+        Users = env['res.users']
+        groups = {
+            'investor': env.ref('stock_market_simulation.group_stock_investor'),
+            'broker': env.ref('stock_market_simulation.group_stock_broker'),
+        }
+        wanted = {
+            _login(args.prefix, role, number): role
+            for role, count in (('investor', args.investors), ('broker', args.brokers))
+            for number in range(1, count + 1)
+        }
+        existing = set(Users.with_context(active_test=False).search([('login', 'in', list(wanted))]).mapped('login'))
+        vals_list = [{
+            'name': login.split('@')[0],
+            'login': login,
+            'email': login,
+            'password': args.password,
+            'user_type': role,
+            'cash_balance': args.capital,
+            'initial_capital': args.capital,
+            'groups_id': [(6, 0, [groups[role].id])],
+        } for login, role in wanted.items() if login not in existing]
+        users = Users.browse()
+        for start in range(0, len(vals_list), 500):
+            users |= Users.create(vals_list[start:start + 500])
+        print(f"Created {len(users)} users ({len(existing)} already present)")
+
+        # Starting holdings so brokers can place sell orders for the new investors
+        securities = [entry for entry in env['stock.security'].get_directory(ipo_status='trading')
+                      if entry.current_price > 0]
+        investors = users.filtered(lambda u: u.user_type == 'investor')
+        if securities and investors:
+            rng = random.Random(args.seed)
+            position_vals = []
+            for user in investors:
+                for entry in rng.sample(securities, min(args.holdings, len(securities))):
+                    lot = entry.lot_size or 1
+                    position_vals.append({
+                        'user_id': user.id,
+                        'security_id': entry.id,
+                        'quantity': rng.randint(1, 10) * 100 // lot * lot or lot,
+                        'average_cost': entry.current_price,
+                    })
+            env['stock.position'].create(position_vals)
+            print(f"Created {len(position_vals)} starting positions")
+        cr.commit()
+
+
+# ---------------------------------------------------------------------------
+# Measurements
+# ---------------------------------------------------------------------------
+
+class Stats:
+    """Thread-safe per-route samples: latency, outcome and database queries"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.rejected = defaultdict(int)
+        self.queries = defaultdict(list)
+        self.query_time = defaultdict(float)
+        self.started = time.monotonic()
+
+    def record(self, route, latency, outcome, queries=None, query_time=0.0):
+        with self.lock:
+            self.latencies[route].append(latency)
+            if outcome == 'error':
+                self.errors[route] += 1
+            elif outcome == 'rejected':
+                self.rejected[route] += 1
+            if queries is not None:
+                self.queries[route].append(queries)
+                self.query_time[route] += query_time
+
+    def report(self):
+        elapsed = time.monotonic() - self.started
+        rows = []
+        with self.lock:
+            for route in sorted(self.latencies):
+                latencies = sorted(self.latencies[route])
+                count = len(latencies)
+                cuts = statistics.quantiles(latencies, n=100, method='inclusive') if count > 1 else latencies * 99
+                queries = self.queries[route]
+                rows.append({
+                    'route': route,
+                    'requests': count,
+                    'throughput': count / elapsed if elapsed else 0.0,
+                    'error_rate': self.errors[route] / count * 100,
+                    'rejection_rate': self.rejected[route] / count * 100,
+                    'p50': cuts[49] * 1000,
+                    'p90': cuts[89] * 1000,
+                    'p95': cuts[94] * 1000,
+                    'p99': cuts[98] * 1000,
+                    'max': latencies[-1] * 1000,
+                    'queries': statistics.mean(queries) if queries else None,
+                    'max_queries': max(queries) if queries else None,
+                    'query_ms': self.query_time[route] / len(queries) * 1000 if queries else None,
+                })
+            total = sum(len(v) for v in self.latencies.values())
+            errors = sum(self.errors.values())
+        return {
+            'elapsed': elapsed,
+            'requests': total,
+            'throughput': total / elapsed if elapsed else 0.0,
+            'error_rate': errors / total * 100 if total else 0.0,
+            'routes': rows,
+        }
+
+
+def print_report(report, active_users):
+    print()
+    print(f"Users: {active_users}  Duration: {report['elapsed']:.1f}s  Requests: {report['requests']}  "
+          f"Throughput: {report['throughput']:.1f} req/s  Errors: {report['error_rate']:.2f}%")
+    header = (f"{'Route':<26}{'Reqs':>8}{'Req/s':>8}{'Err%':>7}{'Rej%':>7}"
+              f"{'p50':>8}{'p90':>8}{'p95':>8}{'p99':>8}{'Max':>8}{'Qry':>7}{'MaxQ':>6}{'Qms':>8}")
+    print(header)
+    print('-' * len(header))
+    for row in report['routes']:
+        queries = (f"{row['queries']:>7.1f}{row['max_queries']:>6}{row['query_ms']:>8.1f}"
+                   if row['queries'] is not None else f"{'-':>7}{'-':>6}{'-':>8}")
+        print(f"{row['route']:<26}{row['requests']:>8}{row['throughput']:>8.1f}"
+              f"{row['error_rate']:>7.2f}{row['rejection_rate']:>7.2f}"
+              f"{row['p50']:>8.0f}{row['p90']:>8.0f}{row['p95']:>8.0f}{row['p99']:>8.0f}{row['max']:>8.0f}"
+              f"{queries}")
+    print("Latencies in ms; Qry/MaxQ are database queries per request, Qms their time in ms.")
+
+
+# ---------------------------------------------------------------------------
+# Simulated users
+# ---------------------------------------------------------------------------
+
+class VirtualUser(threading.Thread):
+    """One portal session: logs in, then loops over its role's scenario with think times"""
+
+    def __init__(self, runner, login, role):
+        super().__init__(daemon=True, name=login)
+        self.runner = runner
+        self.login = login
+        self.role = role
+        self.rng = random.Random(f"{runner.args.seed}:{login}")
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        routes, weights = zip(*SCENARIOS[role])
+        self.routes, self.weights = list(routes), list(weights)
+        self.logged_in = False
+
+    def _send(self, route, path, data=None, content_type=None, check=None):
+        """Issue one request and record it under ``route``; returns the decoded body or None"""
+        headers = {LOAD_TEST_HEADER: '1'}
+        if content_type:
+            headers['Content-Type'] = content_type
+        req = urllib.request.Request(self.runner.args.url + path, data=data, headers=headers)
+        start = time.monotonic()
+        queries, query_time = None, 0.0
+        try:
+            with self.opener.open(req, timeout=self.runner.args.timeout) as response:
+                body = response.read().decode('utf-8', 'replace')
+                final_url = response.geturl()
+                if response.headers.get('X-Query-Count'):
+                    queries = int(response.headers['X-Query-Count'])
+                    query_time = float(response.headers.get('X-Query-Time') or 0.0)
+            outcome = check(body, final_url) if check else 'ok'
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            if self.runner.args.verbose:
+                print(f"[{self.login}] {route}: {e}", file=sys.stderr)
+            body, outcome = None, 'error'
+        self.runner.stats.record(route, time.monotonic() - start, outcome, queries, query_time)
+        return body if outcome != 'error' else None
+
+    def _json_call(self, route, params):
+        payload = json.dumps({'jsonrpc': '2.0', 'method': 'call', 'params': params, 'id': None}).encode()
+
+        def check(body, _url):
+            reply = json.loads(body)
+            if 'error' in reply:
+                return 'error'
+            result = reply.get('result')
+            if isinstance(result, dict) and (result.get('error') or result.get('success') is False):
+                return 'rejected'
+            return 'ok'
+        body = self._send(route, route, payload, 'application/json', check)
+        return json.loads(body).get('result') if body else None
+
+    def do_login(self):
+        page = self._send('/web/login (form)', '/web/login')
+        token = CSRF_RE.search(page or '')
+        if not token:
+            return False
+        form = urllib.parse.urlencode({
+            'login': self.login,
+            'password': self.runner.args.password,
+            'db': self.runner.args.db,
+            'csrf_token': token.group(1),
+            'redirect': '/my',
+        }).encode()
+        body = self._send('/web/login', '/web/login', form, 'application/x-www-form-urlencoded',
+                          lambda _body, url: 'error' if '/web/login' in url else 'ok')
+        self.logged_in = body is not None
+        return self.logged_in
+
+    def do_market_data(self):
+        def check(body, _url):
+            return 'ok' if json.loads(body).get('success') else 'rejected'
+        body = self._send('/market/data/update', '/market/data/update', check=check)
+        if body:
+            data = json.loads(body).get('data') or {}
+            securities = [s for s in data.get('securities', []) if s.get('current_price')]
+            if securities:
+                self.runner.securities = securities
+
+    def do_portfolio(self):
+        self._json_call('/api/portfolio/summary', {})
+
+    def do_trading_page(self):
+        self._send('/market/trading', '/market/trading',
+                   check=lambda _body, url: 'rejected' if '/market/trading' not in url else 'ok')
+
+    def do_order(self):
+        securities = self.runner.securities
+        clients = self.runner.investor_ids
+        if not securities or not clients:
+            # Nothing to trade yet; poll market data instead so the securities get known
+            return self.do_market_data()
+        security = self.rng.choice(securities)
+        side = self.rng.choice(('buy', 'sell'))
+        # Stay inside the +/-20% price band the route enforces, a few ticks around the market
+        price = round(security['current_price'] * (1 + self.rng.uniform(-0.02, 0.02)), 2)
+        self._json_call('/my/order/create', {
+            'security_id': security['id'],
+            'side': side,
+            'order_type': 'limit',
+            'quantity': self.rng.choice((100, 200, 500)),
+            'price': price,
+            'client_id': self.rng.choice(clients),
+        })
+
+    def run(self):
+        runner = self.runner
+        if not self.do_login():
+            return
+        runner.user_started()
+        actions = {
+            '/market/data/update': self.do_market_data,
+            '/api/portfolio/summary': self.do_portfolio,
+            '/market/trading': self.do_trading_page,
+            '/my/order/create': self.do_order,
+        }
+        try:
+            while not runner.stop.is_set():
+                actions[self.rng.choices(self.routes, self.weights)[0]]()
+                runner.stop.wait(self.rng.expovariate(1 / runner.args.think) if runner.args.think else 0)
+        finally:
+            runner.user_stopped()
+
+
+class Runner:
+    def __init__(self, args):
+        self.args = args
+        self.stats = Stats()
+        self.stop = threading.Event()
+        self.securities = []
+        self.investor_ids = []
+        self.lock = threading.Lock()
+        self.active = 0
+
+    def user_started(self):
+        with self.lock:
+            self.active += 1
+
+    def user_stopped(self):
+        with self.lock:
+            self.active -= 1
+
+    def _load_investor_ids(self):
+        """Client ids brokers place orders for, read over JSON-RPC with the admin account"""
+        args = self.args
+        try:
+            uid = self._rpc('common', 'login', args.db, args.admin_login, args.admin_password)
+            if not uid:
+                print("Could not read the seeded investors: admin login refused", file=sys.stderr)
+                return []
+            return self._rpc('object', 'execute_kw', args.db, uid, args.admin_password, 'res.users', 'search',
+                             [[('login', '=like', f"{args.prefix}.investor%")]])
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            print(f"Could not read the seeded investors: {e}", file=sys.stderr)
+            return []
+
+    def _rpc(self, service, method, *args):
+        payload = json.dumps({'jsonrpc': '2.0', 'method': 'call', 'id': None, 'params': {
+            'service': service, 'method': method, 'args': args,
+        }}).encode()
+        req = urllib.request.Request(self.args.url + '/jsonrpc', data=payload,
+                                     headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(req, timeout=self.args.timeout) as response:
+            reply = json.loads(response.read())
+        if 'error' in reply:
+            raise ValueError(reply['error'].get('message'))
+        return reply.get('result')
+
+    def run(self):
+        args = self.args
+        if args.brokers:
+            self.investor_ids = self._load_investor_ids()
+            print(f"Brokers will trade for {len(self.investor_ids)} seeded investors")
+        users = [VirtualUser(self, _login(args.prefix, role, number), role)
+                 for role, count in (('investor', args.investors), ('broker', args.brokers))
+                 for number in range(1, count + 1)]
+        random.Random(args.seed).shuffle(users)
+        # Small stacks: thousands of mostly idle threads
+        threading.stack_size(512 * 1024)
+        deadline = time.monotonic() + args.ramp + args.duration
+        delay = args.ramp / len(users) if users else 0
+        try:
+            for user in users:
+                user.start()
+                if delay:
+                    time.sleep(delay)
+            while time.monotonic() < deadline:
+                time.sleep(min(args.interval, max(deadline - time.monotonic(), 0)))
+                report = self.stats.report()
+                print(f"[{report['elapsed']:6.0f}s] users={self.active} requests={report['requests']} "
+                      f"throughput={report['throughput']:.1f}/s errors={report['error_rate']:.2f}%", flush=True)
+        except KeyboardInterrupt:
+            print("Interrupted, stopping users...")
+        self.stop.set()
+        for user in users:
+            user.join(timeout=args.timeout)
+        report = self.stats.report()
+        print_report(report, len([u for u in users if u.logged_in]))
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+            print(f"Report written to {args.output}")
+        return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--db', default='stock', help='Database name')
+    common.add_argument('--investors', type=int, default=100, help='Simulated investors')
+    common.add_argument('--brokers', type=int, default=10, help='Simulated brokers')
+    common.add_argument('--prefix', default='loadtest', help='Login prefix of the seeded accounts')
+    common.add_argument('--password', default='loadtest', help='Password of the seeded accounts')
+    common.add_argument('--seed', type=int, default=42, help='Random seed')
+
+    seed_parser = sub.add_parser('seed', parents=[common], help='Create the simulated accounts')
+    seed_parser.add_argument('--config', default='/etc/odoo/odoo.conf', help='Odoo configuration file')
+    seed_parser.add_argument('--capital', type=float, default=100000.0, help='Starting cash per account')
+    seed_parser.add_argument('--holdings', type=int, default=3, help='Starting positions per investor')
+
+    run_parser = sub.add_parser('run', parents=[common], help='Drive the portal routes')
+    run_parser.add_argument('--url', default='http://localhost:8069', help='Base URL of the instance')
+    run_parser.add_argument('--duration', type=float, default=120, help='Seconds at full load')
+    run_parser.add_argument('--ramp', type=float, default=30, help='Seconds over which users log in')
+    run_parser.add_argument('--think', type=float, default=3.0, help='Mean think time between actions (s)')
+    run_parser.add_argument('--timeout', type=float, default=30, help='Request timeout (s)')
+    run_parser.add_argument('--interval', type=float, default=10, help='Seconds between progress lines')
+    run_parser.add_argument('--admin-login', default='admin', help='Login used to list the seeded investors')
+    run_parser.add_argument('--admin-password', default='admin', help='Password of --admin-login')
+    run_parser.add_argument('--output', help='Write the final report as JSON to this file')
+    run_parser.add_argument('--verbose', action='store_true', help='Print failed requests')
+
+    args = parser.parse_args(argv)
+    if args.command == 'seed':
+        seed(args)
+    else:
+        args.url = args.url.rstrip('/')
+        Runner(args).run()
+
+
+if __name__ == '__main__':
+    main()
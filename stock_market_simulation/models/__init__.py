@@ -1,15 +1,19 @@
 # -*- coding: utf-8 -*-
 
 from . import stock_message_mixin
+from . import stock_audit_event
 from . import stock_security
 from . import stock_session
 from . import stock_order
 from . import stock_trade
+from . import stock_commission_analytics
 from . import stock_message_mixin
 from . import mail_thread_override
 from . import stock_matching_engine
 from . import stock_position
 from . import stock_price_history
+from . import stock_price_bar
+from . import stock_session_analytics
 from . import stock_deposit
 from . import stock_loan
 from . import res_users
@@ -17,7 +21,15 @@ from . import res_partner
 from . import stock_config
 from . import stock_user_block
 from . import stock_news
+from . import stock_news_interest
+from . import ir_websocket
+from . import ir_http
 from . import stock_bond
 from . import stock_bond_order
 from . import mail_thread_tracking_override
-from . import stock_transaction_log
\ No newline at end of file
+from . import stock_transaction_log
+from . import stock_account_snapshot
+from . import stock_loan_amortization
+from . import stock_banker_exposure
+from . import stock_market_maker
+from . import stock_perf_profiler
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models
+from odoo.http import request
+import threading
+
+# Request header a client sends to get the query counters back (see load_test.py)
+LOAD_TEST_HEADER = 'X-Stock-Load-Test'
+
+# Routes of this module are the ones the request profiler instruments
+_MODULE_PREFIX = 'odoo.addons.stock_market_simulation.'
+
+
+class IrHttp(models.AbstractModel):
+    _inherit = 'ir.http'
+
+    @classmethod
+    def _stock_profile_route(cls, endpoint):
+        """Route label of ``endpoint`` when it belongs to this module, else None"""
+        func = getattr(endpoint, 'original_endpoint', None) or getattr(endpoint, 'func', endpoint)
+        if not (getattr(func, '__module__', None) or '').startswith(_MODULE_PREFIX):
+            return None
+        routes = (getattr(endpoint, 'routing', None) or {}).get('routes')
+        return routes[0] if routes else request.httprequest.path
+
+    @classmethod
+    def _dispatch(cls, endpoint):
+        route = cls._stock_profile_route(endpoint)
+        probe = request.env['stock.perf.profiler']._start(route) if route else None
+        if probe is None:
+            return super()._dispatch(endpoint)
+        try:
+            return super()._dispatch(endpoint)
+        except Exception:
+            probe.status = 'error'
+            raise
+        finally:
+            request.env['stock.perf.profiler']._finish(probe)
+
+    @classmethod
+    def _post_dispatch(cls, response):
+        super()._post_dispatch(response)
+        # Report the database work of the request to load-test clients, only where explicitly enabled
+        if (request.httprequest.headers.get(LOAD_TEST_HEADER) and request.db
+                and request.env['stock.config']._get_load_test_headers_enabled()):
+            thread = threading.current_thread()
+            response.headers['X-Query-Count'] = str(getattr(thread, 'query_count', 0))
+            response.headers['X-Query-Time'] = f"{getattr(thread, 'query_time', 0.0):.6f}"
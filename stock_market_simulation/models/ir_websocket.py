@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models
+from .stock_news import NEWS_BUS_CHANNEL
+
+
+class IrWebsocket(models.AbstractModel):
+    _inherit = 'ir.websocket'
+
+    def _build_bus_channel_list(self, channels):
+        # Logged-in users listen to the news scheduler's broadcasts, anonymous visitors don't
+        if self.env.user and not self.env.user._is_public():
+            channels = list(channels) + [NEWS_BUS_CHANNEL]
+        return super()._build_bus_channel_list(channels)
@@ -33,6 +33,21 @@ class ResUsers(models.Model):
         help='Current available cash balance'
     )
     
+    reserved_cash = fields.Float(
+        string='Reserved Cash',
+        digits='Product Price',
+        default=0.0,
+        readonly=True,
+        help='Cash held for open buy orders (released on fill, cancel or expiry)'
+    )
+    
+    available_cash = fields.Float(
+        string='Available Cash',
+        compute='_compute_available_cash',
+        digits='Product Price',
+        help='Cash balance not reserved by open buy orders'
+    )
+    
     initial_capital = fields.Float(
         string='Initial Capital',
         digits='Product Price',
@@ -173,6 +188,11 @@ class ResUsers(models.Model):
         compute='_compute_order_count'
     )
     
+    @api.depends('cash_balance', 'reserved_cash')
+    def _compute_available_cash(self):
+        for user in self:
+            user.available_cash = user.cash_balance - user.reserved_cash
+    
     @api.depends('position_ids', 'position_ids.quantity', 'position_ids.security_id.current_price')
     def _compute_portfolio_value(self):
         for user in self:
@@ -220,8 +240,15 @@ class ResUsers(models.Model):
     
     @api.depends('block_ids', 'block_ids.status')
     def _compute_is_blocked(self):
+        Block = self.env['stock.user.block'].sudo()
+        # One cached lookup for all rows; details are only read for blocked users
+        blocked = Block._get_blocking_block_ids(self.ids)
         for user in self:
-            block_check = self.env['stock.user.block'].check_user_blocked(user.id)
+            if user.id not in blocked:
+                user.is_blocked = False
+                user.current_block_info = False
+                continue
+            block_check = Block.check_user_blocked(user.id)
             user.is_blocked = block_check['is_blocked']
             
             if block_check['is_blocked']:
@@ -240,15 +267,35 @@ class ResUsers(models.Model):
     
     @api.depends('user_type')
     def _compute_broker_commission(self):
-        """Broker commission computation removed - no default broker relationships"""
+        """Commission on orders the user entered (one grouped query for all brokers in self)"""
+        broker_ids = [user.id for user in self if user.user_type == 'broker' and isinstance(user.id, int)]
+        breakdown = self.env['stock.commission.analytics'].get_broker_breakdown(broker_ids) if broker_ids else {}
         for user in self:
-            user.total_commission = 0.0
+            user.total_commission = breakdown.get(user.id, {}).get('total', 0.0)
     
     @api.constrains('cash_balance')
     def _check_cash_balance(self):
         for user in self:
             if user.cash_balance < 0:
                 raise ValidationError("Cash balance cannot be negative.")
+    
+    def _reserve_cash(self, amount):
+        """Hold cash for an open buy order. Raises if available cash is insufficient."""
+        self.ensure_one()
+        if amount <= 0:
+            return
+        if self.available_cash < amount:
+            raise ValidationError(
+                f"Insufficient funds. Required: {amount:,.2f}, Available: {self.available_cash:,.2f}"
+            )
+        self.sudo().write({'reserved_cash': self.reserved_cash + amount})
+    
+    def _release_cash(self, amount):
+        """Return previously reserved cash to the available balance."""
+        self.ensure_one()
+        if amount <= 0:
+            return
+        self.sudo().write({'reserved_cash': max(self.reserved_cash - amount, 0.0)})
 
     @api.model
     @api.model
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, api
+import time
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# (dbname, user_id) -> (stamp, expiry, snapshot); see StockAccountSnapshot._SNAPSHOT_TTL
+_SNAPSHOT_CACHE = {}
+
+
+class StockAccountSnapshot(models.AbstractModel):
+    """Account totals for the admin user-360 panels, answered from grouped SQL"""
+    _name = 'stock.account.snapshot'
+    _description = 'Account Snapshot'
+
+    # Seconds a snapshot is served from cache while the user's ledger is unchanged
+    _SNAPSHOT_TTL = 15
+
+    # Entries kept before the oldest cached snapshots are dropped
+    _SNAPSHOT_CACHE_SIZE = 500
+
+    # Ledger rows per page of the transaction history panel
+    TRANSACTION_PAGE_SIZE = 50
+
+    @api.model
+    def _get_ledger_stamp(self, user_id):
+        """Id of the user's last ledger entry plus the session clock; any change invalidates the snapshot"""
+        self.env['stock.transaction.log'].flush_model(['user_id'])
+        self.env.cr.execute("SELECT MAX(id) FROM stock_transaction_log WHERE user_id = %s", [user_id])
+        return (self.env.cr.fetchone()[0] or 0, self.env['stock.session']._get_clock_session_number())
+
+    @api.model
+    def get_snapshot(self, user_id):
+        """
+        Totals behind every user-360 panel, from four grouped queries.
+
+        Snapshots are cached for a few seconds per user and dropped as soon as a
+        new ledger entry is written for that user or the session clock moves.
+        """
+        key = (self.env.cr.dbname, user_id)
+        stamp = self._get_ledger_stamp(user_id)
+        cached = _SNAPSHOT_CACHE.get(key)
+        if cached and cached[0] == stamp and cached[1] > time.monotonic():
+            return cached[2]
+
+        snapshot = self._build_snapshot(user_id, stamp[1])
+        if len(_SNAPSHOT_CACHE) >= self._SNAPSHOT_CACHE_SIZE:
+            now = time.monotonic()
+            for stale in [k for k, entry in _SNAPSHOT_CACHE.items() if entry[1] <= now] or list(_SNAPSHOT_CACHE)[:50]:
+                _SNAPSHOT_CACHE.pop(stale, None)
+        _SNAPSHOT_CACHE[key] = (stamp, time.monotonic() + self._SNAPSHOT_TTL, snapshot)
+        return snapshot
+
+    @api.model
+    def _build_snapshot(self, user_id, session_number):
+        cr = self.env.cr
+        self.env['stock.position'].flush_model(['user_id', 'quantity', 'cost_basis', 'security_id'])
+        self.env['stock.security'].flush_model(['current_price'])
+        self.env['stock.deposit'].flush_model(['user_id', 'status', 'amount', 'interest_rate', 'deposit_session_id'])
+        self.env['stock.loan'].flush_model(['user_id', 'status', 'principal_outstanding'])
+        self.env['stock.transaction.log'].flush_model(['user_id', 'category', 'amount', 'cash_impact',
+                                                       'running_balance', 'transaction_date'])
+        self.env['res.users'].flush_model(['cash_balance'])
+
+        cr.execute("""
+            SELECT COUNT(*),
+                   COALESCE(SUM(p.quantity * COALESCE(s.current_price, 0)), 0),
+                   COALESCE(SUM(p.cost_basis), 0)
+              FROM stock_position p
+         LEFT JOIN stock_security s ON s.id = p.security_id
+             WHERE p.user_id = %s
+        """, [user_id])
+        positions_count, positions_value, positions_cost = cr.fetchone()
+
+        # Same accrual as stock.deposit._compute_interest: interest per session
+        # (annual rate / 12) for every session elapsed on the clock
+        cr.execute("""
+            SELECT COUNT(*),
+                   COALESCE(SUM(d.amount + d.amount * d.interest_rate / 12.0
+                                * GREATEST(0, %s - COALESCE(s.session_number, %s + 1) + 1) / 100.0), 0)
+              FROM stock_deposit d
+         LEFT JOIN stock_session s ON s.id = d.deposit_session_id
+             WHERE d.user_id = %s AND d.status = 'active'
+        """, [session_number or 0, session_number or 0, user_id])
+        deposits_count, deposits_value = cr.fetchone()
+
+        cr.execute("""
+            SELECT COUNT(*), COALESCE(SUM(principal_outstanding), 0)
+              FROM stock_loan
+             WHERE user_id = %s AND status = 'active'
+        """, [user_id])
+        loans_count, loans_value = cr.fetchone()
+
+        cr.execute("""
+            SELECT category, COUNT(*), COALESCE(SUM(amount), 0), COALESCE(SUM(cash_impact), 0),
+                   COALESCE(SUM(GREATEST(cash_impact, 0)), 0), COALESCE(SUM(GREATEST(-cash_impact, 0)), 0)
+              FROM stock_transaction_log
+             WHERE user_id = %s
+          GROUP BY category
+        """, [user_id])
+        category_summaries = {}
+        total_inflows = total_outflows = 0.0
+        transaction_count = 0
+        for category, count, amount, cash_impact, inflows, outflows in cr.fetchall():
+            category_summaries[category] = {
+                'name': (category or 'uncategorized').replace('_', ' ').title(),
+                'total_amount': amount,
+                'total_cash_impact': cash_impact,
+                'transaction_count': count,
+            }
+            total_inflows += inflows
+            total_outflows += outflows
+            transaction_count += count
+
+        cr.execute("""
+            SELECT running_balance
+              FROM stock_transaction_log
+             WHERE user_id = %s
+          ORDER BY transaction_date DESC, id DESC
+             LIMIT 1
+        """, [user_id])
+        row = cr.fetchone()
+        final_balance = row[0] if row else 0
+
+        cr.execute("SELECT COALESCE(cash_balance, 0) FROM res_users WHERE id = %s", [user_id])
+        row = cr.fetchone()
+        cash_balance = row[0] if row else 0
+
+        return {
+            'cash_balance': cash_balance,
+            'positions_count': positions_count,
+            'total_positions_value': positions_value,
+            'total_positions_cost': positions_cost,
+            'total_unrealized_pnl': positions_value - positions_cost,
+            'deposits_count': deposits_count,
+            'total_deposits': deposits_value,
+            'loans_count': loans_count,
+            'total_loans': loans_value,
+            # Net worth: Cash + Portfolio + Deposits - Loans
+            'net_worth': cash_balance + positions_value + deposits_value - loans_value,
+            'category_summaries': category_summaries,
+            'transaction_count': transaction_count,
+            'total_inflows': total_inflows,
+            'total_outflows': total_outflows,
+            'net_change': total_inflows - total_outflows,
+            'final_balance': final_balance,
+        }
+
+    @api.model
+    def get_transactions(self, user_id, page=1, page_size=None):
+        """One page of the user's ledger, newest entry first, as template-ready dicts"""
+        page_size = page_size or self.TRANSACTION_PAGE_SIZE
+        self.env['stock.transaction.log'].flush_model()
+        self.env.cr.execute("""
+            SELECT transaction_date, transaction_type, description, cash_impact,
+                   running_balance, category, reference
+              FROM stock_transaction_log
+             WHERE user_id = %s
+          ORDER BY transaction_date DESC, id DESC
+             LIMIT %s OFFSET %s
+        """, [user_id, page_size, (max(page, 1) - 1) * page_size])
+        return [{
+            'date': date.strftime('%Y-%m-%d %H:%M') if date else 'Unknown',
+            'type': (transaction_type or '').upper().replace('_', ' '),
+            'description': description,
+            'amount': cash_impact or 0.0,
+            'running_balance': running_balance or 0.0,
+            'category': category or '',
+            'reference': reference or '',
+            'badge_class': 'bg-success' if (cash_impact or 0.0) >= 0 else 'bg-danger',
+        } for date, transaction_type, description, cash_impact, running_balance, category, reference
+            in self.env.cr.fetchall()]
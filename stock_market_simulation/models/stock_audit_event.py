@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api, tools
+from odoo.exceptions import UserError
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class StockAuditPolicy(models.Model):
+    """Per-model choice of how stock.message.mixin audit entries are recorded"""
+    _name = 'stock.audit.policy'
+    _description = 'Stock Audit Policy'
+    _order = 'model_name'
+    _rec_name = 'model_name'
+
+    _sql_constraints = [
+        ('model_name_unique', 'UNIQUE(model_name)', 'Only one audit policy per model is allowed.')
+    ]
+
+    model_name = fields.Char(
+        string='Model',
+        required=True,
+        help='Technical model name, e.g. stock.order'
+    )
+
+    mode = fields.Selection([
+        ('deferred', 'Deferred (audit table, chatter in background batches)'),
+        ('chatter', 'Immediate chatter post'),
+        ('off', 'Disabled'),
+    ], string='Mode', required=True, default='deferred')
+
+    # Models without a policy record use this mode
+    _DEFAULT_MODE = 'deferred'
+
+    @api.model
+    @tools.ormcache('model_name')
+    def _get_mode(self, model_name):
+        policy = self.sudo().search([('model_name', '=', model_name)], limit=1)
+        return policy.mode if policy else self._DEFAULT_MODE
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
+
+class StockAuditEvent(models.Model):
+    """Append-only audit events, materialized to chatter in background batches"""
+    _name = 'stock.audit.event'
+    _description = 'Stock Audit Event'
+    _order = 'id desc'
+    _rec_name = 'action'
+
+    event_date = fields.Datetime(string='Date', required=True, default=fields.Datetime.now, readonly=True)
+    model_name = fields.Char(string='Model', required=True, readonly=True, index=True)
+    res_id = fields.Integer(string='Record ID', required=True, readonly=True, index=True)
+    action = fields.Char(string='Action', required=True, readonly=True)
+    details = fields.Text(string='Details', readonly=True)
+    user_id = fields.Many2one('res.users', string='Performed By', readonly=True)
+    materialized = fields.Boolean(
+        string='Posted to Chatter',
+        default=False,
+        readonly=True,
+        index=True,
+        help='Set once the event has been posted to the record chatter'
+    )
+
+    # Maximum events handled per materialization batch
+    _MATERIALIZE_BATCH = 2000
+
+    @api.model
+    def _append(self, model_name, res_ids, action, details=None, user_id=None):
+        """Append one event per record id with a single INSERT (no ORM, no mail pipeline)"""
+        if not res_ids:
+            return
+        uid = user_id or self.env.uid
+        rows = [(model_name, res_id, action, details or None, uid) for res_id in res_ids]
+        self.env.cr.execute(
+            "INSERT INTO stock_audit_event "
+            "(event_date, model_name, res_id, action, details, user_id, materialized, "
+            " create_uid, create_date, write_uid, write_date) "
+            "SELECT now() at time zone 'UTC', v.model_name, v.res_id, v.action, v.details, v.user_id, false, "
+            "       v.user_id, now() at time zone 'UTC', v.user_id, now() at time zone 'UTC' "
+            "  FROM (VALUES " + ", ".join(["(%s, %s, %s, %s, %s)"] * len(rows)) + ") "
+            "       AS v(model_name, res_id, action, details, user_id)",
+            [value for row in rows for value in row]
+        )
+
+    def write(self, vals):
+        if set(vals) - {'materialized'}:
+            raise UserError("Audit events are append-only.")
+        return super().write(vals)
+
+    @api.model
+    def cron_materialize_events(self, limit=None):
+        """Post pending events to chatter, one grouped note per record"""
+        self.env.cr.execute("""
+            SELECT e.id, e.model_name, e.res_id, e.action, e.details, e.event_date, u.login
+              FROM stock_audit_event e
+         LEFT JOIN res_users u ON u.id = e.user_id
+             WHERE NOT e.materialized
+          ORDER BY e.id
+             LIMIT %s
+        """, [limit or self._MATERIALIZE_BATCH])
+        rows = self.env.cr.fetchall()
+        if not rows:
+            return 0
+
+        grouped = {}
+        for event_id, model_name, res_id, action, details, event_date, login in rows:
+            grouped.setdefault((model_name, res_id), []).append((event_id, action, details, event_date, login))
+
+        # Events whose note was posted, or whose record or chatter is gone
+        done_ids = []
+        for (model_name, res_id), events in grouped.items():
+            event_ids = [event[0] for event in events]
+            Model = self.env.get(model_name)
+            if Model is None or 'message_ids' not in Model._fields:
+                done_ids += event_ids
+                continue
+            record = Model.sudo().browse(res_id).exists()
+            if not record:
+                done_ids += event_ids
+                continue
+            lines = []
+            for _event_id, action, details, event_date, login in events:
+                line = f"[{event_date:%Y-%m-%d %H:%M:%S}] {action}"
+                if details:
+                    line += f" - {details}"
+                lines.append(f"{line} ({login or 'system'})")
+            subject = events[0][1] if len(events) == 1 else f"{len(events)} audit events"
+            try:
+                with self.env.cr.savepoint():
+                    if hasattr(record, 'safe_message_post'):
+                        posted = record.safe_message_post(body="\n".join(lines), subject=subject, message_type='comment')
+                    else:
+                        posted = record.message_post(body="\n".join(lines), subject=subject)
+                    if not posted:
+                        # safe_message_post swallows its errors; roll the savepoint back
+                        # so a failed statement does not leave the transaction aborted
+                        raise UserError("Chatter post failed")
+            except Exception as e:
+                posted = False
+                _logger.error(f"[AUDIT] Failed to materialize events for {model_name}({res_id}): {e}")
+            if posted:
+                done_ids += event_ids
+            else:
+                # Left pending: retried on the next run
+                _logger.warning(f"[AUDIT] {len(event_ids)} events for {model_name}({res_id}) not posted, will retry")
+
+        if done_ids:
+            self.env.cr.execute(
+                "UPDATE stock_audit_event SET materialized = true WHERE id IN %s",
+                [tuple(done_ids)]
+            )
+            self.invalidate_model(['materialized'])
+        _logger.info(f"[AUDIT] Materialized {len(done_ids)} of {len(rows)} events on {len(grouped)} records")
+        return len(done_ids)
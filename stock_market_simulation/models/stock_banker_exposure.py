@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, api
+import time
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# (dbname, banker_id) -> (stamp, expiry, exposure); see StockBankerExposure._EXPOSURE_TTL
+_EXPOSURE_CACHE = {}
+
+
+class StockBankerExposure(models.AbstractModel):
+    """Banker book exposure (deposits, loans, arrears, LTV, interest margin) from grouped SQL"""
+    _name = 'stock.banker.exposure'
+    _description = 'Banker Exposure'
+
+    # Seconds an exposure is served while the book is unchanged; bounds how stale
+    # the collateral prices behind the LTV distribution can get
+    _EXPOSURE_TTL = 30
+
+    # Entries kept before the oldest cached exposures are dropped
+    _EXPOSURE_CACHE_SIZE = 200
+
+    # (key, label, lower bound in sessions past due) of the overdue buckets
+    OVERDUE_BUCKETS = (
+        ('current', 'Current', None),
+        ('1', '1 session', 1),
+        ('2_3', '2-3 sessions', 2),
+        ('4_plus', '4+ sessions', 4),
+    )
+
+    # (key, label, upper bound in % loan-to-value) of the LTV buckets
+    LTV_BUCKETS = (
+        ('lt_50', '< 50%', 50),
+        ('50_70', '50-70%', 70),
+        ('70_85', '70-85%', 85),
+        ('85_100', '85-100%', 100),
+        ('gt_100', '> 100%', None),
+    )
+
+    @api.model
+    def _book_condition(self, alias, banker_id):
+        """SQL condition restricting ``alias`` to the book of ``banker_id`` (every book when falsy)"""
+        if banker_id:
+            return f"{alias}.banker_id = %s", [banker_id]
+        return "TRUE", []
+
+    @api.model
+    def _get_book_stamp(self, banker_id):
+        """Last change to the banker's deposits, loans and loan payments plus the session clock"""
+        self.env['stock.deposit'].flush_model()
+        self.env['stock.loan'].flush_model()
+        self.env['stock.loan.payment'].flush_model(['loan_id'])
+        where, params = self._book_condition('b', banker_id)
+        self.env.cr.execute(f"""
+            SELECT (SELECT MAX(b.write_date) FROM stock_deposit b WHERE {where}),
+                   (SELECT MAX(b.write_date) FROM stock_loan b WHERE {where}),
+                   (SELECT MAX(p.id) FROM stock_loan_payment p JOIN stock_loan b ON b.id = p.loan_id WHERE {where})
+        """, params * 3)
+        return self.env.cr.fetchone() + (self.env['stock.session']._get_clock_session_number(),)
+
+    @api.model
+    def get_exposure(self, banker_id=None):
+        """
+        Exposure of one banker's book (or of every book for ``banker_id=None``).
+
+        Served from a short-lived cache that is rebuilt as soon as a deposit or
+        loan of the book is approved, disbursed or repaid, or the clock moves.
+        """
+        key = (self.env.cr.dbname, banker_id or 0)
+        stamp = self._get_book_stamp(banker_id)
+        cached = _EXPOSURE_CACHE.get(key)
+        if cached and cached[0] == stamp and cached[1] > time.monotonic():
+            return cached[2]
+
+        exposure = self._build_exposure(banker_id, stamp[-1] or 0)
+        if len(_EXPOSURE_CACHE) >= self._EXPOSURE_CACHE_SIZE:
+            now = time.monotonic()
+            for stale in [k for k, entry in _EXPOSURE_CACHE.items() if entry[1] <= now] or list(_EXPOSURE_CACHE)[:20]:
+                _EXPOSURE_CACHE.pop(stale, None)
+        _EXPOSURE_CACHE[key] = (stamp, time.monotonic() + self._EXPOSURE_TTL, exposure)
+        return exposure
+
+    @api.model
+    def _build_exposure(self, banker_id, session_number):
+        cr = self.env.cr
+        self.env['stock.security'].flush_model(['current_price'])
+        self.env['stock.session'].flush_model(['session_number'])
+
+        # Deposits per type; accrual as in stock.deposit._compute_interest
+        where, params = self._book_condition('d', banker_id)
+        cr.execute(f"""
+            SELECT d.deposit_type, COUNT(*), COALESCE(SUM(d.amount), 0),
+                   COALESCE(SUM(d.amount * d.interest_rate / 12.0
+                                * GREATEST(0, %s - COALESCE(s.session_number, %s + 1) + 1) / 100.0), 0)
+              FROM stock_deposit d
+         LEFT JOIN stock_session s ON s.id = d.deposit_session_id
+             WHERE {where} AND d.status = 'active'
+          GROUP BY d.deposit_type
+        """, [session_number, session_number] + params)
+        deposit_labels = dict(self.env['stock.deposit']._fields['deposit_type'].selection)
+        deposits_by_type = {
+            deposit_type: {
+                'label': deposit_labels.get(deposit_type, deposit_type),
+                'count': count,
+                'amount': amount,
+                'interest': interest,
+                'value': amount + interest,
+            }
+            for deposit_type, count, amount, interest in cr.fetchall()
+        }
+
+        # Loans per type and status; accrual as in stock.loan._compute_interest
+        where, params = self._book_condition('l', banker_id)
+        cr.execute(f"""
+            SELECT l.loan_type, l.status, COUNT(*), COALESCE(SUM(l.principal_outstanding), 0),
+                   COALESCE(SUM(l.penalty_amount), 0),
+                   COALESCE(SUM(CASE WHEN l.status = 'active' THEN l.principal_outstanding * l.interest_rate / 12.0
+                                * GREATEST(0, %s - COALESCE(s.session_number, %s + 1) + 1) / 100.0 END), 0)
+              FROM stock_loan l
+         LEFT JOIN stock_session s ON s.id = l.disbursement_session_id
+             WHERE {where} AND l.status IN ('active', 'defaulted')
+          GROUP BY l.loan_type, l.status
+        """, [session_number, session_number] + params)
+        loan_labels = dict(self.env['stock.loan']._fields['loan_type'].selection)
+        loans_by_type = {}
+        defaulted_count = 0
+        defaulted_principal = 0.0
+        for loan_type, status, count, principal, penalty, interest in cr.fetchall():
+            row = loans_by_type.setdefault(loan_type, {
+                'label': loan_labels.get(loan_type, loan_type),
+                'count': 0, 'principal': 0.0, 'penalty': 0.0, 'interest': 0.0, 'defaulted_count': 0,
+            })
+            row['count'] += count
+            row['principal'] += principal
+            row['penalty'] += penalty
+            row['interest'] += interest
+            if status == 'defaulted':
+                row['defaulted_count'] += count
+                defaulted_count += count
+                defaulted_principal += principal
+        for row in loans_by_type.values():
+            row['outstanding'] = row['principal'] + row['penalty'] + row['interest']
+
+        # Overdue buckets: sessions elapsed since the installment after the last
+        # payment (or after disbursement) fell due, as in _compute_next_payment
+        cr.execute(f"""
+            SELECT GREATEST(0, %s - COALESCE(MAX(ps.session_number), ds.session_number) - 1) AS past_due,
+                   l.principal_outstanding
+              FROM stock_loan l
+              JOIN stock_session ds ON ds.id = l.disbursement_session_id
+         LEFT JOIN stock_loan_payment p ON p.loan_id = l.id
+         LEFT JOIN stock_session ps ON ps.id = p.payment_session_id
+             WHERE {where} AND l.status = 'active'
+          GROUP BY l.id, ds.session_number, l.principal_outstanding
+        """, [session_number] + params)
+        overdue = {key: {'label': label, 'count': 0, 'principal': 0.0} for key, label, _bound in self.OVERDUE_BUCKETS}
+        for past_due, principal in cr.fetchall():
+            key = next(key for key, _label, bound in reversed(self.OVERDUE_BUCKETS) if bound is None or past_due >= bound)
+            overdue[key]['count'] += 1
+            overdue[key]['principal'] += principal
+
+        # LTV distribution at live collateral prices
+        cr.execute(f"""
+            SELECT l.amount, l.principal_outstanding, l.collateral_quantity * COALESCE(sec.current_price, 0)
+              FROM stock_loan l
+              JOIN stock_security sec ON sec.id = l.collateral_security_id
+             WHERE {where} AND l.status = 'active' AND l.collateral_quantity > 0
+        """, params)
+        ltv = {key: {'label': label, 'count': 0, 'principal': 0.0} for key, label, _bound in self.LTV_BUCKETS}
+        collateral_value = 0.0
+        for amount, principal, value in cr.fetchall():
+            ratio = amount / value * 100 if value > 0 else None
+            key = next(key for key, _label, bound in self.LTV_BUCKETS
+                       if bound is None or (ratio is not None and ratio < bound))
+            ltv[key]['count'] += 1
+            ltv[key]['principal'] += principal
+            collateral_value += value
+
+        total_deposits = sum(row['value'] for row in deposits_by_type.values())
+        # Active principal only; defaulted loans are reported separately
+        total_loans = sum(row['principal'] for row in loans_by_type.values()) - defaulted_principal
+        deposit_interest = sum(row['interest'] for row in deposits_by_type.values())
+        loan_interest = sum(row['interest'] for row in loans_by_type.values())
+        return {
+            'session_number': session_number,
+            'deposits_by_type': deposits_by_type,
+            'loans_by_type': loans_by_type,
+            'overdue_buckets': overdue,
+            'ltv_buckets': ltv,
+            'total_deposits': total_deposits,
+            'total_loans': total_loans,
+            'collateral_value': collateral_value,
+            'deposit_interest': deposit_interest,
+            'loan_interest': loan_interest,
+            # Net interest margin: interest accrued on loans less interest owed on deposits
+            'net_interest_margin': loan_interest - deposit_interest,
+            'defaulted_count': defaulted_count,
+            'defaulted_principal': defaulted_principal,
+        }
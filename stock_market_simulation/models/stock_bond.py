@@ -6,6 +6,62 @@ import logging
 
 _logger = logging.getLogger(__name__)
 
+# Bond columns read by the analytics pass, in the order _bond_metrics expects
+BOND_METRIC_COLUMNS = (
+    'id', 'status', 'start_session', 'end_session', 'first_pay_session', 'rate_type',
+    'return_price', 'ipo_price', 'current_price', 'percentage_rate_session',
+)
+
+
+def _bond_metrics(row, session_number):
+    """
+    Session analytics of one bond from a BOND_METRIC_COLUMNS row.
+    
+    Returns (time_to_maturity, theoretical_price, accrued_interest,
+    current_yield, ytm, is_active). ``session_number`` None means no open session.
+    """
+    (__, status, start, end, first_pay, rate_type,
+     return_price, ipo_price, current_price, rate_pct) = row
+    rate = (rate_pct or 0.0) / 100
+    return_price = return_price or 0.0
+    
+    if session_number is None:
+        time_to_maturity = end - start
+        pricing_session = start
+    else:
+        time_to_maturity = max(0, end - session_number)
+        pricing_session = session_number
+    
+    sessions_to_maturity = max(0, end - pricing_session)
+    if sessions_to_maturity == 0:
+        theoretical_price = return_price
+    elif rate_type == 'zero_coupon':
+        theoretical_price = return_price / ((1 + rate) ** sessions_to_maturity)
+    else:
+        time_factor = sessions_to_maturity / (end - start) if end != start else 0.0
+        theoretical_price = ipo_price + (return_price - ipo_price) * (1 - time_factor)
+    
+    if session_number is not None and session_number >= first_pay:
+        accrued_interest = return_price * rate * (session_number - first_pay)
+    else:
+        accrued_interest = 0.0
+    
+    if current_price and current_price > 0:
+        annual_interest = return_price * rate
+        current_yield = (annual_interest / current_price) * 100
+        if time_to_maturity > 0:
+            annual_return = (return_price - current_price) / time_to_maturity
+            ytm = ((annual_interest + annual_return) / current_price) * 100
+        else:
+            ytm = current_yield
+    else:
+        current_yield = ytm = 0.0
+    
+    is_active = (session_number is not None and start <= session_number <= end
+                 and status == 'trade')
+    return time_to_maturity, theoretical_price, accrued_interest, current_yield, ytm, is_active
+
+
 class StockBond(models.Model):
     _name = 'stock.bond'
     _description = 'Tradeable Bonds'
@@ -87,12 +143,14 @@ class StockBond(models.Model):
     start_session = fields.Integer(
         string='Start Session',
         required=True,
+        index=True,
         help='Session when bond becomes available for trading'
     )
     
     end_session = fields.Integer(
         string='End Session',
         required=True,
+        index=True,
         help='Session when bond matures/expires'
     )
     
@@ -153,33 +211,40 @@ class StockBond(models.Model):
     # Computed Fields
     time_to_maturity = fields.Integer(
         string='Sessions to Maturity',
-        compute='_compute_time_to_maturity',
+        compute='_compute_session_metrics',
         help='Number of sessions until maturity'
     )
     
     current_yield = fields.Float(
         string='Current Yield (%)',
-        compute='_compute_yield',
+        compute='_compute_session_metrics',
         digits=(5, 3),
         help='Current yield based on current price'
     )
     
     ytm = fields.Float(
         string='Yield to Maturity (%)',
-        compute='_compute_yield',
+        compute='_compute_session_metrics',
         digits=(5, 3),
         help='Yield to maturity calculation'
     )
     
     is_active = fields.Boolean(
         string='Is Active',
-        compute='_compute_is_active',
+        compute='_compute_session_metrics',
         help='True if bond is currently tradeable'
     )
     
+    theoretical_price = fields.Float(
+        string='Theoretical Price',
+        compute='_compute_session_metrics',
+        digits=(16, 4),
+        help='Time-based fair price for the open session'
+    )
+    
     accrued_interest = fields.Float(
         string='Accrued Interest',
-        compute='_compute_accrued_interest',
+        compute='_compute_session_metrics',
         digits=(16, 4),
         help='Accrued interest to date'
     )
@@ -228,102 +293,70 @@ class StockBond(models.Model):
         help='Lowest ask price'
     )
     
-    @api.depends('start_session', 'end_session')
-    def _compute_is_active(self):
-        for bond in self:
-            current_session = self.env['stock.session'].search([('state', '=', 'open')], limit=1)
-            if current_session:
-                session_num = 0
-                if current_session.name.startswith('Session '):
-                    try:
-                        session_num = int(current_session.name.split(' ')[-1])
-                    except:
-                        session_num = 0
-                
-                bond.is_active = (bond.start_session <= session_num <= bond.end_session and 
-                                bond.status == 'trade')
-            else:
-                bond.is_active = False
-    
-    @api.depends('end_session')
-    def _compute_time_to_maturity(self):
+    def _get_session_metrics(self):
+        """
+        Analytics of the bonds in ``self`` for the open session, keyed by bond id.
+        
+        Reads the per-session stock.bond.analytics table built at session open;
+        bonds without a row (created mid-session) are computed on the fly.
+        """
+        bond_ids = [bond_id for bond_id in self.ids if isinstance(bond_id, int)]
+        session = self.env['stock.session'].search([('state', '=', 'open')], limit=1)
+        metrics = self.env['stock.bond.analytics']._get_metrics(session, bond_ids) if session else {}
+        missing = [bond_id for bond_id in bond_ids if bond_id not in metrics]
+        if missing:
+            session_number = session.session_number if session else None
+            for row in self.env['stock.bond.analytics']._read_bond_rows(missing):
+                metrics[row[0]] = _bond_metrics(row, session_number)
+        return metrics
+    
+    @api.depends('status', 'start_session', 'end_session', 'first_pay_session',
+                 'current_price', 'return_price', 'percentage_rate_session')
+    def _compute_session_metrics(self):
+        metrics = self._get_session_metrics()
         for bond in self:
-            current_session = self.env['stock.session'].search([('state', '=', 'open')], limit=1)
-            if current_session:
-                session_num = 0
-                if current_session.name.startswith('Session '):
-                    try:
-                        session_num = int(current_session.name.split(' ')[-1])
-                    except:
-                        session_num = 0
-                
-                bond.time_to_maturity = max(0, bond.end_session - session_num)
-            else:
+            values = metrics.get(bond.id)
+            if not values:
                 bond.time_to_maturity = bond.end_session - bond.start_session
-    
-    @api.depends('current_price', 'return_price', 'percentage_rate_session', 'time_to_maturity')
-    def _compute_yield(self):
-        for bond in self:
-            if bond.current_price > 0:
-                # Current Yield = (Annual Interest / Current Price) * 100
-                annual_interest = bond.return_price * (bond.percentage_rate_session / 100)
-                bond.current_yield = (annual_interest / bond.current_price) * 100
-                
-                # Simple YTM approximation
-                if bond.time_to_maturity > 0:
-                    total_return = bond.return_price - bond.current_price
-                    annual_return = total_return / bond.time_to_maturity
-                    bond.ytm = ((annual_interest + annual_return) / bond.current_price) * 100
-                else:
-                    bond.ytm = bond.current_yield
-            else:
-                bond.current_yield = 0.0
-                bond.ytm = 0.0
-    
-    @api.depends('first_pay_session', 'percentage_rate_session')
-    def _compute_accrued_interest(self):
-        for bond in self:
-            current_session = self.env['stock.session'].search([('state', '=', 'open')], limit=1)
-            if current_session:
-                session_num = 0
-                if current_session.name.startswith('Session '):
-                    try:
-                        session_num = int(current_session.name.split(' ')[-1])
-                    except:
-                        session_num = 0
-                
-                if session_num >= bond.first_pay_session:
-                    sessions_since_first = session_num - bond.first_pay_session
-                    bond.accrued_interest = (bond.return_price * 
-                                           (bond.percentage_rate_session / 100) * 
-                                           sessions_since_first)
-                else:
-                    bond.accrued_interest = 0.0
-            else:
-                bond.accrued_interest = 0.0
+                bond.theoretical_price = bond.accrued_interest = bond.current_yield = bond.ytm = 0.0
+                bond.is_active = False
+                continue
+            (bond.time_to_maturity, bond.theoretical_price, bond.accrued_interest,
+             bond.current_yield, bond.ytm, bond.is_active) = values
     
     @api.depends('order_ids')
     def _compute_order_book(self):
+        """Top of book for all bonds in ``self`` from one grouped query"""
+        book = {}
+        bond_ids = tuple(bond_id for bond_id in self.ids if isinstance(bond_id, int))
+        if bond_ids:
+            self.env['stock.bond.order'].flush_model(['bond_id', 'side', 'status', 'price', 'order_type'])
+            self.env.cr.execute("""
+                SELECT bond_id, side, COUNT(*),
+                       MAX(price) FILTER (WHERE order_type = 'limit'),
+                       MIN(price) FILTER (WHERE order_type = 'limit')
+                  FROM stock_bond_order
+                 WHERE bond_id IN %s AND status IN ('open', 'partial')
+              GROUP BY bond_id, side
+            """, [bond_ids])
+            for bond_id, side, count, max_price, min_price in self.env.cr.fetchall():
+                book[(bond_id, side)] = (count, max_price or 0.0, min_price or 0.0)
         for bond in self:
-            active_orders = bond.order_ids.filtered(
-                lambda o: o.status in ['open', 'partial']
-            )
-            
-            bid_orders = active_orders.filtered(lambda o: o.side == 'buy')
-            ask_orders = active_orders.filtered(lambda o: o.side == 'sell')
-            
-            bond.bid_count = len(bid_orders)
-            bond.ask_count = len(ask_orders)
-            
-            if bid_orders:
-                bond.best_bid = max(bid_orders.mapped('price'))
-            else:
-                bond.best_bid = 0.0
-            
-            if ask_orders:
-                bond.best_ask = min(ask_orders.mapped('price'))
-            else:
-                bond.best_ask = 0.0
+            bid_count, best_bid, __ = book.get((bond.id, 'buy'), (0, 0.0, 0.0))
+            ask_count, __, best_ask = book.get((bond.id, 'sell'), (0, 0.0, 0.0))
+            bond.bid_count = bid_count
+            bond.ask_count = ask_count
+            bond.best_bid = best_bid
+            bond.best_ask = best_ask
+    
+    def write(self, vals):
+        res = super().write(vals)
+        if set(BOND_METRIC_COLUMNS[1:]).intersection(vals):
+            # Keep the open session's analytics rows in step with status and fill prices
+            session = self.env['stock.session'].search([('state', '=', 'open')], limit=1)
+            if session:
+                self.env['stock.bond.analytics'].sudo()._build_for_session(session, self.ids)
+        return res
     
     @api.constrains('symbol')
     def _check_symbol_unique(self):
@@ -350,33 +383,11 @@ class StockBond(models.Model):
         self.ensure_one()
         
         if target_session is None:
-            current_session = self.env['stock.session'].search([('state', '=', 'open')], limit=1)
-            if current_session and current_session.name.startswith('Session '):
-                try:
-                    target_session = int(current_session.name.split(' ')[-1])
-                except:
-                    target_session = self.start_session
-            else:
-                target_session = self.start_session
+            # Open-session price comes from the precomputed analytics table
+            return self._get_session_metrics()[self.id][1]
         
-        sessions_to_maturity = max(0, self.end_session - target_session)
-        
-        if sessions_to_maturity == 0:
-            # Bond has matured, return face value
-            return self.return_price
-        
-        # Time-based pricing calculation based on bond type
-        if self.rate_type == 'zero_coupon':
-            # Zero coupon bond - discount from face value
-            discount_rate = self.percentage_rate_session / 100
-            present_value = self.return_price / ((1 + discount_rate) ** sessions_to_maturity)
-            return present_value
-        else:
-            # For other bond types, return current price adjusted for time
-            # This is a simplified calculation - could be enhanced
-            time_factor = sessions_to_maturity / (self.end_session - self.start_session)
-            price_adjustment = (self.return_price - self.ipo_price) * (1 - time_factor)
-            return self.ipo_price + price_adjustment
+        row = self.env['stock.bond.analytics']._read_bond_rows(self.ids)[0]
+        return _bond_metrics(row, target_session)[1]
     
     def calculate_interest_payment(self, session_number):
         """Calculate interest payment for a specific session"""
@@ -402,17 +413,10 @@ class StockBond(models.Model):
         """Process bond maturity - pay final amount to holders"""
         self.ensure_one()
         
-        current_session = self.env['stock.session'].search([('state', '=', 'open')], limit=1)
-        if not current_session:
+        session_num = self.env['stock.session']._get_current_session_number()
+        if not session_num:
             raise ValidationError("No active session to process bond maturity.")
         
-        session_num = 0
-        if current_session.name.startswith('Session '):
-            try:
-                session_num = int(current_session.name.split(' ')[-1])
-            except:
-                session_num = 0
-        
         if session_num < self.end_session:
             raise ValidationError("Bond has not yet reached maturity.")
         
@@ -458,4 +462,93 @@ class StockBond(models.Model):
         
         _logger.info(f"Bond {self.symbol} matured with total payout ${total_payout:,.2f}")
         
-        return total_payout
\ No newline at end of file
+        return total_payout
+
+
+class StockBondAnalytics(models.Model):
+    """Bond pricing and yield curve snapshot, one row per bond and session"""
+    _name = 'stock.bond.analytics'
+    _description = 'Bond Session Analytics'
+    _order = 'session_number desc, time_to_maturity'
+    _rec_name = 'bond_id'
+    
+    _sql_constraints = [
+        ('session_bond_unique', 'UNIQUE(session_id, bond_id)',
+         'Only one analytics row per bond and session is allowed.')
+    ]
+    
+    session_id = fields.Many2one('stock.session', string='Session', required=True, ondelete='cascade')
+    session_number = fields.Integer(string='Session Number', readonly=True, index=True)
+    bond_id = fields.Many2one('stock.bond', string='Bond', required=True, ondelete='cascade', index=True)
+    time_to_maturity = fields.Integer(string='Sessions to Maturity', readonly=True)
+    theoretical_price = fields.Float(string='Theoretical Price', digits=(16, 4), readonly=True)
+    accrued_interest = fields.Float(string='Accrued Interest', digits=(16, 4), readonly=True)
+    current_yield = fields.Float(string='Current Yield (%)', digits=(5, 3), readonly=True)
+    ytm = fields.Float(string='Yield to Maturity (%)', digits=(5, 3), readonly=True)
+    is_active = fields.Boolean(string='Tradeable', readonly=True)
+    
+    _METRIC_COLUMNS = ('time_to_maturity', 'theoretical_price', 'accrued_interest',
+                       'current_yield', 'ytm', 'is_active')
+    
+    @api.model
+    def _read_bond_rows(self, bond_ids=None):
+        """Raw BOND_METRIC_COLUMNS rows for the given bonds (all bonds if None)"""
+        self.env['stock.bond'].flush_model(BOND_METRIC_COLUMNS[1:])
+        query = "SELECT " + ", ".join(BOND_METRIC_COLUMNS) + " FROM stock_bond"
+        params = []
+        if bond_ids is not None:
+            if not bond_ids:
+                return []
+            query += " WHERE id IN %s"
+            params.append(tuple(bond_ids))
+        self.env.cr.execute(query + " ORDER BY id", params)
+        return self.env.cr.fetchall()
+    
+    @api.model
+    def _build_for_session(self, session, bond_ids=None):
+        """Compute analytics for every bond (or ``bond_ids``) in one pass and upsert them for ``session``"""
+        rows = self._read_bond_rows(bond_ids)
+        if not rows:
+            return 0
+        session_number = session.session_number
+        values = [(row[0],) + _bond_metrics(row, session_number) for row in rows]
+        params = []
+        for bond_id, ttm, price, accrued, cy, ytm, active in values:
+            params += [session.id, session_number, bond_id, ttm, price, accrued, cy, ytm, active,
+                       self.env.uid, self.env.uid]
+        self.env.cr.execute("""
+            INSERT INTO stock_bond_analytics
+                (session_id, session_number, bond_id, time_to_maturity, theoretical_price,
+                 accrued_interest, current_yield, ytm, is_active,
+                 create_uid, create_date, write_uid, write_date)
+            SELECT v.session_id, v.session_number, v.bond_id, v.ttm, v.price, v.accrued, v.cy, v.ytm, v.active,
+                   v.uid, now() at time zone 'UTC', v.wuid, now() at time zone 'UTC'
+              FROM (VALUES """ + ", ".join(
+                  ["(%s, %s, %s, %s, %s::numeric, %s::numeric, %s::numeric, %s::numeric, %s, %s, %s)"] * len(values)
+              ) + """) AS v(session_id, session_number, bond_id, ttm, price, accrued, cy, ytm, active, uid, wuid)
+            ON CONFLICT (session_id, bond_id) DO UPDATE
+               SET session_number = EXCLUDED.session_number,
+                   time_to_maturity = EXCLUDED.time_to_maturity,
+                   theoretical_price = EXCLUDED.theoretical_price,
+                   accrued_interest = EXCLUDED.accrued_interest,
+                   current_yield = EXCLUDED.current_yield,
+                   ytm = EXCLUDED.ytm,
+                   is_active = EXCLUDED.is_active,
+                   write_date = EXCLUDED.write_date
+        """, params)
+        self.invalidate_model()
+        if bond_ids is None:
+            _logger.info(f"[BOND] Built analytics for {len(values)} bonds in {session.name}")
+        return len(values)
+    
+    @api.model
+    def _get_metrics(self, session, bond_ids):
+        """Stored analytics of ``session`` keyed by bond id, as _bond_metrics tuples"""
+        if not bond_ids:
+            return {}
+        self.env.cr.execute(
+            "SELECT bond_id, " + ", ".join(self._METRIC_COLUMNS) +
+            " FROM stock_bond_analytics WHERE session_id = %s AND bond_id IN %s",
+            [session.id, tuple(bond_ids)]
+        )
+        return {row[0]: row[1:] for row in self.env.cr.fetchall()}
@@ -2,6 +2,10 @@
 
 from odoo import models, fields, api
 from odoo.exceptions import ValidationError
+from psycopg2.errors import LockNotAvailable
+import logging
+
+_logger = logging.getLogger(__name__)
 
 class StockBondOrder(models.Model):
     _name = 'stock.bond.order'
@@ -215,12 +219,31 @@ class StockBondOrder(models.Model):
         return order
     
     def action_submit(self):
-        """Submit order for processing"""
+        """Submit order to the bond book and match it right away"""
         self.ensure_one()
         if self.status == 'draft':
             self._validate_order()
-            self.status = 'submitted'
+            self.status = 'open'
             self.message_post(body="Bond order submitted for processing")
+            if self.session_id.state == 'open':
+                # Match on arrival instead of waiting for the matching cron; when the
+                # cron holds the bond's book the order simply rests until its next pass
+                try:
+                    with self.env.cr.savepoint():
+                        self.env['stock.matching.engine'].sudo().with_engine_context()._match_bond_orders(
+                            self.bond_id, self.session_id
+                        )
+                except LockNotAvailable:
+                    _logger.info(f"[MATCH][BOND] {self.bond_id.symbol} book busy, {self.name} left open for the matching cron")
+    
+    def update_filled_quantity(self, quantity):
+        """Add a fill and move the order to partial/filled in one write"""
+        self.ensure_one()
+        filled = self.filled_quantity + quantity
+        self.write({
+            'filled_quantity': filled,
+            'status': 'filled' if filled >= self.quantity else 'partial',
+        })
     
     def action_cancel(self):
         """Cancel the order"""
@@ -237,13 +260,16 @@ class StockBondOrder(models.Model):
         if not self.bond_id.is_active:
             raise ValidationError(f"Bond {self.bond_id.symbol} is not currently tradeable.")
         
-        # Check user cash balance for buy orders
+        # Check user cash balance for buy orders (clean price + accrued interest + commission)
         if self.side == 'buy':
-            required_cash = self.quantity * self.price
-            if self.user_id.cash_balance < required_cash:
+            price = self.price if self.order_type == 'limit' else self.bond_id.calculate_bond_price_by_time()
+            clean_value = self.quantity * price
+            required_cash = (clean_value + self.quantity * self.bond_id.accrued_interest
+                             + clean_value * (self.session_id.broker_commission_rate or 0.0) / 100)
+            if self.user_id.available_cash < required_cash:
                 raise ValidationError(
                     f"Insufficient funds. Required: ${required_cash:,.2f}, "
-                    f"Available: ${self.user_id.cash_balance:,.2f}"
+                    f"Available: ${self.user_id.available_cash:,.2f}"
                 )
         
         # Check user bond holdings for sell orders
@@ -358,10 +384,45 @@ class StockBondTrade(models.Model):
         readonly=True
     )
     
-    @api.depends('quantity', 'price')
+    # Settlement
+    accrued_interest = fields.Float(
+        string='Accrued Interest per Bond',
+        digits=(16, 4),
+        readonly=True,
+        help='Interest accrued at trade time, paid by the buyer to the seller'
+    )
+    
+    accrued_amount = fields.Float(
+        string='Accrued Interest',
+        digits='Product Price',
+        readonly=True
+    )
+    
+    buy_commission = fields.Float(
+        string='Buyer Commission',
+        digits='Product Price',
+        readonly=True
+    )
+    
+    sell_commission = fields.Float(
+        string='Seller Commission',
+        digits='Product Price',
+        readonly=True
+    )
+    
+    settlement_amount = fields.Float(
+        string='Settlement Amount',
+        compute='_compute_trade_value',
+        digits='Product Price',
+        store=True,
+        help='Clean value plus accrued interest (dirty price x quantity)'
+    )
+    
+    @api.depends('quantity', 'price', 'accrued_amount')
     def _compute_trade_value(self):
         for trade in self:
             trade.trade_value = trade.quantity * trade.price
+            trade.settlement_amount = trade.trade_value + trade.accrued_amount
 
 
 class StockBondPosition(models.Model):
@@ -423,6 +484,13 @@ class StockBondPosition(models.Model):
         help='Current market value'
     )
     
+    theoretical_value = fields.Float(
+        string='Theoretical Value',
+        compute='_compute_theoretical_value',
+        digits='Product Price',
+        help='Position valued at the session theoretical price plus accrued interest'
+    )
+    
     unrealized_pnl = fields.Float(
         string='Unrealized P&L',
         compute='_compute_pnl',
@@ -442,6 +510,14 @@ class StockBondPosition(models.Model):
         for position in self:
             position.current_value = position.quantity * position.bond_id.current_price
     
+    @api.depends('quantity', 'bond_id')
+    def _compute_theoretical_value(self):
+        # One analytics lookup for all bonds held by the positions in self
+        metrics = self.bond_id._get_session_metrics() if self.bond_id else {}
+        for position in self:
+            values = metrics.get(position.bond_id.id)
+            position.theoretical_value = position.quantity * (values[1] + values[2]) if values else 0.0
+    
     @api.depends('current_value', 'total_cost')
     def _compute_pnl(self):
         for position in self:
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, api
+
+
+class StockCommissionAnalytics(models.AbstractModel):
+    """Commission totals, per-broker breakdowns and per-session series from grouped SQL"""
+    _name = 'stock.commission.analytics'
+    _description = 'Commission Analytics'
+
+    # One row per commission leg: the buy side and the sell side of each trade,
+    # attributed to the user who entered the order
+    _LEGS_QUERY = """
+        SELECT t.session_id, o.entered_by_id AS broker_id, t.buy_commission AS commission
+          FROM stock_trade t
+          JOIN stock_order o ON o.id = t.buy_order_id
+        UNION ALL
+        SELECT t.session_id, o.entered_by_id AS broker_id, t.sell_commission AS commission
+          FROM stock_trade t
+          JOIN stock_order o ON o.id = t.sell_order_id
+    """
+
+    def _flush(self):
+        self.env['stock.trade'].flush_model(['session_id', 'buy_order_id', 'sell_order_id',
+                                             'buy_commission', 'sell_commission'])
+        self.env['stock.order'].flush_model(['entered_by_id'])
+
+    @api.model
+    def get_totals(self, session_id=None):
+        """{'total': commission of all trades, 'trade_count': number of trades}"""
+        self._flush()
+        query = """
+            SELECT COALESCE(SUM(COALESCE(buy_commission, 0) + COALESCE(sell_commission, 0)), 0), COUNT(*)
+              FROM stock_trade
+        """
+        params = []
+        if session_id:
+            query += " WHERE session_id = %s"
+            params.append(session_id)
+        self.env.cr.execute(query, params)
+        total, count = self.env.cr.fetchone()
+        return {'total': total, 'trade_count': count}
+
+    @api.model
+    def get_broker_breakdown(self, broker_ids=None, session_id=None):
+        """{broker_id: {'total': commission, 'trades': legs handled}} for brokers with commission"""
+        self._flush()
+        query = f"SELECT broker_id, SUM(commission), COUNT(*) FROM ({self._LEGS_QUERY}) legs WHERE broker_id IS NOT NULL"
+        params = []
+        if broker_ids is not None:
+            if not broker_ids:
+                return {}
+            query += " AND broker_id IN %s"
+            params.append(tuple(broker_ids))
+        if session_id:
+            query += " AND session_id = %s"
+            params.append(session_id)
+        self.env.cr.execute(query + " GROUP BY broker_id HAVING SUM(commission) > 0", params)
+        return {
+            broker_id: {'total': total, 'trades': count}
+            for broker_id, total, count in self.env.cr.fetchall()
+        }
+
+    @api.model
+    def get_session_series(self):
+        """[(session_id, session_name, commission)] in session order, sessions with trades only"""
+        self._flush()
+        self.env.cr.execute("""
+            SELECT s.id, s.name, SUM(COALESCE(t.buy_commission, 0) + COALESCE(t.sell_commission, 0))
+              FROM stock_trade t
+              JOIN stock_session s ON s.id = t.session_id
+          GROUP BY s.id, s.name, s.session_number
+          ORDER BY s.session_number, s.id
+        """)
+        return self.env.cr.fetchall()
+
+    @api.model
+    def get_recent_broker_trades(self, broker_id, limit=10):
+        """Latest trades in which ``broker_id`` entered either side"""
+        return self.env['stock.trade'].search([
+            '|',
+            ('buy_order_id.entered_by_id', '=', broker_id),
+            ('sell_order_id.entered_by_id', '=', broker_id),
+        ], order='trade_date desc, id desc', limit=limit)
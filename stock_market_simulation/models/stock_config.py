@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
 from odoo.exceptions import ValidationError
 
 
@@ -175,6 +175,57 @@ class StockConfig(models.Model):
         help="Volatility percentage that triggers risk alerts"
     )
     
+    # News Impact
+    news_impact_enabled = fields.Boolean(
+        string='Apply News Price Impact',
+        default=True,
+        help="Shock the prices of the targeted securities when a news item goes active"
+    )
+    
+    news_default_impact = fields.Float(
+        string='Default News Impact (%)',
+        default=2.0,
+        help="Price shock of news without an impact magnitude (doubled for very positive/negative news)"
+    )
+    
+    news_sector_impact_factor = fields.Float(
+        string='Sector News Impact Factor',
+        default=0.5,
+        help="Share of the shock applied to each security of a targeted sector"
+    )
+    
+    # Request Profiling
+    perf_profiling_enabled = fields.Boolean(
+        string='Profile Portal Requests',
+        default=False,
+        help="Record wall time, SQL queries and ORM cache misses of every portal request"
+    )
+    
+    perf_buffer_size = fields.Integer(
+        string='Profiles Kept',
+        default=500,
+        help="Most recent request profiles kept in memory by each worker"
+    )
+    
+    perf_slow_query_count = fields.Integer(
+        string='Slow Queries per Request',
+        default=5,
+        help="Slowest SQL statements kept with each request profile"
+    )
+    
+    perf_log_export = fields.Boolean(
+        string='Export Profiles to Log',
+        default=False,
+        help="Also write every request profile as one JSON line to the server log"
+    )
+    
+    load_test_headers_enabled = fields.Boolean(
+        string='Load-Test Query Headers',
+        default=False,
+        help="Return SQL query counts and timings to requests sent by the load generator (load_test.py). "
+             "Leave off in production: the headers expose per-request database timings"
+    )
+    
     # Notifications
     send_margin_call_notifications = fields.Boolean(
         string='Send Margin Call Notifications',
@@ -206,6 +257,38 @@ class StockConfig(models.Model):
             })
         return config
     
+    # Read on every request by the profiling hook in ir.http
+    PERF_FIELDS = ('perf_profiling_enabled', 'perf_buffer_size', 'perf_slow_query_count', 'perf_log_export',
+                   'load_test_headers_enabled')
+    
+    @api.model
+    @tools.ormcache('self.env.company.id')
+    def _get_perf_settings(self):
+        """(enabled, buffer size, slow queries kept, log export) of the request profiler"""
+        config = self.sudo().search([('company_id', '=', self.env.company.id)], limit=1)
+        if not config or not config.perf_profiling_enabled:
+            return (False, 0, 0, False)
+        return (True, max(config.perf_buffer_size, 1), max(config.perf_slow_query_count, 0), config.perf_log_export)
+    
+    @api.model
+    @tools.ormcache('self.env.company.id')
+    def _get_load_test_headers_enabled(self):
+        """Whether load-test clients get the query counters back (see ir.http)"""
+        config = self.sudo().search([('company_id', '=', self.env.company.id)], limit=1)
+        return bool(config.load_test_headers_enabled)
+    
+    @api.model_create_multi
+    def create(self, vals_list):
+        configs = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return configs
+    
+    def write(self, vals):
+        res = super().write(vals)
+        if any(field in vals for field in self.PERF_FIELDS):
+            self.env.registry.clear_cache()
+        return res
+    
     @api.constrains('default_penalty_rate', 'loan_default_days', 'min_order_value')
     def _check_values(self):
         for config in self:
@@ -29,6 +29,7 @@ class StockDeposit(models.Model):
         states={'draft': [('readonly', False)]},
         readonly=True,
         domain=[('user_type', '=', 'investor')],
+        index=True,
         tracking=True
     )
     
@@ -39,6 +40,7 @@ class StockDeposit(models.Model):
         states={'draft': [('readonly', False)]},
         readonly=True,
         domain=[('user_type', '=', 'banker')],
+        index=True,
         tracking=True
     )
     
@@ -86,6 +88,14 @@ class StockDeposit(models.Model):
         help='Session when deposit was created'
     )
     
+    maturity_session_number = fields.Integer(
+        string='Maturity Session Number',
+        compute='_compute_maturity_session',
+        store=True,
+        index=True,
+        help='Session number at which the deposit matures'
+    )
+    
     maturity_session_id = fields.Many2one(
         'stock.session',
         string='Maturity Session',
@@ -155,34 +165,29 @@ class StockDeposit(models.Model):
         readonly=True
     )
     
-    @api.depends('deposit_session_id', 'term_sessions')
+    @api.depends('deposit_session_id.session_number', 'term_sessions')
     def _compute_maturity_session(self):
+        Session = self.env['stock.session']
         for deposit in self:
             if deposit.deposit_session_id and deposit.term_sessions:
-                # Find the session that is term_sessions after the deposit session
-                all_sessions = self.env['stock.session'].search([
-                    ('session_number', '>=', deposit.deposit_session_id.session_number)
-                ], order='session_number')
-                
-                if len(all_sessions) >= deposit.term_sessions:
-                    deposit.maturity_session_id = all_sessions[deposit.term_sessions - 1]
-                else:
-                    deposit.maturity_session_id = False
+                # Maturity is term_sessions sessions on the clock, counting the deposit session
+                number = deposit.deposit_session_id.session_number + deposit.term_sessions - 1
+                deposit.maturity_session_number = number
+                entry = Session._calendar_session(number)
+                deposit.maturity_session_id = entry[1] if entry else False
             else:
+                deposit.maturity_session_number = 0
                 deposit.maturity_session_id = False
     
     @api.depends('amount', 'interest_rate', 'deposit_session_id', 'status')
     def _compute_interest(self):
         for deposit in self:
             if deposit.status in ['active', 'matured', 'withdrawn']:
-                # Calculate sessions elapsed
-                current_session = self.env['stock.session'].search([('state', '=', 'open')], limit=1)
-                if not current_session:
-                    # Use latest session if no open session
-                    current_session = self.env['stock.session'].search([], order='session_number desc', limit=1)
+                # Calculate sessions elapsed (latest session if no open session)
+                session_num = self.env['stock.session']._get_clock_session_number()
                 
-                if current_session and deposit.deposit_session_id:
-                    sessions_elapsed = max(0, current_session.session_number - deposit.deposit_session_id.session_number + 1)
+                if session_num and deposit.deposit_session_id:
+                    sessions_elapsed = max(0, session_num - deposit.deposit_session_id.session_number + 1)
                 else:
                     sessions_elapsed = 0
                 
@@ -193,7 +198,7 @@ class StockDeposit(models.Model):
                 deposit.accrued_interest = (deposit.amount * session_interest_rate * sessions_elapsed) / 100
                 
                 # Maturity amount
-                if deposit.maturity_session_id and deposit.term_sessions:
+                if deposit.maturity_session_number and deposit.term_sessions:
                     maturity_interest = (deposit.amount * session_interest_rate * deposit.term_sessions) / 100
                     deposit.maturity_amount = deposit.amount + maturity_interest
                 else:
@@ -205,14 +210,13 @@ class StockDeposit(models.Model):
                 deposit.maturity_amount = deposit.amount
                 deposit.current_value = deposit.amount
     
-    @api.depends('maturity_session_id', 'status')
+    @api.depends('maturity_session_number', 'status')
     def _compute_sessions_to_maturity(self):
+        session_num = self.env['stock.session']._get_current_session_number()
         for deposit in self:
-            if deposit.maturity_session_id and deposit.status == 'active':
-                # Get current session
-                current_session = self.env['stock.session'].search([('state', '=', 'open')], limit=1)
-                if current_session:
-                    sessions_diff = deposit.maturity_session_id.session_number - current_session.session_number
+            if deposit.maturity_session_number and deposit.status == 'active':
+                if session_num:
+                    sessions_diff = deposit.maturity_session_number - session_num
                     deposit.sessions_to_maturity = max(0, sessions_diff)
                 else:
                     deposit.sessions_to_maturity = 0
@@ -291,14 +295,12 @@ class StockDeposit(models.Model):
                 raise UserError("Only active deposits can be matured.")
             
             # Check if deposit has reached maturity session
-            current_session = self.env['stock.session'].search([('state', '=', 'open')], limit=1)
-            if not current_session:
-                current_session = self.env['stock.session'].search([], order='session_number desc', limit=1)
+            session_num = self.env['stock.session']._get_clock_session_number()
             
-            if deposit.maturity_session_id and current_session:
-                if current_session.session_number < deposit.maturity_session_id.session_number:
+            if deposit.maturity_session_number and session_num:
+                if session_num < deposit.maturity_session_number:
                     raise UserError(
-                        f"Deposit has not reached maturity session ({deposit.maturity_session_id.name})."
+                        f"Deposit has not reached maturity session (Session {deposit.maturity_session_number:02d})."
                     )
             
             deposit.status = 'matured'
@@ -310,15 +312,13 @@ class StockDeposit(models.Model):
             if deposit.status not in ['active', 'matured']:
                 raise UserError("Only active or matured deposits can be withdrawn.")
             
-            # Get current session
-            current_session = self.env['stock.session'].search([('state', '=', 'open')], limit=1)
-            if not current_session:
-                current_session = self.env['stock.session'].search([], order='session_number desc', limit=1)
+            # Get current session number
+            session_num = self.env['stock.session']._get_clock_session_number()
             
             # Calculate withdrawal amount
             early_withdrawal = False
-            if deposit.status == 'active' and deposit.maturity_session_id and current_session:
-                if current_session.session_number < deposit.maturity_session_id.session_number:
+            if deposit.status == 'active' and deposit.maturity_session_number and session_num:
+                if session_num < deposit.maturity_session_number:
                     early_withdrawal = True
             
             if early_withdrawal:
@@ -415,15 +415,13 @@ class StockDeposit(models.Model):
     @api.model
     def check_matured_deposits(self):
         """Check for deposits that have reached maturity session"""
-        current_session = self.env['stock.session'].search([('state', '=', 'open')], limit=1)
-        if not current_session:
-            current_session = self.env['stock.session'].search([], order='session_number desc', limit=1)
+        session_num = self.env['stock.session']._get_clock_session_number()
         
-        if current_session:
+        if session_num:
             matured_deposits = self.search([
                 ('status', '=', 'active'),
-                ('maturity_session_id', '!=', False),
-                ('maturity_session_id.session_number', '<=', current_session.session_number)
+                ('maturity_session_number', '>', 0),
+                ('maturity_session_number', '<=', session_num)
             ])
             
             for deposit in matured_deposits:
@@ -435,6 +433,33 @@ class StockDeposit(models.Model):
                         message_type='comment'
                     )
     
+    @api.model
+    def get_portal_summary(self, domain):
+        """
+        Totals for the deposits listing from grouped reads.
+
+        Active deposits are grouped by (deposit session, rate), which is all the
+        accrual of _compute_interest depends on besides the principal.
+        """
+        [(total_deposits,)] = self._read_group(domain, aggregates=['amount:sum'])
+        session_num = self.env['stock.session']._get_clock_session_number()
+        active_count = 0
+        total_active_value = total_interest_earned = 0.0
+        for session, rate, amount, count in self._read_group(
+            domain + [('status', '=', 'active')], ['deposit_session_id', 'interest_rate'], ['amount:sum', '__count'],
+        ):
+            sessions_elapsed = max(0, session_num - session.session_number + 1) if session_num and session else 0
+            interest = (amount * rate / 12 * sessions_elapsed) / 100
+            active_count += count
+            total_active_value += amount + interest
+            total_interest_earned += interest
+        return {
+            'total_deposits': total_deposits or 0.0,
+            'total_active_value': total_active_value,
+            'total_interest_earned': total_interest_earned,
+            'active_count': active_count,
+        }
+
     def _calculate_interest(self):
         """Calculate and apply interest for active deposits (called at session end)"""
         self.ensure_one()
@@ -1,8 +1,8 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
 from odoo.exceptions import ValidationError, UserError
-from datetime import datetime, timedelta
+from datetime import timedelta
 import logging
 
 _logger = logging.getLogger(__name__)
@@ -29,6 +29,7 @@ class StockLoan(models.Model):
         states={'draft': [('readonly', False)]},
         readonly=True,
         domain=[('user_type', '=', 'investor')],
+        index=True,
         tracking=True
     )
     
@@ -39,6 +40,7 @@ class StockLoan(models.Model):
         states={'draft': [('readonly', False)]},
         readonly=True,
         domain=[('user_type', '=', 'banker')],
+        index=True,
         tracking=True
     )
     
@@ -116,6 +118,14 @@ class StockLoan(models.Model):
         help='Session when loan was disbursed'
     )
     
+    maturity_session_number = fields.Integer(
+        string='Maturity Session Number',
+        compute='_compute_maturity_session',
+        store=True,
+        index=True,
+        help='Session number at which the loan matures'
+    )
+    
     maturity_session_id = fields.Many2one(
         'stock.session',
         string='Maturity Session',
@@ -196,6 +206,12 @@ class StockLoan(models.Model):
         tracking=True
     )
     
+    margin_call_date = fields.Datetime(
+        string='Margin Call Date',
+        readonly=True,
+        help='When the margin call fired; collateral is liquidated once the grace period has elapsed'
+    )
+    
     penalty_amount = fields.Float(
         string='Penalty Amount',
         digits='Product Price',
@@ -209,6 +225,18 @@ class StockLoan(models.Model):
         help='Trading session when loan was created'
     )
     
+    # Loan types whose collateral is watched by the margin monitor
+    _MARGIN_LOAN_TYPES = ('margin', 'secured')
+    
+    def init(self):
+        # Margin monitor index: per collateral security, the loans still at risk ordered
+        # by trigger price, so a price update reads only the loans it crossed
+        tools.create_index(
+            self.env.cr, 'stock_loan_margin_watch_index', self._table,
+            ['collateral_security_id', 'margin_call_price DESC'],
+            where="status = 'active' AND margin_call_triggered IS NOT TRUE AND loan_type IN ('margin', 'secured')",
+        )
+    
     @api.depends('collateral_security_id', 'collateral_quantity')
     def _compute_collateral_value(self):
         for loan in self:
@@ -228,33 +256,28 @@ class StockLoan(models.Model):
             else:
                 loan.ltv_ratio = 0.0
     
-    @api.depends('disbursement_session_id', 'term_sessions')
+    @api.depends('disbursement_session_id.session_number', 'term_sessions')
     def _compute_maturity_session(self):
+        Session = self.env['stock.session']
         for loan in self:
             if loan.disbursement_session_id and loan.term_sessions:
-                # Find the session that is term_sessions after the disbursement session
-                all_sessions = self.env['stock.session'].search([
-                    ('session_number', '>=', loan.disbursement_session_id.session_number)
-                ], order='session_number')
-                
-                if len(all_sessions) >= loan.term_sessions:
-                    loan.maturity_session_id = all_sessions[loan.term_sessions - 1]
-                else:
-                    loan.maturity_session_id = False
+                # Maturity is term_sessions sessions on the clock, counting the disbursement session
+                number = loan.disbursement_session_id.session_number + loan.term_sessions - 1
+                loan.maturity_session_number = number
+                entry = Session._calendar_session(number)
+                loan.maturity_session_id = entry[1] if entry else False
             else:
+                loan.maturity_session_number = 0
                 loan.maturity_session_id = False
     
     @api.depends('principal_outstanding', 'interest_rate', 'disbursement_session_id', 'status', 'penalty_amount')
     def _compute_interest(self):
+        # Sessions elapsed are counted on the clock (latest session if no open session)
+        session_num = self.env['stock.session']._get_clock_session_number()
         for loan in self:
             if loan.status == 'active' and loan.disbursement_session_id:
-                # Calculate sessions elapsed
-                current_session = self.env['stock.session'].search([('state', '=', 'open')], limit=1)
-                if not current_session:
-                    current_session = self.env['stock.session'].search([], order='session_number desc', limit=1)
-                
-                if current_session:
-                    sessions_elapsed = max(0, current_session.session_number - loan.disbursement_session_id.session_number + 1)
+                if session_num:
+                    sessions_elapsed = max(0, session_num - loan.disbursement_session_id.session_number + 1)
                 else:
                     sessions_elapsed = 0
                 # Session-based interest calculation
@@ -275,23 +298,29 @@ class StockLoan(models.Model):
     
     @api.depends('amount', 'interest_rate', 'term_sessions')
     def _compute_emi(self):
+        # EMI on the reducing balance method (session-based, ~12 trading sessions per year);
+        # loans with identical terms share one cached schedule
+        Amortization = self.env['stock.loan.amortization']
         for loan in self:
             if loan.amount > 0 and loan.interest_rate > 0 and loan.term_sessions > 0:
-                # EMI calculation using reducing balance method (session-based)
-                # Convert annual rate to per-session rate (assuming ~12 trading sessions per year)
-                sessions_per_year = 12
-                r = loan.interest_rate / (sessions_per_year * 100)  # Session interest rate
-                n = loan.term_sessions
-                
-                if r > 0:
-                    emi = loan.amount * r * ((1 + r) ** n) / (((1 + r) ** n) - 1)
-                else:
-                    emi = loan.amount / n
-                
-                loan.emi_amount = round(emi, 2)
+                loan.emi_amount = round(Amortization.get_emi(loan.amount, loan.interest_rate, loan.term_sessions), 2)
             else:
                 loan.emi_amount = 0.0
     
+    def get_amortization_schedule(self):
+        """Per-session schedule (payment, principal, interest, balance) of this loan"""
+        self.ensure_one()
+        return self.env['stock.loan.amortization'].get_schedule(self.amount, self.interest_rate, self.term_sessions)
+    
+    def _filter_overdue(self):
+        """Active loans behind their amortization schedule whose next payment date has passed"""
+        active = self.filtered(lambda loan: loan.status == 'active')
+        arrears = self.env['stock.loan.amortization'].get_arrears(active)
+        today = fields.Date.today()
+        return active.filtered(
+            lambda loan: loan.id in arrears and loan.next_payment_date and loan.next_payment_date < today
+        )
+    
     @api.depends('payment_ids.amount')
     def _compute_payments(self):
         for loan in self:
@@ -299,22 +328,18 @@ class StockLoan(models.Model):
     
     @api.depends('payment_ids.payment_session_id', 'disbursement_session_id', 'status')
     def _compute_next_payment(self):
+        Session = self.env['stock.session']
         for loan in self:
             if loan.status == 'active' and loan.disbursement_session_id:
-                # For session-based loans, next payment is due next session
-                last_payment = loan.payment_ids.sorted('payment_session_id', reverse=True)[:1]
-                if last_payment and last_payment.payment_session_id:
-                    # Find next session after last payment
-                    next_session = self.env['stock.session'].search([
-                        ('session_number', '>', last_payment.payment_session_id.session_number)
-                    ], limit=1, order='session_number asc')
-                    loan.next_payment_date = next_session.date if next_session else False
-                else:
-                    # First payment due next session after disbursement
-                    next_session = self.env['stock.session'].search([
-                        ('session_number', '>', loan.disbursement_session_id.session_number)
-                    ], limit=1, order='session_number asc')
-                    loan.next_payment_date = next_session.date if next_session else False
+                # For session-based loans, next payment is due the session after the
+                # last payment, or after disbursement when nothing has been paid yet
+                last_paid = max(
+                    (Session._calendar_session_number(sid) for sid in loan.payment_ids.payment_session_id.ids),
+                    default=0,
+                )
+                after = last_paid or Session._calendar_session_number(loan.disbursement_session_id.id)
+                next_session = Session._calendar_nth_after(after)
+                loan.next_payment_date = next_session[2].date() if next_session and next_session[2] else False
             else:
                 loan.next_payment_date = False
     
@@ -443,76 +468,150 @@ class StockLoan(models.Model):
         """Check if margin call is triggered"""
         self.ensure_one()
         
-        if (self.loan_type in ['margin', 'secured'] and 
+        if (self.loan_type in self._MARGIN_LOAN_TYPES and 
             self.collateral_security_id and 
             self.status == 'active'):
             
             current_price = self.collateral_security_id.current_price
             
             if current_price <= self.margin_call_price and not self.margin_call_triggered:
-                # Trigger margin call
-                self.margin_call_triggered = True
-                self.message_post(
-                    body=f"⚠️ MARGIN CALL: {self.collateral_security_id.symbol} "
-                         f"price ({current_price}) has fallen below margin call level "
-                         f"({self.margin_call_price})",
-                    message_type='comment',
-                    subtype_xmlid='mail.mt_comment'
-                )
-                
-                # Execute margin call after grace period
-                self.with_delay(eta=datetime.now() + timedelta(hours=24)).execute_margin_call()
-                
+                self._trigger_margin_calls()
                 return True
         
         return False
     
+    @api.model
+    def _on_collateral_price_update(self, prices):
+        """
+        Margin monitor entry point, called for every collateral price change.
+        
+        ``prices`` maps security id to its new price. The loans whose
+        margin_call_price was crossed are read with one range scan of the margin
+        watch index per security; the rest of the loan book is never touched.
+        """
+        prices = {security_id: price for security_id, price in prices.items() if price}
+        if not prices:
+            return self.browse()
+        self.flush_model(['collateral_security_id', 'margin_call_price', 'status',
+                          'margin_call_triggered', 'loan_type'])
+        self.env.cr.execute("""
+            SELECT l.id
+              FROM stock_loan l
+              JOIN (VALUES """ + ", ".join(["(%s, %s::numeric)"] * len(prices)) + """) AS p(security_id, price)
+                ON l.collateral_security_id = p.security_id
+             WHERE l.margin_call_price >= p.price
+               AND l.status = 'active'
+               AND l.margin_call_triggered IS NOT TRUE
+               AND l.loan_type IN ('margin', 'secured')
+        """, [value for item in prices.items() for value in item])
+        loans = self.browse([row[0] for row in self.env.cr.fetchall()])
+        if loans:
+            loans._trigger_margin_calls()
+        return loans
+    
+    def _trigger_margin_calls(self):
+        """Flag the margin calls, notify, and liquidate at once when there is no grace period"""
+        if not self:
+            return
+        self.write({'margin_call_triggered': True, 'margin_call_date': fields.Datetime.now()})
+        for loan in self:
+            loan.message_post(
+                body=f"⚠️ MARGIN CALL: {loan.collateral_security_id.symbol} "
+                     f"price ({loan.collateral_security_id.current_price}) has fallen below margin call level "
+                     f"({loan.margin_call_price})",
+                message_type='comment',
+                subtype_xmlid='mail.mt_comment'
+            )
+        _logger.info(f"[MARGIN] Margin call on {len(self)} loans: {', '.join(self.mapped('name'))}")
+        
+        config = self.env['stock.config'].get_config()
+        if config.auto_execute_margin_calls and not config.margin_call_grace_period:
+            self._liquidate_collateral()
+    
+    @api.model
+    def process_margin_calls(self, session=None):
+        """Liquidate, in one batch, the margin calls whose grace period has elapsed (run every matching cycle)"""
+        config = self.env['stock.config'].get_config()
+        if not config.auto_execute_margin_calls:
+            return self.env['stock.order']
+        deadline = fields.Datetime.now() - timedelta(hours=config.margin_call_grace_period or 0)
+        loans = self.search([
+            ('status', '=', 'active'),
+            ('loan_type', 'in', list(self._MARGIN_LOAN_TYPES)),
+            ('margin_call_triggered', '=', True),
+            ('margin_call_date', '<=', deadline),
+        ])
+        return loans._liquidate_collateral(session)
+    
     def execute_margin_call(self):
         """Execute margin call by liquidating collateral"""
-        self.ensure_one()
+        return self._liquidate_collateral()
+    
+    def _liquidate_collateral(self, session=None):
+        """
+        Submit market sell orders for the pledged collateral of the margin-called loans.
         
-        if (self.loan_type in ['margin', 'secured'] and 
-            self.status == 'active' and 
-            self.margin_call_triggered):
-            
-            # Get active session
-            active_session = self.env['stock.session'].search([
-                ('state', '=', 'open')
-            ], limit=1)
-            
-            if not active_session:
-                # Retry later if no active session
-                self.with_delay(eta=datetime.now() + timedelta(hours=1)).execute_margin_call()
-                return
-            
-            # Create sell order for collateral
-            order_vals = {
-                'user_id': self.user_id.id,
-                'security_id': self.collateral_security_id.id,
+        The orders are created and submitted as one batch; if the batch is rejected,
+        each loan is retried on its own so one bad position does not hold up the rest.
+        Loans are left untouched when no session is open and picked up by the next cycle.
+        """
+        loans = self.filtered(lambda l: l.loan_type in self._MARGIN_LOAN_TYPES
+                              and l.status == 'active' and l.margin_call_triggered)
+        active_session = session or self.env['stock.session'].search([('state', '=', 'open')], limit=1)
+        if not loans or not active_session:
+            return self.env['stock.order']
+        
+        try:
+            with self.env.cr.savepoint():
+                orders = loans._submit_liquidation_orders(active_session)
+        except Exception as e:
+            _logger.warning(f"[MARGIN] Batch liquidation of {len(loans)} loans failed ({e}); retrying per loan")
+            orders = self.env['stock.order']
+            for loan in loans:
+                try:
+                    with self.env.cr.savepoint():
+                        orders |= loan._submit_liquidation_orders(active_session)
+                except Exception as e:
+                    loan.message_post(
+                        body=f"Failed to execute margin call: {str(e)}",
+                        message_type='comment'
+                    )
+        return orders
+    
+    def _submit_liquidation_orders(self, session):
+        """Release the pledged shares and sell them with one create and one submit"""
+        positions = self.env['stock.position'].search([
+            ('user_id', 'in', self.user_id.ids),
+            ('security_id', 'in', self.collateral_security_id.ids),
+        ])
+        position_by_key = {(p.user_id.id, p.security_id.id): p for p in positions}
+        vals_list = []
+        for loan in self:
+            position = position_by_key.get((loan.user_id.id, loan.collateral_security_id.id))
+            if position and position.blocked_quantity:
+                # Collateral was blocked at disbursement; the sell order reserves it again
+                position.unblock_shares(min(loan.collateral_quantity, position.blocked_quantity))
+            vals_list.append({
+                'user_id': loan.user_id.id,
+                'security_id': loan.collateral_security_id.id,
                 'side': 'sell',
                 'order_type': 'market',
-                'quantity': self.collateral_quantity,
-                'session_id': active_session.id,
-                'description': f'Margin call liquidation for loan {self.name}'
-            }
-            
-            try:
-                order = self.env['stock.order'].create(order_vals)
-                order.action_submit()
-                
-                self.message_post(
-                    body=f"Margin call executed - liquidating {self.collateral_quantity} "
-                         f"shares of {self.collateral_security_id.symbol}"
-                )
-                
-                # Mark loan as defaulted
-                self.status = 'defaulted'
-                
-            except Exception as e:
-                self.message_post(
-                    body=f"Failed to execute margin call: {str(e)}",
-                    message_type='comment'
-                )
+                'quantity': loan.collateral_quantity,
+                'session_id': session.id,
+                'description': f'Margin call liquidation for loan {loan.name}'
+            })
+        orders = self.env['stock.order'].create(vals_list)
+        orders.action_submit()
+        
+        # Mark loans as defaulted
+        self.write({'status': 'defaulted'})
+        for loan in self:
+            loan.message_post(
+                body=f"Margin call executed - liquidating {loan.collateral_quantity} "
+                     f"shares of {loan.collateral_security_id.symbol}"
+            )
+        _logger.info(f"[MARGIN] Submitted {len(orders)} liquidation orders")
+        return orders
     
     def apply_default_penalty(self):
         """Apply penalties for overdue payments"""
@@ -559,10 +658,8 @@ class StockLoan(models.Model):
     @api.model
     def check_overdue_loans(self):
         """Cron job to check for overdue loans and apply penalties"""
-        overdue_loans = self.search([
-            ('status', '=', 'active'),
-            ('next_payment_date', '<', fields.Date.today())
-        ])
+        # One projection of the active book finds the loans behind schedule
+        overdue_loans = self.search([('status', '=', 'active')])._filter_overdue()
         
         for loan in overdue_loans:
             try:
@@ -573,22 +670,49 @@ class StockLoan(models.Model):
                     message_type='comment'
                 )
         
-        # Also check for margin calls
-        margin_loans = self.search([
+        # Margin calls fire on price updates; as a safety net, probe the margin
+        # watch index once per collateral security at its current price
+        securities = self._read_group([
             ('status', '=', 'active'),
-            ('loan_type', 'in', ['margin', 'secured']),
-            ('margin_call_triggered', '=', False)
-        ])
-        
-        for loan in margin_loans:
-            try:
-                loan.check_margin_call()
-            except Exception as e:
-                loan.message_post(
-                    body=f"Failed to check margin call: {str(e)}",
-                    message_type='comment'
-                )
+            ('loan_type', 'in', list(self._MARGIN_LOAN_TYPES)),
+            ('margin_call_triggered', '=', False),
+        ], ['collateral_security_id'])
+        try:
+            self._on_collateral_price_update({
+                security.id: security.current_price for (security,) in securities if security
+            })
+        except Exception as e:
+            _logger.error(f"[MARGIN] Margin call sweep failed: {e}")
     
+    @api.model
+    def get_portal_summary(self, domain):
+        """
+        Totals for the loans listing from grouped reads.
+
+        Active loans are grouped by (disbursement session, rate), which is all the
+        accrual of _compute_interest depends on besides the outstanding principal.
+        """
+        [(total_loans,)] = self._read_group(domain, aggregates=['amount:sum'])
+        [(total_paid,)] = self.env['stock.loan.payment']._read_group(
+            [('loan_id', 'any', domain)], aggregates=['amount:sum'],
+        )
+        session_num = self.env['stock.session']._get_clock_session_number()
+        active_count = 0
+        total_outstanding = 0.0
+        for session, rate, principal, penalty, count in self._read_group(
+            domain + [('status', '=', 'active')], ['disbursement_session_id', 'interest_rate'],
+            ['principal_outstanding:sum', 'penalty_amount:sum', '__count'],
+        ):
+            sessions_elapsed = max(0, session_num - session.session_number + 1) if session_num and session else 0
+            active_count += count
+            total_outstanding += principal + penalty + (principal * rate / 12 * sessions_elapsed) / 100
+        return {
+            'total_loans': total_loans or 0.0,
+            'total_outstanding': total_outstanding,
+            'total_paid': total_paid or 0.0,
+            'active_count': active_count,
+        }
+
     def _calculate_interest(self):
         """Calculate and apply interest for active loans (called at session end)"""
         self.ensure_one()
@@ -599,9 +723,9 @@ class StockLoan(models.Model):
         try:
             # Calculate accrued interest (session-based)
             if self.disbursement_session_id:
-                current_session = self.env['stock.session'].search([('status', '=', 'active')], limit=1)
-                if current_session and current_session.session_number > self.disbursement_session_id.session_number:
-                    sessions_elapsed = current_session.session_number - self.disbursement_session_id.session_number
+                session_num = self.env['stock.session']._get_current_session_number()
+                if session_num > self.disbursement_session_id.session_number:
+                    sessions_elapsed = session_num - self.disbursement_session_id.session_number
                     if sessions_elapsed > 0:
                         # Interest per session = (annual_rate / 12 sessions per year)
                         session_interest_rate = self.interest_rate / 12
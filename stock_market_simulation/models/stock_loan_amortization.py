@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, api
+from functools import lru_cache
+from itertools import accumulate, repeat
+import operator
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Sessions per year used to turn the annual loan rate into a per-session rate
+SESSIONS_PER_YEAR = 12
+
+
+@lru_cache(maxsize=4096)
+def _amortization_schedule(amount, rate, term):
+    """
+    Reducing-balance schedule of one (amount, annual rate %, term) triple.
+
+    Returns (emi, principal, interest, balance) where the last three are tuples
+    with one entry per session. Every column comes from the closed form
+    balance_k = P * g^k - EMI * (g^k - 1) / r over one running array of powers
+    g^k, so a schedule costs a single pass whatever its length.
+    """
+    if amount <= 0 or term <= 0:
+        return 0.0, (), (), ()
+    r = rate / (SESSIONS_PER_YEAR * 100)
+    if r <= 0:
+        emi = amount / term
+        balance = tuple(amount - emi * k for k in range(1, term + 1))
+        return emi, tuple(repeat(emi, term)), tuple(repeat(0.0, term)), balance
+    g = 1 + r
+    powers = list(accumulate(repeat(g, term), operator.mul, initial=1.0))
+    emi = amount * r * powers[-1] / (powers[-1] - 1)
+    balances = [amount * p - emi * (p - 1) / r for p in powers]
+    interest = tuple(b * r for b in balances[:-1])
+    principal = tuple(emi - i for i in interest)
+    return emi, principal, interest, tuple(balances[1:])
+
+
+class StockLoanAmortization(models.AbstractModel):
+    """Amortization engine: per-session loan schedules and loan book projections"""
+    _name = 'stock.loan.amortization'
+    _description = 'Loan Amortization Engine'
+
+    @api.model
+    def get_emi(self, amount, rate, term):
+        """Installment due each session for ``amount`` at ``rate`` % a year over ``term`` sessions"""
+        return _amortization_schedule(float(amount), float(rate), int(term))[0]
+
+    @api.model
+    def get_schedule(self, amount, rate, term):
+        """Full schedule as template-ready rows (session, payment, principal, interest, balance)"""
+        emi, principal, interest, balance = _amortization_schedule(float(amount), float(rate), int(term))
+        return [{
+            'session': index + 1,
+            'payment': round(emi, 2),
+            'principal': round(p, 2),
+            'interest': round(i, 2),
+            'balance': round(max(b, 0.0), 2),
+        } for index, (p, i, b) in enumerate(zip(principal, interest, balance))]
+
+    @api.model
+    def _get_loan_terms(self, loans):
+        """{loan_id: (amount, rate, term, disbursement session number, principal outstanding)} in one query"""
+        if not loans:
+            return {}
+        loans.flush_model(['amount', 'interest_rate', 'term_sessions', 'disbursement_session_id',
+                           'principal_outstanding'])
+        self.env.cr.execute("""
+            SELECT l.id, l.amount, l.interest_rate, l.term_sessions, s.session_number, l.principal_outstanding
+              FROM stock_loan l
+         LEFT JOIN stock_session s ON s.id = l.disbursement_session_id
+             WHERE l.id IN %s
+        """, [tuple(loans.ids)])
+        return {row[0]: row[1:] for row in self.env.cr.fetchall()}
+
+    @api.model
+    def project_book(self, loans, session_number=None):
+        """
+        Remaining schedule of a whole loan book, summed per future session.
+
+        Loans sharing (amount, rate, term) share one cached schedule; each loan
+        contributes the rows not yet due on the session clock (installments fall
+        due from the session after disbursement). Returns parallel per-session
+        lists plus totals, each loan's scheduled balance today and the arrears
+        (principal outstanding above that balance) of loans behind schedule.
+        """
+        if session_number is None:
+            session_number = self.env['stock.session']._get_clock_session_number() or 0
+        principal_due, interest_due = [], []
+        scheduled_balance, arrears = {}, {}
+        for loan_id, (amount, rate, term, disbursed, outstanding) in self._get_loan_terms(loans).items():
+            _emi, principal, interest, balance = _amortization_schedule(
+                float(amount or 0), float(rate or 0), int(term or 0))
+            if not principal:
+                scheduled_balance[loan_id] = 0.0
+                continue
+            paid = min(max(0, session_number - disbursed), len(principal)) if disbursed else 0
+            scheduled_balance[loan_id] = max(balance[paid - 1], 0.0) if paid else float(amount)
+            if (outstanding or 0.0) - scheduled_balance[loan_id] > 0.01:
+                arrears[loan_id] = outstanding - scheduled_balance[loan_id]
+            remaining = len(principal) - paid
+            if len(principal_due) < remaining:
+                principal_due += [0.0] * (remaining - len(principal_due))
+                interest_due += [0.0] * (remaining - len(interest_due))
+            principal_due[:remaining] = map(operator.add, principal_due, principal[paid:])
+            interest_due[:remaining] = map(operator.add, interest_due, interest[paid:])
+        payment_due = list(map(operator.add, principal_due, interest_due))
+        return {
+            'sessions': list(range(session_number + 1, session_number + 1 + len(payment_due))),
+            'principal': principal_due,
+            'interest': interest_due,
+            'payment': payment_due,
+            'balance': list(accumulate(principal_due, operator.sub, initial=sum(principal_due)))[1:],
+            'total_principal': sum(principal_due),
+            'total_interest': sum(interest_due),
+            'scheduled_balance': scheduled_balance,
+            'arrears': arrears,
+        }
+
+    @api.model
+    def get_arrears(self, loans, session_number=None):
+        """{loan_id: principal outstanding above the scheduled balance} for loans behind schedule"""
+        return self.project_book(loans, session_number)['arrears']
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api
+from odoo.exceptions import ValidationError
+from datetime import timedelta
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class StockMarketMaker(models.Model):
+    """Synthetic liquidity provider quoting both sides of the book for a system account"""
+    _name = 'stock.market.maker'
+    _description = 'Market Maker'
+    _order = 'name'
+    _inherit = ['stock.message.mixin']
+
+    name = fields.Char(string='Name', required=True)
+    active = fields.Boolean(default=True)
+
+    user_id = fields.Many2one(
+        'res.users',
+        string='System Account',
+        required=True,
+        ondelete='restrict',
+        help='Account the quotes are placed for; its cash and positions fund the quotes'
+    )
+
+    security_ids = fields.Many2many(
+        'stock.security',
+        string='Securities',
+        help='Securities to quote (every trading security when empty)'
+    )
+
+    # Strategy
+    spread_pct = fields.Float(
+        string='Spread (%)',
+        default=1.0,
+        help='Distance between bid and ask, centred on the reference price'
+    )
+
+    quote_quantity = fields.Integer(
+        string='Quote Size',
+        default=100,
+        help='Shares quoted on each side (rounded down to the lot size)'
+    )
+
+    max_inventory = fields.Integer(
+        string='Max Inventory',
+        default=1000,
+        help='Shares held per security above which the bid is pulled'
+    )
+
+    inventory_skew = fields.Float(
+        string='Inventory Skew',
+        default=0.5,
+        help='Share of the half-spread both quotes shift down at full inventory (and up when flat)'
+    )
+
+    refresh_interval = fields.Integer(
+        string='Refresh Interval (s)',
+        default=60,
+        help='Minimum seconds between two quote refreshes'
+    )
+
+    last_refresh = fields.Datetime(string='Last Refresh', readonly=True, copy=False)
+
+    # Resting statuses of a live quote
+    _QUOTE_STATES = ('open', 'partial')
+
+    @api.constrains('spread_pct', 'quote_quantity', 'max_inventory', 'refresh_interval')
+    def _check_strategy(self):
+        for maker in self:
+            if maker.spread_pct <= 0:
+                raise ValidationError("Spread must be positive.")
+            if maker.quote_quantity <= 0 or maker.max_inventory <= 0:
+                raise ValidationError("Quote size and maximum inventory must be positive.")
+            if maker.refresh_interval < 0:
+                raise ValidationError("Refresh interval cannot be negative.")
+
+    @api.model
+    def run_quoting_cycle(self, session):
+        """
+        Refresh the quotes of every maker that is due, ahead of a matching pass.
+
+        Runs inside the matching cron's transaction: the book view is read once
+        for all makers and each maker costs a fixed handful of grouped
+        statements whatever the number of securities it quotes.
+        """
+        now = fields.Datetime.now()
+        makers = self.search([]).filtered(
+            lambda m: not m.last_refresh or m.last_refresh + timedelta(seconds=m.refresh_interval) <= now
+        )
+        if not makers:
+            return 0
+        book = self._load_book_view(session, makers.user_id.ids)
+        refreshed = self.browse()
+        for maker in makers:
+            try:
+                with self.env.cr.savepoint():
+                    maker._refresh_quotes(session, book)
+                refreshed |= maker
+            except Exception as e:
+                _logger.error(f"[MM] Quote refresh failed for {maker.name}: {e}")
+        refreshed.write({'last_refresh': now})
+        return len(refreshed)
+
+    @api.model
+    def _load_book_view(self, session, maker_user_ids):
+        """
+        In-memory view of the session's resting limit orders, read with one query.
+
+        {security_id: {'best_bid', 'best_ask', 'quotes': {(user_id, side): [(order_id, price, remaining)]}}}
+        where best bid/ask exclude the makers' own quotes.
+        """
+        self.env['stock.order'].flush_model()
+        self.env.cr.execute("""
+            SELECT id, security_id, user_id, side, price, remaining_quantity
+              FROM stock_order
+             WHERE session_id = %s AND status IN %s AND order_type = 'limit'
+        """, [session.id, self._QUOTE_STATES])
+        makers = set(maker_user_ids)
+        book = {}
+        for order_id, security_id, user_id, side, price, remaining in self.env.cr.fetchall():
+            view = book.setdefault(security_id, {'best_bid': 0.0, 'best_ask': 0.0, 'quotes': {}})
+            if user_id in makers:
+                view['quotes'].setdefault((user_id, side), []).append((order_id, price, remaining))
+            elif side == 'buy':
+                view['best_bid'] = max(view['best_bid'], price)
+            elif not view['best_ask'] or price < view['best_ask']:
+                view['best_ask'] = price
+        return book
+
+    def _get_inventory(self):
+        """{security_id: (quantity, available quantity)} of the maker account, and its available cash"""
+        self.ensure_one()
+        self.env['stock.position'].flush_model(['user_id', 'security_id', 'quantity', 'blocked_quantity'])
+        self.env.cr.execute("""
+            SELECT security_id, quantity, quantity - COALESCE(blocked_quantity, 0)
+              FROM stock_position
+             WHERE user_id = %s
+        """, [self.user_id.id])
+        inventory = {security_id: (quantity, available) for security_id, quantity, available in self.env.cr.fetchall()}
+        return inventory, self.user_id.available_cash
+
+    def _target_quotes(self, entry, view, inventory, session):
+        """(bid, ask) price of one security, skewed by inventory, kept off the other side and inside the breakers"""
+        Security = self.env['stock.security']
+        half = self.spread_pct / 200
+        skew = -min(inventory / self.max_inventory, 1.0) * self.inventory_skew * half
+        bid = Security._snap_price(entry.current_price * (1 - half + skew), entry.tick_size, -1)
+        ask = Security._snap_price(entry.current_price * (1 + half + skew), entry.tick_size, 1)
+        if view['best_ask'] and bid >= view['best_ask']:
+            bid = Security._snap_price(view['best_ask'] - entry.tick_size, entry.tick_size, -1)
+        if view['best_bid'] and ask <= view['best_bid']:
+            ask = Security._snap_price(view['best_bid'] + entry.tick_size, entry.tick_size, 1)
+        start_price = entry.session_start_price
+        if start_price:
+            bid = max(bid, Security._snap_price(start_price * (1 - session.circuit_breaker_lower / 100), entry.tick_size, 1))
+            ask = min(ask, Security._snap_price(start_price * (1 + session.circuit_breaker_upper / 100), entry.tick_size, -1))
+        if bid >= ask:
+            # Band too narrow for a two-sided quote: only offer
+            bid = 0.0
+        return bid, ask
+
+    def _refresh_quotes(self, session, book):
+        """Cancel the maker's stale quotes and place the missing ones, one bulk statement each"""
+        self.ensure_one()
+        Order = self.env['stock.order'].sudo().with_engine_context()
+        entries = self.env['stock.security'].get_directory(ipo_status='trading')
+        if self.security_ids:
+            wanted = set(self.security_ids.ids)
+            entries = [entry for entry in entries if entry.id in wanted]
+        entries = [entry for entry in entries if entry.status == 'trade' and entry.current_price > 0]
+        inventory, cash = self._get_inventory()
+        user_id = self.user_id.id
+        commission = 1 + (session.broker_commission_rate or 0.0) / 100
+
+        # Decide the quotes to keep and the ones to replace
+        empty = {'best_bid': 0.0, 'best_ask': 0.0, 'quotes': {}}
+        targets = {}
+        stale = []
+        for entry in entries:
+            view = book.get(entry.id, empty)
+            quantity, _available = inventory.get(entry.id, (0, 0))
+            bid, ask = self._target_quotes(entry, view, quantity, session)
+            targets[entry.id] = {'buy': bid, 'sell': ask}
+            for side, price in (('buy', bid), ('sell', ask)):
+                for order_id, quote_price, remaining in view['quotes'].get((user_id, side), []):
+                    if quote_price == price and remaining > 0:
+                        targets[entry.id][side] = None
+                    else:
+                        stale.append(order_id)
+        if stale:
+            Order.browse(stale)._batch_set_status('cancelled', "Quotes cancelled", "Quote refreshed by market maker")
+            inventory, cash = self._get_inventory()
+
+        # Size the missing quotes against inventory limits and the cash budget
+        vals_list = []
+        for entry in entries:
+            lot = entry.lot_size or 1
+            quantity, available = inventory.get(entry.id, (0, 0))
+            bid, ask = targets[entry.id]['buy'], targets[entry.id]['sell']
+            bid_qty = min(self.quote_quantity, self.max_inventory - quantity) // lot * lot
+            ask_qty = min(self.quote_quantity, available) // lot * lot
+            if bid and bid > 0 and bid_qty > 0 and bid * bid_qty * commission <= cash:
+                cash -= bid * bid_qty * commission
+                vals_list.append(self._quote_vals(entry, session, 'buy', bid, bid_qty))
+            if ask and ask_qty > 0:
+                vals_list.append(self._quote_vals(entry, session, 'sell', ask, ask_qty))
+        if vals_list:
+            orders = Order.create(vals_list)
+            orders._batch_open("Quotes placed", f"Market maker {self.name}")
+        _logger.info(f"[MM] {self.name}: cancelled {len(stale)} and placed {len(vals_list)} quotes "
+                     f"over {len(entries)} securities")
+        return len(vals_list)
+
+    def _quote_vals(self, entry, session, side, price, quantity):
+        return {
+            'user_id': self.user_id.id,
+            'entered_by_id': self.user_id.id,
+            'security_id': entry.id,
+            'session_id': session.id,
+            'side': side,
+            'order_type': 'limit',
+            'time_in_force': 'day',
+            'price': price,
+            'quantity': quantity,
+            'description': f'Market maker quote ({self.name})',
+        }
@@ -14,6 +14,7 @@ class StockMatchingEngine(models.TransientModel):
     @api.model
     def cron_run_matching(self):
         """Cron entrypoint: run matching for all open sessions every minute."""
+        self = self.with_engine_context()
         sessions = self.env['stock.session'].search([('state', '=', 'open')])
         if not sessions:
             _logger.info("[MATCH] No open sessions. Skipping.")
@@ -21,7 +22,11 @@ class StockMatchingEngine(models.TransientModel):
         for session in sessions:
             try:
                 _logger.info(f"[MATCH] Start session={session.id} {session.name}")
+                # Market makers refresh their quotes right before the books are matched
+                self.env['stock.market.maker'].run_quoting_cycle(session)
                 self.match_all_securities(session)
+                self.match_all_bonds(session)
+                self.env['stock.loan'].process_margin_calls(session)
                 _logger.info(f"[MATCH] Done session={session.id} {session.name}")
             except Exception as e:
                 _logger.error(f"[MATCH] Error session={session.id} {session.name}: {e}")
@@ -29,6 +34,8 @@ class StockMatchingEngine(models.TransientModel):
     @api.model
     def match_all_securities(self, session):
         """Match orders for all active securities in the session"""
+        self = self.with_engine_context()
+        session = session.with_env(self.env)
         # Check and activate stop orders first
         self._check_stop_orders(session)
         
@@ -46,6 +53,7 @@ class StockMatchingEngine(models.TransientModel):
                 _logger.error(f"Failed to match orders for security {security.symbol}: {str(e)}")
                 # Continue with next security even if one fails
                 continue
+
     
     def _check_stop_orders(self, session):
         """Check and activate stop orders that have been triggered"""
@@ -96,12 +104,7 @@ class StockMatchingEngine(models.TransientModel):
             ])
             if submitted_regulars:
                 _logger.info(f"[MATCH][FIX] Promoting {len(submitted_regulars)} submitted regular orders to open for {security.symbol}")
-                submitted_regulars.write({'status': 'open'})
-                for o in submitted_regulars:
-                    try:
-                        o.log_action("Order promoted", "Promoted from Submitted to Open during matching cycle")
-                    except Exception:
-                        pass
+                submitted_regulars._batch_set_status('open', "Orders promoted", None)
         except Exception as e:
             _logger.error(f"[MATCH][FIX] Failed to promote submitted regular orders for {security.symbol}: {e}")
 
@@ -304,19 +307,21 @@ class StockMatchingEngine(models.TransientModel):
         # In a real exchange, this would be more complex
         trade_price = sell_order.price
         
-        # Validate seller has sufficient stocks
-        seller_position = self.env['stock.position'].search([
-            ('user_id', '=', sell_order.user_id.id),
-            ('security_id', '=', sell_order.security_id.id)
-        ], limit=1)
-        
-        if not seller_position or seller_position.quantity < trade_quantity:
-            _logger.warning(f"Seller {sell_order.user_id.name} has insufficient stocks")
-            sell_order.write({
-                'status': 'rejected',
-                'rejection_reason': 'Insufficient stocks to complete order'
-            })
-            return
+        # Sell orders with a reservation already hold blocked shares for this fill;
+        # only legacy orders without one are checked against the live position
+        if not sell_order.reserved_quantity:
+            seller_position = self.env['stock.position'].search([
+                ('user_id', '=', sell_order.user_id.id),
+                ('security_id', '=', sell_order.security_id.id)
+            ], limit=1)
+            
+            if not seller_position or seller_position.available_quantity < trade_quantity:
+                _logger.warning(f"Seller {sell_order.user_id.name} has insufficient stocks")
+                sell_order.write({
+                    'status': 'rejected',
+                    'rejection_reason': 'Insufficient stocks to complete order'
+                })
+                return
         
         # Calculate amounts
         trade_value = trade_quantity * trade_price
@@ -326,8 +331,10 @@ class StockMatchingEngine(models.TransientModel):
         buyer_total_cost = trade_value + buyer_commission
         seller_net_proceeds = trade_value - seller_commission
         
-        # Validate buyer has sufficient funds
-        if buy_order.user_id.cash_balance < buyer_total_cost:
+        # Reserved cash covers limit buys in full; a balance lookup is only needed
+        # when a market buy fills above its reserved price or the order is unreserved
+        shortfall = buyer_total_cost - buy_order._get_reserved_amount_for(trade_quantity)
+        if shortfall > 0.005 and buy_order.user_id.available_cash < shortfall:
             _logger.warning(f"Buyer {buy_order.user_id.name} has insufficient funds")
             buy_order.write({
                 'status': 'rejected',
@@ -348,6 +355,15 @@ class StockMatchingEngine(models.TransientModel):
             'sell_commission': seller_commission,
         })
         
+        # Fold the trade into the OHLCV bars
+        self.env['stock.price.bar']._record_trade(
+            sell_order.security_id.id, session, trade_price, trade_quantity, trade.trade_date
+        )
+        
+        # Release the reservations backing this fill before moving cash and shares
+        buy_order._consume_reservation(trade_quantity)
+        sell_order._consume_reservation(trade_quantity)
+        
         # Update cash balances
         buy_order.user_id.cash_balance -= buyer_total_cost
         sell_order.user_id.cash_balance += seller_net_proceeds
@@ -364,8 +380,8 @@ class StockMatchingEngine(models.TransientModel):
         )
         
         # Update order filled quantities
-        buy_order.update_filled_quantity(trade_quantity, trade_price)
-        sell_order.update_filled_quantity(trade_quantity, trade_price)
+        buy_order.update_filled_quantity(trade_quantity, trade_price, trade=trade)
+        sell_order.update_filled_quantity(trade_quantity, trade_price, trade=trade)
         
         # Log the trade
         _logger.info(
@@ -469,12 +485,212 @@ class StockMatchingEngine(models.TransientModel):
             except Exception as e:
                 _logger.error(f"Failed to update price: {str(e)}")
     
+    @api.model
+    def match_all_bonds(self, session):
+        """Match bond orders for every bond that has a resting order in the session"""
+        self = self.with_engine_context()
+        session = session.with_env(self.env)
+        self.env['stock.bond.order'].flush_model(['bond_id', 'session_id', 'status'])
+        self.env.cr.execute("""
+            SELECT DISTINCT bond_id
+              FROM stock_bond_order
+             WHERE session_id = %s AND status IN ('submitted', 'open', 'partial')
+        """, [session.id])
+        bonds = self.env['stock.bond'].browse([row[0] for row in self.env.cr.fetchall()])
+        
+        for bond in bonds:
+            try:
+                with self.env.cr.savepoint():
+                    self._match_bond_orders(bond, session)
+            except Exception as e:
+                _logger.error(f"Failed to match orders for bond {bond.symbol}: {str(e)}")
+                continue
+    
+    def _match_bond_orders(self, bond, session):
+        """
+        Match the bid and ask book of one bond.
+        
+        Both sides are loaded once in price-time priority and walked with a
+        moving ask cursor, so each book is matched in a single pass.
+        """
+        self.env.cr.execute(
+            "SELECT id FROM stock_bond WHERE id = %s FOR UPDATE NOWAIT",
+            [bond.id]
+        )
+        BondOrder = self.env['stock.bond.order']
+        
+        # Bond orders rest as soon as they are submitted
+        submitted = BondOrder.search([
+            ('bond_id', '=', bond.id),
+            ('session_id', '=', session.id),
+            ('status', '=', 'submitted'),
+        ])
+        if submitted:
+            submitted.write({'status': 'open'})
+        
+        bids = BondOrder.search([
+            ('bond_id', '=', bond.id),
+            ('session_id', '=', session.id),
+            ('side', '=', 'buy'),
+            ('status', 'in', ['open', 'partial']),
+        ], order='order_type desc, price desc, create_date asc, id asc')
+        asks = BondOrder.search([
+            ('bond_id', '=', bond.id),
+            ('session_id', '=', session.id),
+            ('side', '=', 'sell'),
+            ('status', 'in', ['open', 'partial']),
+        ], order='order_type desc, price asc, create_date asc, id asc')
+        if not bids or not asks:
+            return 0
+        
+        # Pricing inputs are fixed for the whole pass: the theoretical price
+        # prices market-vs-market fills, accrued interest settles on every fill
+        session_number = session.session_number or None
+        theoretical_price = bond.calculate_bond_price_by_time(session_number)
+        accrued_per_bond = bond.accrued_interest
+        
+        asks = list(asks)
+        trades = 0
+        ask_start = 0
+        for bid in bids:
+            ask_index = ask_start
+            while bid.remaining_quantity > 0 and ask_index < len(asks):
+                ask = asks[ask_index]
+                if ask.remaining_quantity <= 0 or ask.status not in ('open', 'partial'):
+                    # Exhausted asks at the front of the book are never revisited
+                    if ask_index == ask_start:
+                        ask_start += 1
+                    ask_index += 1
+                    continue
+                if (bid.order_type == 'limit' and ask.order_type == 'limit'
+                        and bid.price < ask.price):
+                    # Asks are sorted by price: nothing further can cross this bid
+                    break
+                if bid.user_id == ask.user_id:
+                    ask_index += 1
+                    continue
+                if self._get_bond_trade_price(bid, ask, theoretical_price) <= 0:
+                    # No usable price for this pair (market vs market without a
+                    # theoretical price, or a zero limit): try the next ask
+                    ask_index += 1
+                    continue
+                statuses = (bid.status, ask.status)
+                try:
+                    with self.env.cr.savepoint():
+                        executed = self._execute_bond_trade(bid, ask, session, theoretical_price, accrued_per_bond)
+                except Exception as e:
+                    _logger.error(f"Failed to execute bond trade between {bid.name} and {ask.name}: {str(e)}")
+                    ask_index += 1
+                    continue
+                if executed:
+                    trades += 1
+                elif (bid.status, ask.status) == statuses:
+                    # Nothing changed on either side: retrying the pair would spin
+                    ask_index += 1
+                    continue
+                if bid.status not in ('open', 'partial'):
+                    break
+        
+        if trades:
+            _logger.info(f"[MATCH][BOND] {bond.symbol}: {trades} trades in session {session.name}")
+        return trades
+    
+    def _get_bond_trade_price(self, bid, ask, theoretical_price):
+        """Price of a bond fill: the resting limit order sets the price"""
+        if bid.order_type == 'limit' and ask.order_type == 'limit':
+            resting = bid if (bid.create_date, bid.id) < (ask.create_date, ask.id) else ask
+            return resting.price
+        if bid.order_type == 'limit':
+            return bid.price
+        if ask.order_type == 'limit':
+            return ask.price
+        return theoretical_price
+    
+    def _execute_bond_trade(self, bid, ask, session, theoretical_price, accrued_per_bond):
+        """
+        Execute and settle one bond fill.
+        
+        Bonds trade at a clean price; the buyer also pays the seller the
+        interest accrued since the first payment session (dirty settlement).
+        Commission is charged on the clean value.
+        """
+        quantity = min(bid.remaining_quantity, ask.remaining_quantity)
+        price = self._get_bond_trade_price(bid, ask, theoretical_price)
+        if quantity <= 0 or price <= 0:
+            return False
+        
+        seller_position = self.env['stock.bond.position'].search([
+            ('user_id', '=', ask.user_id.id),
+            ('bond_id', '=', ask.bond_id.id)
+        ], limit=1)
+        if not seller_position or seller_position.quantity < quantity:
+            _logger.warning(f"Seller {ask.user_id.name} has insufficient bonds")
+            ask.write({
+                'status': 'rejected',
+                'rejection_reason': 'Insufficient bonds to complete order'
+            })
+            return False
+        
+        clean_value = quantity * price
+        accrued_amount = quantity * accrued_per_bond
+        rate = session.broker_commission_rate or 0.0
+        commission = clean_value * rate / 100
+        buyer_total_cost = clean_value + accrued_amount + commission
+        seller_net_proceeds = clean_value + accrued_amount - commission
+        
+        if bid.user_id.available_cash < buyer_total_cost:
+            _logger.warning(f"Buyer {bid.user_id.name} has insufficient funds for bond trade")
+            bid.write({
+                'status': 'rejected',
+                'rejection_reason': 'Insufficient funds to complete order'
+            })
+            return False
+        
+        self.env['stock.bond.trade'].create({
+            'buy_order_id': bid.id,
+            'sell_order_id': ask.id,
+            'session_id': session.id,
+            'quantity': quantity,
+            'price': price,
+            'accrued_interest': accrued_per_bond,
+            'accrued_amount': accrued_amount,
+            'buy_commission': commission,
+            'sell_commission': commission,
+        })
+        
+        bid.user_id.cash_balance -= buyer_total_cost
+        ask.user_id.cash_balance += seller_net_proceeds
+        
+        seller_position.update_position(quantity, price, is_buy=False)
+        buyer_position = self.env['stock.bond.position'].search([
+            ('user_id', '=', bid.user_id.id),
+            ('bond_id', '=', bid.bond_id.id)
+        ], limit=1)
+        if not buyer_position:
+            buyer_position = self.env['stock.bond.position'].create({
+                'user_id': bid.user_id.id,
+                'bond_id': bid.bond_id.id,
+                'quantity': 0,
+            })
+        buyer_position.update_position(quantity, price, is_buy=True)
+        
+        bid.update_filled_quantity(quantity)
+        ask.update_filled_quantity(quantity)
+        bid.bond_id.current_price = price
+        
+        _logger.info(
+            f"[MATCH][BOND] Trade sym={bid.bond_id.symbol} qty={quantity} px={price} "
+            f"accrued={accrued_per_bond} buyOrder={bid.name} sellOrder={ask.name}"
+        )
+        return True
+    
     @api.model
     def process_ipo_orders(self, security_id, ipo_quantity, ipo_price, session_id=None):
         """
         Process IPO orders for a security
         Implements special IPO handling from C#
         """
+        self = self.with_engine_context()
         security = self.env['stock.security'].browse(security_id)
         if not security:
             return
@@ -586,8 +802,8 @@ class StockMatchingEngine(models.TransientModel):
         commission = trade_value * order.broker_commission_rate / 100
         total_cost = trade_value + commission
         
-        # Check buyer has funds
-        if order.user_id.cash_balance < total_cost:
+        # Check buyer has funds (IPO orders hold no reservation; cash held for resting buys is not spendable)
+        if order.user_id.available_cash < total_cost:
             order.write({
                 'status': 'rejected',
                 'rejection_reason': 'Insufficient funds for IPO allocation'
@@ -595,7 +811,7 @@ class StockMatchingEngine(models.TransientModel):
             return False
                     
         # Create trade
-        self.env['stock.trade'].create({
+        trade = self.env['stock.trade'].create({
             'buy_order_id': order.id,
             'sell_order_id': False,  # No sell order for IPO
             'session_id': session.id,
@@ -608,6 +824,8 @@ class StockMatchingEngine(models.TransientModel):
             'trade_type': 'ipo'
         })
         
+        self.env['stock.price.bar']._record_trade(security_id, session, ipo_price, allocation, trade.trade_date)
+        
         # Update buyer's cash and position
         order.user_id.cash_balance -= total_cost
         # Broker commission distribution removed (no default broker relationships)
@@ -634,7 +852,7 @@ class StockMatchingEngine(models.TransientModel):
             })
         
         # Update order
-        order.update_filled_quantity(allocation, ipo_price)
+        order.update_filled_quantity(allocation, ipo_price, trade=trade)
         
         _logger.info(f"IPO allocation: {allocation} shares to {order.user_id.name}")
         return True 
\ No newline at end of file
@@ -5,6 +5,19 @@ import logging
 
 _logger = logging.getLogger(__name__)
 
+# Context used by the matching engine, session close and IPO processing: no mail
+# tracking values, no auto-followers, no notifications for high-churn writes
+ENGINE_CONTEXT = {
+    'tracking_disable': True,
+    'mail_notrack': True,
+    'mail_create_nolog': True,
+    'mail_create_nosubscribe': True,
+    'mail_post_autofollow': False,
+    'mail_auto_subscribe_no_notify': True,
+    'mail_notify_noemail': True,
+    'notification_disable': True,
+}
+
 
 class StockMessageMixin(models.AbstractModel):
     """
@@ -73,6 +86,33 @@ class StockMessageMixin(models.AbstractModel):
             _logger.error(f"Error posting message to {self._name} record {self.id}: {str(e)}")
             return False
 
+    def with_engine_context(self):
+        """Return ``self`` in the tracking-free execution context used for engine writes"""
+        return self.with_context(**ENGINE_CONTEXT)
+
+    def _audit_mode(self):
+        """Audit mode configured for this model ('deferred', 'chatter' or 'off')"""
+        return self.env['stock.audit.policy']._get_mode(self._name)
+
+    def _record_audit(self, action, details, body, subject, user=None):
+        """
+        Record an audit entry according to the model's audit policy.
+
+        'deferred' appends compact events to stock.audit.event (materialized to
+        chatter by a background job), 'chatter' posts immediately, 'off' drops it.
+        """
+        mode = self._audit_mode()
+        if mode == 'off' or not self.ids:
+            return False
+        if mode == 'deferred':
+            try:
+                self.env['stock.audit.event']._append(self._name, self.ids, action, details, user.id if user else None)
+                return True
+            except Exception as e:
+                _logger.error(f"Error recording audit event for {self._name} {self.ids}: {str(e)}")
+                return False
+        return self.safe_message_post(body=body, subject=subject, message_type='comment')
+
     def log_status_change(self, old_status, new_status, additional_info=None):
         """
         Log status changes with standardized format.
@@ -86,10 +126,10 @@ class StockMessageMixin(models.AbstractModel):
         if additional_info:
             body += f". {additional_info}"
             
-        return self.safe_message_post(
+        return self._record_audit(
+            f"Status Update: {new_status}", body,
             body=body,
-            subject=f"Status Update: {new_status}",
-            message_type='comment'
+            subject=f"Status Update: {new_status}"
         )
 
     def log_action(self, action, details=None, user=None):
@@ -109,10 +149,11 @@ class StockMessageMixin(models.AbstractModel):
             body += f"\nDetails: {details}"
         body += f"\nPerformed by: {user.name}"
         
-        return self.safe_message_post(
+        return self._record_audit(
+            action, details,
             body=body,
             subject=f"Action: {action}",
-            message_type='comment'
+            user=user
         )
 
     def log_broker_action(self, broker_user, client_user, action, details=None):
@@ -129,10 +170,10 @@ class StockMessageMixin(models.AbstractModel):
         if details:
             body += f"\nDetails: {details}"
             
-        return self.safe_message_post(
+        return self._record_audit(
+            f"Broker Action: {action}", body,
             body=body,
-            subject=f"Broker Action: {action}",
-            message_type='comment'
+            subject=f"Broker Action: {action}"
         )
 
     def log_error(self, error_message, context_info=None):
@@ -1,12 +1,37 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
 from odoo.exceptions import ValidationError
-from datetime import datetime
+from datetime import datetime, timedelta
+import heapq
 import logging
 
 _logger = logging.getLogger(__name__)
 
+# Open upper bound of the session window of news without an end session
+OPEN_END_SESSION = 2147483647
+
+# Fields that change which news is visible in a session
+VISIBILITY_FIELDS = {'status', 'start_session', 'end_session', 'priority', 'publish_date'}
+
+# Fields that move a news item's publish or expire event
+SCHEDULE_FIELDS = {'status', 'start_session', 'end_session', 'start_minute', 'end_minute'}
+
+# Bus channel the news scheduler pushes published/expired news on
+NEWS_BUS_CHANNEL = 'stock_market_news'
+
+# Direction and weight of the default shock per expected impact
+IMPACT_DIRECTION = {
+    'very_negative': -2,
+    'negative': -1,
+    'neutral': 0,
+    'positive': 1,
+    'very_positive': 2,
+}
+
+# dbname -> (stamp, heap of (fire_at, action, news_id)); see StockNews._get_news_schedule
+_NEWS_SCHEDULE = {}
+
 class StockNews(models.Model):
     _name = 'stock.news'
     _description = 'Market News and Events'
@@ -64,11 +89,13 @@ class StockNews(models.Model):
     # Timing Control (from User Stories)
     start_session = fields.Integer(
         string='Start Session',
+        index=True,
         help='Session number when news becomes visible'
     )
     
     end_session = fields.Integer(
         string='End Session', 
+        index=True,
         help='Session number when news expires/becomes hidden'
     )
     
@@ -82,6 +109,29 @@ class StockNews(models.Model):
         help='Minute within session when news expires'
     )
     
+    # Session window (stored so visibility is an index range scan)
+    window_start_session = fields.Integer(
+        string='Window Start',
+        compute='_compute_session_window',
+        store=True,
+        help='First session the news is visible in (0: from the start)'
+    )
+    
+    window_end_session = fields.Integer(
+        string='Window End',
+        compute='_compute_session_window',
+        store=True,
+        help='Last session the news is visible in (open-ended when no end session is set)'
+    )
+    
+    visibility_version = fields.Integer(
+        string='Visibility Version',
+        default=1,
+        readonly=True,
+        copy=False,
+        help='Bumped whenever status, window or ordering changes; keys the visible news cache'
+    )
+    
     # Status
     status = fields.Selection([
         ('draft', 'Draft'),
@@ -140,6 +190,13 @@ class StockNews(models.Model):
         help='Expected price impact percentage'
     )
     
+    impact_applied = fields.Boolean(
+        string='Price Impact Applied',
+        readonly=True,
+        copy=False,
+        help='Set once the news shock has been applied to the targeted prices'
+    )
+    
     # Publishing
     published_by_id = fields.Many2one(
         'res.users',
@@ -177,26 +234,54 @@ class StockNews(models.Model):
         help='Number of times this news was viewed'
     )
     
+    def init(self):
+        # Visibility window index: active news whose window contains a session number
+        tools.create_index(
+            self.env.cr, 'stock_news_visible_window_index', self._table,
+            ['window_start_session', 'window_end_session'],
+            where="status = 'active'",
+        )
+    
+    @api.depends('start_session', 'end_session')
+    def _compute_session_window(self):
+        for news in self:
+            news.window_start_session = news.start_session or 0
+            news.window_end_session = news.end_session or OPEN_END_SESSION
+    
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self._trigger_news_scheduler()
+        records.filtered(lambda n: n.status == 'active')._apply_price_impact()
+        return records
+    
+    def write(self, vals):
+        res = super().write(vals)
+        if vals.get('status') == 'active':
+            self._apply_price_impact()
+        if VISIBILITY_FIELDS.intersection(vals):
+            # The visible set of the open session changed: move the stamp of these rows only
+            self.flush_model(['visibility_version'])
+            self.env.cr.execute(
+                "UPDATE stock_news SET visibility_version = visibility_version + 1 WHERE id IN %s",
+                [tuple(self.ids)],
+            )
+            self.invalidate_recordset(['visibility_version'])
+        if SCHEDULE_FIELDS.intersection(vals) and not self.env.context.get('news_scheduler'):
+            self._trigger_news_scheduler()
+        return res
+    
     @api.depends('start_session', 'end_session', 'start_minute', 'end_minute', 'status')
     def _compute_visibility(self):
+        Session = self.env['stock.session']
+        session_num = Session._get_current_session_number()
+        entry = Session._calendar_session(session_num) if session_num else None
+        session_start = entry and entry[2]
+        minutes_open = (fields.Datetime.now() - session_start).total_seconds() / 60 if session_start else 0
         for news in self:
-            if news.status != 'active':
+            if news.status != 'active' or not session_num:
                 news.is_visible = False
                 continue
-                
-            current_session = self.env['stock.session'].search([('state', '=', 'open')], limit=1)
-            
-            if not current_session:
-                news.is_visible = False
-                continue
-                
-            # Get current session number
-            session_num = 0
-            if current_session.name.startswith('Session '):
-                try:
-                    session_num = int(current_session.name.split(' ')[-1])
-                except:
-                    session_num = 0
             
             # Check session range
             if news.start_session and session_num < news.start_session:
@@ -207,20 +292,59 @@ class StockNews(models.Model):
                 news.is_visible = False
                 continue
             
-            # TODO: Add minute-level checking if needed
-            # For now, if within session range, it's visible
+            # Minute-level window inside the first and last session
+            if session_start and news.start_minute and news.start_session == session_num \
+                    and minutes_open < news.start_minute:
+                news.is_visible = False
+                continue
+            
+            if session_start and news.end_minute and news.end_session == session_num \
+                    and minutes_open >= news.end_minute:
+                news.is_visible = False
+                continue
+            
             news.is_visible = True
     
     def _compute_current_session(self):
+        session_num = self.env['stock.session']._get_current_session_number()
         for news in self:
-            current_session = self.env['stock.session'].search([('state', '=', 'open')], limit=1)
-            if current_session and current_session.name.startswith('Session '):
-                try:
-                    news.current_session_num = int(current_session.name.split(' ')[-1])
-                except:
-                    news.current_session_num = 0
-            else:
-                news.current_session_num = 0
+            news.current_session_num = session_num
+    
+    @api.model
+    def _get_visible_domain(self):
+        """Domain equivalent of is_visible for the open session (range scan on the window index)"""
+        session_num = self.env['stock.session']._get_current_session_number()
+        if not session_num:
+            return [('id', '=', False)]
+        return [
+            ('status', '=', 'active'),
+            ('window_start_session', '<=', session_num),
+            ('window_end_session', '>=', session_num),
+        ]
+    
+    @api.model
+    def _get_visible_news_ids(self, session_num):
+        """
+        Visible news of session ``session_num`` in feed order, as a tuple of ids.
+
+        Cached per session under a (count, max id, sum of versions) stamp that
+        moves when news is created, deleted or its status, window or ordering
+        fields change, so only this cache is rebuilt.
+        """
+        self.flush_model()
+        self.env.cr.execute("SELECT COUNT(*), MAX(id), SUM(visibility_version) FROM stock_news")
+        return self._build_visible_news_ids(session_num, self.env.cr.fetchone())
+    
+    @api.model
+    @tools.ormcache('session_num', 'stamp')
+    def _build_visible_news_ids(self, session_num, stamp):
+        self.env.cr.execute("""
+            SELECT id
+              FROM stock_news
+             WHERE status = 'active' AND window_start_session <= %s AND window_end_session >= %s
+          ORDER BY priority DESC, publish_date DESC, id DESC
+        """, [session_num, session_num])
+        return tuple(row[0] for row in self.env.cr.fetchall())
     
     @api.depends('priority')
     def _compute_display_priority(self):
@@ -294,46 +418,175 @@ class StockNews(models.Model):
         self.ensure_one()
         self.view_count += 1
     
+    def _get_price_shocks(self, config):
+        """
+        {security_id: price multiplier} of the news in ``self``.
+        
+        The shock is the news' impact magnitude (or the configured default,
+        doubled for 'very' impacts) in the direction of its expected impact.
+        It hits the related stock in full and, for sector news, every security
+        of the sector scaled by the sector factor; shocks on one security compound.
+        """
+        directory = self.env['stock.security'].get_directory(ipo_status='trading')
+        by_sector = {}
+        for entry in directory:
+            by_sector.setdefault(entry.sector, []).append(entry.id)
+        shocks = {}
+        for news in self:
+            direction = IMPACT_DIRECTION.get(news.expected_impact, 0)
+            if not direction:
+                continue
+            if news.impact_magnitude:
+                pct = abs(news.impact_magnitude) * (1 if direction > 0 else -1)
+            else:
+                pct = config.news_default_impact * direction
+            targets = {}
+            if news.sector_target:
+                targets.update(dict.fromkeys(by_sector.get(news.sector_target, []), pct * config.news_sector_impact_factor))
+            if news.stock_id:
+                targets[news.stock_id.id] = pct
+            for security_id, target_pct in targets.items():
+                shocks[security_id] = shocks.get(security_id, 1.0) * (1 + target_pct / 100)
+        return shocks
+    
+    def _apply_price_impact(self):
+        """Shock the prices targeted by news going active, in one batched price update"""
+        news = self.filtered(lambda n: not n.impact_applied and (n.stock_id or n.sector_target))
+        if not news:
+            return {}
+        config = self.env['stock.config'].get_config()
+        news.write({'impact_applied': True})
+        if not config.news_impact_enabled:
+            return {}
+        shocks = news._get_price_shocks(config)
+        if not shocks:
+            return {}
+        Security = self.env['stock.security'].sudo()
+        prices = {
+            security.id: security.current_price * shocks[security.id]
+            for security in Security.browse(list(shocks)) if security.current_price > 0
+        }
+        moves = Security.update_prices(
+            prices, reason='news', notes=', '.join(news.mapped('name')), clamp=True,
+        )
+        _logger.info(f"[NEWS] Price impact of {len(news)} news applied to {len(moves)} securities")
+        return moves
+    
+    @api.model
+    def _trigger_news_scheduler(self, at=None):
+        """Wake the news scheduler cron (now, or at ``at``)"""
+        cron = self.env.ref('stock_market_simulation.ir_cron_update_news_status', raise_if_not_found=False)
+        if cron:
+            cron.sudo()._trigger(at=at)
+    
+    @api.model
+    def _get_news_schedule_stamp(self, session_num):
+        """Last change to pending news plus the open session; any change rebuilds the heap"""
+        self.flush_model(['status', 'start_session', 'end_session', 'start_minute', 'end_minute'])
+        self.env.cr.execute("""
+            SELECT MAX(write_date), COUNT(*) FROM stock_news WHERE status IN ('scheduled', 'active')
+        """)
+        return self.env.cr.fetchone() + (session_num,)
+    
+    @api.model
+    def _build_news_schedule(self, session_num, session_start):
+        """
+        Heap of the open session's publish and expire events, ordered by fire time.
+
+        Events are placed ``start_minute``/``end_minute`` minutes after the
+        session's actual start; news whose window began in an earlier session is
+        due immediately, and news ending with this session without an end
+        minute expires when the next session opens.
+        """
+        self.env.cr.execute("""
+            SELECT id, status, start_session, start_minute, end_session, end_minute
+              FROM stock_news
+             WHERE (status = 'scheduled' AND window_start_session <= %s)
+                OR (status = 'active' AND window_end_session <= %s)
+        """, [session_num, session_num])
+        events = []
+        for news_id, status, start_session, start_minute, end_session, end_minute in self.env.cr.fetchall():
+            if status == 'scheduled':
+                offset = start_minute if start_session == session_num else 0
+                events.append((session_start + timedelta(minutes=offset or 0), 'publish', news_id))
+            elif end_session < session_num:
+                events.append((session_start, 'expire', news_id))
+            elif end_minute:
+                events.append((session_start + timedelta(minutes=end_minute), 'expire', news_id))
+        heapq.heapify(events)
+        return events
+    
+    @api.model
+    def _get_news_schedule(self, session_num, session_start):
+        key = self.env.cr.dbname
+        stamp = self._get_news_schedule_stamp(session_num)
+        cached = _NEWS_SCHEDULE.get(key)
+        if cached and cached[0] == stamp:
+            return cached[1]
+        heap = self._build_news_schedule(session_num, session_start)
+        _NEWS_SCHEDULE[key] = (stamp, heap)
+        return heap
+    
     @api.model
     def cron_update_news_status(self):
-        """Cron job to update news status based on timing"""
-        current_session = self.env['stock.session'].search([('state', '=', 'open')], limit=1)
-        
-        if not current_session:
+        """
+        In-session news scheduler: fire due publish/expire events in batches.
+
+        Pops every event due by now off the session heap, publishes and expires
+        the corresponding news with one write each, pushes the result to portal
+        clients on the bus and re-arms the cron for the next pending event.
+        """
+        Session = self.env['stock.session']
+        session_num = Session._get_current_session_number()
+        if not session_num:
             return
-            
-        # Get current session number
-        session_num = 0
-        if current_session.name.startswith('Session '):
-            try:
-                session_num = int(current_session.name.split(' ')[-1])
-            except:
-                session_num = 0
+        entry = Session._calendar_session(session_num)
+        now = fields.Datetime.now()
+        session_start = (entry and entry[2]) or now
         
-        # Activate scheduled news that should be active now
-        scheduled_news = self.search([
-            ('status', '=', 'scheduled'),
-            ('start_session', '<=', session_num)
-        ])
+        # Work on a copy so a rolled back run leaves the cached heap intact
+        heap = list(self._get_news_schedule(session_num, session_start))
+        due = {'publish': [], 'expire': []}
+        while heap and heap[0][0] <= now:
+            _fire_at, action, news_id = heapq.heappop(heap)
+            due[action].append(news_id)
         
-        for news in scheduled_news:
-            news.action_publish()
-        
-        # Expire active news that should be expired now
-        active_news = self.search([
-            ('status', '=', 'active'),
-            ('end_session', '<', session_num)
-        ])
+        scheduler = self.with_context(news_scheduler=True)
+        published = scheduler.browse(due['publish']).filtered(lambda n: n.status == 'scheduled')
+        expired = scheduler.browse(due['expire']).filtered(lambda n: n.status == 'active')
+        if published:
+            published.write({'status': 'active', 'publish_date': now})
+        if expired:
+            expired.write({'status': 'expired'})
+        if published or expired:
+            # Our own writes moved the stamp; the rest of the heap is still valid
+            _NEWS_SCHEDULE[self.env.cr.dbname] = (self._get_news_schedule_stamp(session_num), heap)
+            self.env['bus.bus']._sendone(NEWS_BUS_CHANNEL, 'stock_news/updated', {
+                'session': session_num,
+                'published': [{
+                    'id': news.id,
+                    'headline': news.headline,
+                    'priority': news.priority,
+                    'stock_id': news.stock_id.id,
+                    'sector_target': news.sector_target,
+                } for news in published],
+                'expired': expired.ids,
+            })
+        if heap:
+            self._trigger_news_scheduler(at=heap[0][0])
         
-        for news in active_news:
-            news.action_expire()
-        
-        _logger.info(f"Updated {len(scheduled_news)} scheduled news to active and {len(active_news)} active news to expired")
+        _logger.info(f"[NEWS] Published {len(published)} and expired {len(expired)} news in session {session_num}")
     
     @api.model
     def get_current_news(self, limit=None, stock_id=None, sector=None):
         """Get currently visible news with optional filtering"""
-        domain = [('status', '=', 'active')]
+        if not stock_id and not sector:
+            # Unfiltered feed: served from the session's materialized visible set
+            session_num = self.env['stock.session']._get_current_session_number()
+            news_ids = self._get_visible_news_ids(session_num) if session_num else ()
+            return self.browse(news_ids[:limit] if limit else news_ids)
+        
+        domain = self._get_visible_domain()
         
         # Add stock filter
         if stock_id:
@@ -343,43 +596,33 @@ class StockNews(models.Model):
         if sector:
             domain.append(('sector_target', '=', sector))
         
-        news = self.search(domain, order='priority desc, publish_date desc', limit=limit)
-        
-        # Filter by visibility
-        visible_news = news.filtered('is_visible')
-        
-        return visible_news
+        # Visibility is part of the domain, so ``limit`` applies to visible news only
+        return self.search(domain, order='priority desc, publish_date desc', limit=limit)
     
     @api.model
     def get_news_for_user(self, user_id, limit=10):
-        """Get relevant news for a specific user based on their portfolio"""
-        user = self.env['res.users'].browse(user_id)
-        
-        # Get user's stock positions
-        positions = self.env['stock.position'].search([('user_id', '=', user_id)])
-        stock_ids = positions.mapped('security_id.id')
-        
-        # Get user's sectors
-        sectors = positions.mapped('security_id.sector')
-        
-        # Build domain for relevant news
-        domain = [('status', '=', 'active')]
-        
-        if stock_ids or sectors:
-            stock_condition = [('stock_id', 'in', stock_ids)] if stock_ids else []
-            sector_condition = [('sector_target', 'in', sectors)] if sectors else []
-            general_condition = [('stock_id', '=', False), ('sector_target', '=', False)]
-            
-            # News related to user's stocks OR sectors OR general news
-            domain.append('|')
-            domain.append('|') 
-            domain.extend(stock_condition if stock_condition else [('id', '=', -1)])
-            domain.extend(sector_condition if sector_condition else [('id', '=', -1)])
-            domain.extend(general_condition)
-        
-        news = self.search(domain, order='priority desc, publish_date desc', limit=limit)
-        
-        # Filter by visibility
-        visible_news = news.filtered('is_visible')
-        
-        return visible_news
\ No newline at end of file
+        """
+        Get relevant news for a specific user based on their portfolio.
+
+        One query over the visibility window index and the user's interest
+        profile: news on a held security, on the sector of a held security,
+        or untargeted news. Users holding nothing see every visible news.
+        """
+        session_num = self.env['stock.session']._get_current_session_number()
+        if not session_num:
+            return self.browse()
+        self.flush_model(['status', 'window_start_session', 'window_end_session', 'stock_id',
+                          'sector_target', 'priority', 'publish_date'])
+        self.env.cr.execute("""
+            SELECT n.id
+              FROM stock_news n
+             WHERE n.status = 'active' AND n.window_start_session <= %s AND n.window_end_session >= %s
+               AND ((n.stock_id IS NULL AND n.sector_target IS NULL)
+                    OR NOT EXISTS (SELECT 1 FROM stock_news_interest i WHERE i.user_id = %s)
+                    OR EXISTS (SELECT 1 FROM stock_news_interest i
+                                WHERE i.user_id = %s
+                                  AND (i.security_id = n.stock_id OR i.sector = n.sector_target)))
+          ORDER BY n.priority DESC, n.publish_date DESC, n.id DESC
+             LIMIT %s
+        """, [session_num, session_num, user_id, user_id, limit or None])
+        return self.browse([row[0] for row in self.env.cr.fetchall()])
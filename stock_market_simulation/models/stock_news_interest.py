@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class StockNewsInterest(models.Model):
+    """Per-user news interest profile: the securities held and their sectors"""
+    _name = 'stock.news.interest'
+    _description = 'News Interest Profile'
+    _order = 'user_id, security_id'
+    _rec_name = 'security_id'
+
+    # The unique constraint doubles as the (user_id, security_id) index read by the news feed
+    _sql_constraints = [
+        ('user_security_unique', 'UNIQUE(user_id, security_id)',
+         'Only one interest row per user and security is allowed.')
+    ]
+
+    user_id = fields.Many2one('res.users', string='User', required=True, ondelete='cascade')
+    security_id = fields.Many2one('stock.security', string='Security', required=True, ondelete='cascade')
+    sector = fields.Char(string='Sector', index=True, readonly=True)
+
+    def init(self):
+        # Backfill profiles for positions that predate the table
+        self.rebuild_all()
+
+    @api.model
+    def _refresh_users(self, user_ids):
+        """Rebuild the profiles of ``user_ids`` from their non-empty positions"""
+        user_ids = tuple(set(user_ids))
+        if not user_ids:
+            return
+        self.env['stock.position'].flush_model(['user_id', 'security_id', 'quantity'])
+        self.env['stock.security'].flush_model(['sector'])
+        self.env.cr.execute("DELETE FROM stock_news_interest WHERE user_id IN %s", [user_ids])
+        self.env.cr.execute("""
+            INSERT INTO stock_news_interest (user_id, security_id, sector, create_uid, create_date, write_uid, write_date)
+            SELECT p.user_id, p.security_id, s.sector, %s, now() at time zone 'UTC', %s, now() at time zone 'UTC'
+              FROM stock_position p
+              JOIN stock_security s ON s.id = p.security_id
+             WHERE p.user_id IN %s AND p.quantity > 0
+        """, [self.env.uid, self.env.uid, user_ids])
+        self.invalidate_model()
+
+    @api.model
+    def _refresh_security(self, security_ids):
+        """Rebuild the profiles of every holder of ``security_ids`` (sector changed)"""
+        self.env['stock.position'].flush_model(['user_id', 'security_id', 'quantity'])
+        self.env.cr.execute(
+            "SELECT DISTINCT user_id FROM stock_position WHERE security_id IN %s AND quantity > 0",
+            [tuple(security_ids)],
+        )
+        self._refresh_users([row[0] for row in self.env.cr.fetchall()])
+
+    @api.model
+    def rebuild_all(self):
+        """Rebuild every profile (backfill for existing positions)"""
+        self.env['stock.position'].flush_model(['user_id'])
+        self.env.cr.execute("SELECT DISTINCT user_id FROM stock_position")
+        self._refresh_users([row[0] for row in self.env.cr.fetchall()])
+        _logger.info("[NEWS] Rebuilt news interest profiles")
+        return True
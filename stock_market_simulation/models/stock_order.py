@@ -4,6 +4,9 @@ from decimal import Decimal
 from odoo import models, fields, api
 from odoo.exceptions import ValidationError, UserError
 from datetime import datetime
+import logging
+
+_logger = logging.getLogger(__name__)
 
 class StockOrder(models.Model):
     _name = 'stock.order'
@@ -185,6 +188,7 @@ class StockOrder(models.Model):
         string='Order Date',
         default=fields.Datetime.now,
         readonly=True,
+        index=True,
         tracking=True
     )
     
@@ -204,6 +208,31 @@ class StockOrder(models.Model):
         readonly=True
     )
     
+    fill_ids = fields.One2many(
+        'stock.order.fill',
+        'order_id',
+        string='Fill History',
+        readonly=True
+    )
+    
+    # Reservations (escrow held while the order rests in the book)
+    reserved_amount = fields.Float(
+        string='Reserved Cash',
+        digits='Product Price',
+        default=0.0,
+        readonly=True,
+        copy=False,
+        help='Cash held for the unfilled part of a buy order, including commission'
+    )
+    
+    reserved_quantity = fields.Integer(
+        string='Reserved Shares',
+        default=0,
+        readonly=True,
+        copy=False,
+        help='Shares blocked on the seller position for the unfilled part of a sell order'
+    )
+    
     @api.depends('quantity', 'filled_quantity')
     def _compute_remaining_quantity(self):
         for order in self:
@@ -255,36 +284,40 @@ class StockOrder(models.Model):
                     ('sell_order_id', '=', order.id)
                 ])
     
-    @api.model
-    def create(self, vals):
-        if vals.get('name', 'New') == 'New':
-            vals['name'] = self.env['ir.sequence'].next_by_code('stock.order') or 'New'
-        
-        # Set market order price
-        if vals.get('order_type') == 'market':
-            security = self.env['stock.security'].browse(vals.get('security_id'))
-            if vals.get('side') == 'buy':
-                # For market buy, use a high price to ensure execution
-                vals['price'] = security.current_price * 1.1
-            else:
-                # For market sell, use a low price to ensure execution
-                vals['price'] = security.current_price * 0.9
-        elif vals.get('order_type') == 'ipo':
-            # IPO orders don't require a price at placement; set to 0 as placeholder
-            # Price will be set during IPO processing
-            vals.setdefault('price', 0.0)
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            if vals.get('name', 'New') == 'New':
+                vals['name'] = self.env['ir.sequence'].next_by_code('stock.order') or 'New'
+        
+            # Set market order price
+            if vals.get('order_type') == 'market':
+                security = self.env['stock.security'].browse(vals.get('security_id'))
+                if vals.get('side') == 'buy':
+                    # For market buy, use a high price to ensure execution
+                    vals['price'] = security.current_price * 1.1
+                else:
+                    # For market sell, use a low price to ensure execution
+                    vals['price'] = security.current_price * 0.9
+            elif vals.get('order_type') == 'ipo':
+                # IPO orders don't require a price at placement; set to 0 as placeholder
+                # Price will be set during IPO processing
+                vals.setdefault('price', 0.0)
             
-            # Validate that security is in IPO/PO status
-            security = self.env['stock.security'].browse(vals.get('security_id'))
-            if security and security.ipo_status not in ['ipo', 'po']:
-                raise ValidationError(f"IPO orders can only be placed for securities in IPO or PO status. "
-                                    f"{security.symbol} is in '{security.ipo_status}' status.")
+                # Validate that security is in IPO/PO status
+                security = self.env['stock.security'].browse(vals.get('security_id'))
+                if security and security.ipo_status not in ['ipo', 'po']:
+                    raise ValidationError(f"IPO orders can only be placed for securities in IPO or PO status. "
+                                        f"{security.symbol} is in '{security.ipo_status}' status.")
         
-        # Ensure the entered_by_id is set to the current env user if not provided
-        if not vals.get('entered_by_id'):
-            vals['entered_by_id'] = self.env.user.id
+            # Ensure the entered_by_id is set to the current env user if not provided
+            if not vals.get('entered_by_id'):
+                vals['entered_by_id'] = self.env.user.id
         
-        return super().create(vals)
+        orders = super().create(vals_list)
+        Analytics = self.env['stock.session.analytics'].sudo()
+        Analytics._apply_order_deltas(added=Analytics._order_contributions(orders))
+        return orders
     
     @api.constrains('quantity', 'security_id')
     def _check_quantity(self):
@@ -403,17 +436,17 @@ class StockOrder(models.Model):
             if current_quantity + self.quantity > max_position:
                 raise UserError(f"Position limit exceeded. Maximum position: {max_position} shares")
         
-        # Validate user has sufficient funds/securities
+        # Validate user has sufficient funds/securities (net of open order reservations)
         if self.side == 'buy':
             required_cash = order_value
-            if self.user_id.cash_balance < required_cash:
-                raise UserError(f"Insufficient funds. Required: ${required_cash:,.2f}, Available: ${self.user_id.cash_balance:,.2f}")
+            if self.user_id.available_cash < required_cash:
+                raise UserError(f"Insufficient funds. Required: ${required_cash:,.2f}, Available: ${self.user_id.available_cash:,.2f}")
         else:  # sell
             position = self.env['stock.position'].search([
                 ('user_id', '=', self.user_id.id),
                 ('security_id', '=', self.security_id.id)
             ], limit=1)
-            available_quantity = position.quantity if position else 0
+            available_quantity = position.available_quantity if position else 0
             if available_quantity < self.quantity:
                 raise UserError(f"Insufficient shares. Required: {self.quantity}, Available: {available_quantity}")
         
@@ -441,10 +474,10 @@ class StockOrder(models.Model):
             commission = required_amount * (self.broker_commission_rate / 100)
             total_required = required_amount + commission
             
-            if self.user_id.cash_balance < total_required:
+            if self.user_id.available_cash < total_required:
                 raise UserError(
                     f"Insufficient funds. Required: {total_required:,.2f}, "
-                    f"Available: {self.user_id.cash_balance:,.2f}"
+                    f"Available: {self.user_id.available_cash:,.2f}"
                 )
         
         # For sell orders, check available shares
@@ -454,14 +487,16 @@ class StockOrder(models.Model):
                 ('security_id', '=', self.security_id.id)
             ], limit=1)
             
-            available_shares = position.quantity if position else 0
+            # Blocked shares already cover pending sells that hold a reservation
+            available_shares = position.available_quantity if position else 0
             
-            # Check pending sell orders
+            # Check pending sell orders placed before reservations were tracked
             pending_sells = self.env['stock.order'].search([
                 ('user_id', '=', self.user_id.id),
                 ('security_id', '=', self.security_id.id),
                 ('side', '=', 'sell'),
                 ('status', 'in', ['submitted', 'open', 'partial']),
+                ('reserved_quantity', '=', 0),
                 ('id', '!=', self.id)
             ])
             
@@ -527,19 +562,14 @@ class StockOrder(models.Model):
             
             order._validate_order()
             
-            # Set appropriate status based on order type
-            ctx = dict(self.env.context or {})
-            ctx.update({
-                'tracking_disable': True,              # disable tracked message auto-post
-                'mail_post_autofollow': False,         # don't auto-subscribe followers
-                'mail_notify_noemail': True,           # hard-disable email notifications
-                'notification_disable': True,          # guard for notification pipeline
-                'mail_create_nosubscribe': True,       # extra safety
-            })
+            # Hold cash / block shares so matching never re-checks balances
+            order._reserve_holdings()
+            
+            # Set appropriate status based on order type (no tracking / follower work)
             if order.order_type in ['stop_loss', 'stop_limit', 'ipo']:
-                order.with_context(ctx).write({'status': 'submitted'})  # Stop orders wait for trigger
+                order.with_engine_context().write({'status': 'submitted'})  # Stop orders wait for trigger
             else:
-                order.with_context(ctx).write({'status': 'open'})  # Regular orders are immediately open
+                order.with_engine_context().write({'status': 'open'})  # Regular orders are immediately open
             
             # Matching is now handled by a cron job every minute
             
@@ -550,7 +580,7 @@ class StockOrder(models.Model):
     def action_cancel(self):
         """Cancel the order"""
         for order in self:
-            if order.status not in ['pending', 'partial']:
+            if order.status not in ['draft', 'submitted', 'open', 'partial']:
                 raise UserError("Only pending or partially filled orders can be cancelled.")
             
             order.status = 'cancelled'
@@ -559,8 +589,108 @@ class StockOrder(models.Model):
             # Log the action using centralized method
             order.log_action("Order cancelled", "Cancelled by user request")
     
-    def update_filled_quantity(self, qty, trade_price=None):
-        """Update filled quantity and average price after trade execution"""
+    # Statuses in which an order no longer needs its reservation
+    _RESERVATION_RELEASE_STATES = ('filled', 'cancelled', 'rejected', 'expired')
+    
+    def write(self, vals):
+        Analytics = self.env['stock.session.analytics'].sudo()
+        counted = any(field in vals for field in Analytics.ORDER_FIELDS)
+        before = Analytics._order_contributions(self) if counted else None
+        res = super().write(vals)
+        if counted:
+            # Session statistics follow the order's status (and, rarely, its edits)
+            Analytics._apply_order_deltas(removed=before, added=Analytics._order_contributions(self))
+        # Terminal states give back whatever is still held for the order
+        if vals.get('status') in self._RESERVATION_RELEASE_STATES:
+            self._release_reservation()
+        return res
+    
+    def unlink(self):
+        self._release_reservation()
+        Analytics = self.env['stock.session.analytics'].sudo()
+        Analytics._apply_order_deltas(removed=Analytics._order_contributions(self))
+        return super().unlink()
+    
+    def _get_reservation_price(self):
+        """Worst-case execution price used to size the cash hold of a buy order"""
+        self.ensure_one()
+        if self.order_type == 'stop_loss':
+            # Becomes a market order once triggered
+            return (self.stop_price or self.security_id.current_price) * 1.1
+        if self.order_type == 'market':
+            return self.price or self.security_id.current_price * 1.1
+        return self.price
+    
+    def _reserve_holdings(self):
+        """Reserve cash (buy) or block shares (sell) for the full order quantity.
+        IPO orders are priced at allocation time and are not reserved.
+        """
+        for order in self:
+            if order.order_type == 'ipo' or order.reserved_amount or order.reserved_quantity:
+                continue
+            if order.side == 'buy':
+                amount = order.quantity * order._get_reservation_price()
+                amount += amount * (order.broker_commission_rate or 0.0) / 100
+                order.user_id._reserve_cash(amount)
+                order.sudo().write({'reserved_amount': amount})
+            else:
+                position = self.env['stock.position'].sudo().search([
+                    ('user_id', '=', order.user_id.id),
+                    ('security_id', '=', order.security_id.id)
+                ], limit=1)
+                if not position:
+                    raise UserError(f"Insufficient shares. Required: {order.quantity}, Available: 0")
+                position.block_shares(order.quantity)
+                order.sudo().write({'reserved_quantity': order.quantity})
+    
+    def _get_reserved_amount_for(self, qty):
+        """Portion of the cash reservation that backs a fill of ``qty`` shares"""
+        self.ensure_one()
+        if not self.reserved_amount or self.remaining_quantity <= 0:
+            return 0.0
+        if qty >= self.remaining_quantity:
+            return self.reserved_amount
+        return self.reserved_amount * qty / self.remaining_quantity
+    
+    def _consume_reservation(self, qty):
+        """Release the reservation backing a fill of ``qty`` shares.
+        Must run before positions and filled quantity are updated for the fill.
+        """
+        self.ensure_one()
+        if self.side == 'buy' and self.reserved_amount:
+            amount = self._get_reserved_amount_for(qty)
+            self.user_id._release_cash(amount)
+            self.sudo().write({'reserved_amount': max(self.reserved_amount - amount, 0.0)})
+        elif self.side == 'sell' and self.reserved_quantity:
+            release_qty = min(qty, self.reserved_quantity)
+            position = self.env['stock.position'].sudo().search([
+                ('user_id', '=', self.user_id.id),
+                ('security_id', '=', self.security_id.id)
+            ], limit=1)
+            if position:
+                position.unblock_shares(min(release_qty, position.blocked_quantity))
+            self.sudo().write({'reserved_quantity': self.reserved_quantity - release_qty})
+    
+    def _release_reservation(self):
+        """Give back everything still reserved by the orders (cancel, expiry, rejection, overfunded fill)"""
+        for order in self:
+            if order.reserved_amount:
+                order.user_id._release_cash(order.reserved_amount)
+                super(StockOrder, order.sudo()).write({'reserved_amount': 0.0})
+            if order.reserved_quantity:
+                position = self.env['stock.position'].sudo().search([
+                    ('user_id', '=', order.user_id.id),
+                    ('security_id', '=', order.security_id.id)
+                ], limit=1)
+                if position:
+                    position.unblock_shares(min(order.reserved_quantity, position.blocked_quantity))
+                super(StockOrder, order.sudo()).write({'reserved_quantity': 0})
+    
+    def update_filled_quantity(self, qty, trade_price=None, trade=None):
+        """Update filled quantity and average price after trade execution.
+        Writes once and appends a row to the order fill history instead of
+        relying on mail tracking for the audit trail.
+        """
         self.ensure_one()
         
         if trade_price is None:
@@ -571,44 +701,247 @@ class StockOrder(models.Model):
         new_trade_value = qty * trade_price
         new_total_quantity = self.filled_quantity + qty
         
-        if new_total_quantity > 0:
-            self.average_price = (old_total_value + new_trade_value) / new_total_quantity
-        else:
-            self.average_price = 0.0
+        vals = {
+            'filled_quantity': new_total_quantity,
+            'average_price': (old_total_value + new_trade_value) / new_total_quantity if new_total_quantity > 0 else 0.0,
+        }
+        if new_total_quantity >= self.quantity:
+            vals['status'] = 'filled'
+        elif new_total_quantity > 0:
+            vals['status'] = 'partial'
         
-        self.filled_quantity += qty
+        self.with_engine_context().write(vals)
         
-        if self.filled_quantity >= self.quantity:
-            self.status = 'filled'
-        elif self.filled_quantity > 0:
-            self.status = 'partial'
+        self.env['stock.order.fill']._record_fill(self, qty, trade_price, trade=trade)
+    
+    # ------------------------------------------------------------------
+    # Lifecycle processor: set-based expire / cancel / promote transitions
+    # ------------------------------------------------------------------
+    
+    # Statuses of orders still resting in (or waiting to enter) the book
+    _RESTING_STATES = ('submitted', 'open', 'partial')
+    
+    def _batch_set_status(self, status, action, reason, note_field='description'):
+        """Move every order in ``self`` to ``status`` with a single UPDATE.
+        
+        Reservations are released in bulk for terminal statuses and one aggregated
+        audit entry is written per session instead of one chatter post per order.
+        
+        :param status: target status
+        :param action: audit label, e.g. "Orders expired"
+        :param reason: note stored on each order and in the audit entry (None to leave notes untouched)
+        :param note_field: 'description' or 'rejection_reason'
+        :return: number of orders transitioned
+        """
+        if not self:
+            return 0
+        self.env.flush_all()
+        
+        releases = status in self._RESERVATION_RELEASE_STATES
+        if releases:
+            self._batch_release_reservations()
+        Analytics = self.env['stock.session.analytics'].sudo()
+        before = Analytics._order_contributions(self)
+        
+        assignments = ["status = %s", "write_uid = %s", "write_date = (now() at time zone 'UTC')"]
+        params = [status, self.env.uid]
+        if reason is not None:
+            assignments.append(f"{note_field} = %s")
+            params.append(reason)
+        if releases:
+            assignments += ["reserved_amount = 0", "reserved_quantity = 0"]
+        self.env.cr.execute(
+            f"UPDATE stock_order SET {', '.join(assignments)} WHERE id IN %s",
+            params + [tuple(self.ids)]
+        )
+        self.invalidate_recordset([
+            'status', note_field, 'write_uid', 'write_date', 'reserved_amount', 'reserved_quantity'
+        ])
+        Analytics._apply_order_deltas(removed=before, added=[row[:3] + (status,) + row[4:] for row in before])
+        
+        self._log_batch_transition(action, reason or f"Status set to {status}")
+        return len(self)
+    
+    def _batch_open(self, action, reason=None):
+        """Reserve holdings for draft limit orders in ``self`` and open them with grouped UPDATEs.
+        
+        Bulk order entry for system accounts whose quotes are sized by the caller:
+        cash is held per user and shares blocked per position in one statement
+        each, after checking the totals against what is available.
+        
+        :return: number of orders opened
+        """
+        if not self:
+            return 0
+        self.env.flush_all()
+        cash = {}
+        shares = {}
+        rows = []
+        for order in self:
+            if order.status != 'draft' or order.order_type != 'limit':
+                raise UserError("Only draft limit orders can be opened in bulk.")
+            if order.side == 'buy':
+                amount = order.quantity * order.price
+                amount += amount * (order.broker_commission_rate or 0.0) / 100
+                cash[order.user_id] = cash.get(order.user_id, 0.0) + amount
+                rows.append((order.id, amount, 0))
+            else:
+                key = (order.user_id.id, order.security_id.id)
+                shares[key] = shares.get(key, 0) + order.quantity
+                rows.append((order.id, 0.0, order.quantity))
+        
+        for user, amount in cash.items():
+            if user.available_cash < amount:
+                raise UserError(f"Insufficient funds. Required: {amount:,.2f}, Available: {user.available_cash:,.2f}")
+        if shares:
+            self.env.cr.execute("""
+                SELECT user_id, security_id, quantity - COALESCE(blocked_quantity, 0)
+                  FROM stock_position
+                 WHERE (user_id, security_id) IN %s
+            """, [tuple(shares)])
+            available = {(user_id, security_id): qty for user_id, security_id, qty in self.env.cr.fetchall()}
+            for key, quantity in shares.items():
+                if available.get(key, 0) < quantity:
+                    raise UserError(f"Insufficient shares. Required: {quantity}, Available: {available.get(key, 0)}")
+            self.env.cr.execute("""
+                UPDATE stock_position p
+                   SET blocked_quantity = COALESCE(p.blocked_quantity, 0) + v.qty
+                  FROM (VALUES """ + ", ".join(["(%s, %s, %s)"] * len(shares)) + """) AS v(user_id, security_id, qty)
+                 WHERE p.user_id = v.user_id AND p.security_id = v.security_id
+            """, [value for (user_id, security_id), qty in shares.items() for value in (user_id, security_id, qty)])
+        if cash:
+            self.env.cr.execute("""
+                UPDATE res_users u
+                   SET reserved_cash = COALESCE(u.reserved_cash, 0) + v.amount
+                  FROM (VALUES """ + ", ".join(["(%s, %s::numeric)"] * len(cash)) + """) AS v(id, amount)
+                 WHERE u.id = v.id
+            """, [value for user, amount in cash.items() for value in (user.id, amount)])
+        
+        self.env.cr.execute("""
+            UPDATE stock_order o
+               SET status = 'open', reserved_amount = v.amount, reserved_quantity = v.qty,
+                   write_uid = %s, write_date = now() at time zone 'UTC'
+              FROM (VALUES """ + ", ".join(["(%s, %s::numeric, %s)"] * len(rows)) + """) AS v(id, amount, qty)
+             WHERE o.id = v.id
+        """, [self.env.uid] + [value for row in rows for value in row])
+        self.invalidate_recordset(['status', 'reserved_amount', 'reserved_quantity', 'write_uid', 'write_date'])
+        self.env['res.users'].invalidate_model(['reserved_cash', 'available_cash'])
+        self.env['stock.position'].invalidate_model(['blocked_quantity', 'available_quantity'])
+        Analytics = self.env['stock.session.analytics'].sudo()
+        before = [row[:3] + ('draft',) + row[4:] for row in Analytics._order_contributions(self)]
+        Analytics._apply_order_deltas(removed=before, added=[row[:3] + ('open',) + row[4:] for row in before])
+        
+        self._log_batch_transition(action, reason or "Status set to open")
+        return len(self)
+    
+    def _batch_release_reservations(self):
+        """Release cash and share reservations of ``self`` with grouped UPDATEs"""
+        ids = tuple(self.ids)
+        self.env.cr.execute("""
+            UPDATE res_users u
+               SET reserved_cash = GREATEST(COALESCE(u.reserved_cash, 0) - r.amount, 0)
+              FROM (SELECT user_id, SUM(reserved_amount) AS amount
+                      FROM stock_order
+                     WHERE id IN %s AND reserved_amount > 0
+                  GROUP BY user_id) r
+             WHERE u.id = r.user_id
+        """, [ids])
+        self.env.cr.execute("""
+            UPDATE stock_position p
+               SET blocked_quantity = GREATEST(COALESCE(p.blocked_quantity, 0) - r.qty, 0)
+              FROM (SELECT user_id, security_id, SUM(reserved_quantity) AS qty
+                      FROM stock_order
+                     WHERE id IN %s AND reserved_quantity > 0
+                  GROUP BY user_id, security_id) r
+             WHERE p.user_id = r.user_id AND p.security_id = r.security_id
+        """, [ids])
+        self.env['res.users'].invalidate_model(['reserved_cash', 'available_cash'])
+        self.env['stock.position'].invalidate_model(['blocked_quantity', 'available_quantity'])
+    
+    def _log_batch_transition(self, action, reason):
+        """Write one aggregated audit entry per session for a batch transition"""
+        for session in self.mapped('session_id'):
+            orders = self.filtered(lambda o: o.session_id == session)
+            names = orders[:20].mapped('name')
+            if len(orders) > 20:
+                names.append(f"... (+{len(orders) - 20} more)")
+            session.log_action(f"{action} ({len(orders)} orders)", f"{reason}. Orders: {', '.join(names)}")
+        _logger.info(f"[LIFECYCLE] {action}: {len(self)} orders - {reason}")
     
     @api.model
-    def expire_orders(self):
-        """Cron job to expire orders past their expiry date"""
-        expired_orders = self.search([
-            ('status', 'in', ['pending', 'partial']),
+    def _expire_past_due_orders(self):
+        """Expire resting orders whose expiry date has passed"""
+        orders = self.with_context(skip_portal_order_filter=True).search([
+            ('status', 'in', list(self._RESTING_STATES)),
+            ('expiry_date', '!=', False),
             ('expiry_date', '<=', fields.Datetime.now())
         ])
-        
-        for order in expired_orders:
-            order.status = 'expired'
-            order.description = "Order expired"
-            order.log_action("Order expired", "Expired due to time limit") 
-
+        return orders._batch_set_status('expired', "Orders expired", "Expired due to time limit")
+    
     @api.model
-    def expire_day_orders(self):
-        """Expire day orders at end of session - called by cron or session close"""
-        # Find all open day orders from closed sessions
-        expired_orders = self.search([
+    def _expire_closed_session_day_orders(self):
+        """Expire day orders still resting in sessions that are no longer open"""
+        orders = self.with_context(skip_portal_order_filter=True).search([
             ('time_in_force', '=', 'day'),
-            ('status', 'in', ['submitted', 'open', 'partial']),
-            ('session_id.state', '=', 'closed')
+            ('order_type', '!=', 'ipo'),
+            ('status', 'in', list(self._RESTING_STATES)),
+            ('session_id.state', 'in', ['closed', 'settled'])
         ])
-        
-        for order in expired_orders:
-            order.status = 'expired'
-            order.log_action("Order expired", "Expired at end of trading session") 
+        return orders._batch_set_status('expired', "Orders expired", "Expired at end of trading session")
+    
+    @api.model
+    def _promote_orphaned_orders(self):
+        """Promote submitted regular orders on trading securities to open and reject stale IPO orders"""
+        Order = self.with_context(skip_portal_order_filter=True)
+        promoted = Order.search([
+            ('status', '=', 'submitted'),
+            ('order_type', 'in', ['limit', 'market']),
+            ('security_id.status', '=', 'trade')
+        ])._batch_set_status('open', "Orders promoted", None)
+        rejected = Order.search([
+            ('status', 'in', ['submitted', 'open']),
+            ('order_type', '=', 'ipo'),
+            ('security_id.status', '=', 'trade')
+        ])._batch_set_status(
+            'rejected', "Orders rejected",
+            'IPO order for security that is already trading', note_field='rejection_reason'
+        )
+        return promoted, rejected
+    
+    @api.model
+    def _close_session_orders(self, session):
+        """Clear the resting book of a closing session: expire day orders, cancel the rest.
+        IPO orders carry over to the next session.
+        """
+        Order = self.with_context(skip_portal_order_filter=True)
+        base_domain = [('session_id', '=', session.id), ('order_type', '!=', 'ipo')]
+        expired = Order.search(base_domain + [
+            ('time_in_force', '=', 'day'),
+            ('status', 'in', list(self._RESTING_STATES))
+        ])._batch_set_status('expired', "Orders expired", "Expired at end of trading session")
+        cancelled = Order.search(base_domain + [
+            ('status', 'in', ['draft'] + list(self._RESTING_STATES))
+        ])._batch_set_status('cancelled', "Orders cancelled", "Cancelled at session close")
+        return expired, cancelled
+    
+    @api.model
+    def cron_process_order_lifecycle(self):
+        """Scheduled lifecycle pass: expiries, closed-session day orders and orphan promotion"""
+        expired = self._expire_past_due_orders()
+        expired += self._expire_closed_session_day_orders()
+        promoted, rejected = self._promote_orphaned_orders()
+        _logger.info(f"[LIFECYCLE] expired={expired} promoted={promoted} rejected={rejected}")
+        return {'expired': expired, 'promoted': promoted, 'rejected': rejected}
+    
+    @api.model
+    def expire_orders(self):
+        """Cron job to expire orders past their expiry date"""
+        return self.cron_process_order_lifecycle()
+    
+    @api.model
+    def expire_day_orders(self):
+        """Expire day orders at end of session - called by cron or session close"""
+        return self._expire_closed_session_day_orders()
     
     @api.model
     def _search(self, domain, offset=0, limit=None, order=None):
@@ -624,4 +957,36 @@ class StockOrder(models.Model):
                 is_system_admin = False
             if not is_system_admin and self.env.user.user_type not in ['broker', 'admin']:
                 domain = list(domain) + [('user_id', '=', self.env.user.id)]
-        return super(StockOrder, self)._search(domain, offset=offset, limit=limit, order=order)
\ No newline at end of file
+        return super(StockOrder, self)._search(domain, offset=offset, limit=limit, order=order)
+
+
+class StockOrderFill(models.Model):
+    """Compact per-order fill history (replaces mail tracking on filled_quantity/status)"""
+    _name = 'stock.order.fill'
+    _description = 'Stock Order Fill'
+    _order = 'order_id, id'
+    
+    order_id = fields.Many2one('stock.order', string='Order', required=True, ondelete='cascade', index=True)
+    trade_id = fields.Many2one('stock.trade', string='Trade', ondelete='set null')
+    session_id = fields.Many2one('stock.session', string='Trading Session', index=True)
+    fill_date = fields.Datetime(string='Fill Date', required=True, default=fields.Datetime.now)
+    quantity = fields.Integer(string='Fill Quantity', required=True)
+    price = fields.Float(string='Fill Price', digits=(16, 4), required=True)
+    cumulative_quantity = fields.Integer(string='Filled After Fill')
+    status = fields.Char(string='Order Status After Fill')
+    
+    @api.model
+    def _record_fill(self, order, quantity, price, trade=None):
+        """Append a fill row with a single INSERT (no ORM create, no mail pipeline)"""
+        self.env.cr.execute("""
+            INSERT INTO stock_order_fill
+                (order_id, trade_id, session_id, fill_date, quantity, price,
+                 cumulative_quantity, status, create_uid, create_date, write_uid, write_date)
+            VALUES (%s, %s, %s, now() at time zone 'UTC', %s, %s, %s, %s,
+                    %s, now() at time zone 'UTC', %s, now() at time zone 'UTC')
+        """, [
+            order.id, trade.id if trade else None, order.session_id.id or None,
+            quantity, price, order.filled_quantity, order.status,
+            self.env.uid, self.env.uid,
+        ])
+        order.invalidate_recordset(['fill_ids'])
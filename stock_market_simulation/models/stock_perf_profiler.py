@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, api
+from collections import Counter, deque
+import heapq
+import json
+import threading
+import time
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# Structured export of the profiles (one JSON line each), filterable by logger name
+_export_logger = logging.getLogger(__name__ + '.export')
+
+try:
+    from odoo.tools.cache import STAT as _ORMCACHE_STATS
+except ImportError:
+    try:
+        from odoo.tools.cache import _COUNTERS as _ORMCACHE_STATS
+    except ImportError:
+        _ORMCACHE_STATS = None
+
+# dbname -> deque of the most recent request profiles of this worker
+_PROFILES = {}
+_PROFILES_LOCK = threading.Lock()
+
+# Characters of a statement kept in a profile
+_STATEMENT_LENGTH = 500
+
+
+def _ormcache_misses(dbname):
+    """Process-wide ormcache miss counter of ``dbname`` (None when the counters are unavailable)"""
+    if _ORMCACHE_STATS is None:
+        return None
+    try:
+        return sum(stat.miss for key, stat in list(_ORMCACHE_STATS.items()) if key[0] == dbname)
+    except (AttributeError, IndexError, TypeError):
+        return None
+
+
+class RequestProbe:
+    """
+    Measurements of one request, fed by the cursor's per-thread query hooks.
+
+    Keeps counts, total SQL time, how often each statement ran (repeats of one
+    statement are the N+1 signature) and a bounded heap of the slowest ones.
+    """
+
+    def __init__(self, route, dbname, uid, buffer_size, slow_count, log_export):
+        self.route = route
+        self.dbname = dbname
+        self.uid = uid
+        self.buffer_size = buffer_size
+        self.slow_count = slow_count
+        self.log_export = log_export
+        self.status = 'ok'
+        self.query_count = 0
+        self.query_time = 0.0
+        self.statements = Counter()
+        self.slowest = []
+        self.started = time.perf_counter()
+        self.cache_misses = _ormcache_misses(dbname)
+
+    def __call__(self, cr, query, params, start, delay, *args):
+        statement = str(query)[:_STATEMENT_LENGTH]
+        self.query_count += 1
+        self.query_time += delay
+        self.statements[statement] += 1
+        if self.slow_count:
+            item = (delay, self.query_count, statement)
+            if len(self.slowest) < self.slow_count:
+                heapq.heappush(self.slowest, item)
+            elif delay > self.slowest[0][0]:
+                heapq.heapreplace(self.slowest, item)
+
+    def attach(self):
+        thread = threading.current_thread()
+        if not hasattr(thread, 'query_hooks'):
+            thread.query_hooks = []
+        thread.query_hooks.append(self)
+
+    def detach(self):
+        hooks = getattr(threading.current_thread(), 'query_hooks', [])
+        if self in hooks:
+            hooks.remove(self)
+
+    def to_dict(self):
+        misses = _ormcache_misses(self.dbname)
+        repeated, repeats = self.statements.most_common(1)[0] if self.statements else ('', 0)
+        return {
+            'timestamp': time.time(),
+            'route': self.route,
+            'uid': self.uid,
+            'status': self.status,
+            'wall_ms': (time.perf_counter() - self.started) * 1000,
+            'query_count': self.query_count,
+            'query_ms': self.query_time * 1000,
+            'distinct_queries': len(self.statements),
+            'cache_misses': misses - self.cache_misses if misses is not None and self.cache_misses is not None else None,
+            'top_repeat': repeats,
+            'top_repeat_query': repeated if repeats > 1 else '',
+            'slowest': [
+                {'ms': delay * 1000, 'query': statement}
+                for delay, _seq, statement in sorted(self.slowest, reverse=True)
+            ],
+        }
+
+
+class StockPerfProfiler(models.AbstractModel):
+    """Opt-in per-request profiling of the portal routes, kept in an in-memory ring buffer"""
+    _name = 'stock.perf.profiler'
+    _description = 'Portal Request Profiler'
+
+    # Requests repeating one statement at least this often are flagged as likely N+1
+    N_PLUS_ONE_THRESHOLD = 10
+
+    @api.model
+    def _start(self, route):
+        """Probe for the current request, attached to the cursor hooks, or None when profiling is off"""
+        enabled, buffer_size, slow_count, log_export = self.env['stock.config']._get_perf_settings()
+        if not enabled:
+            return None
+        probe = RequestProbe(route, self.env.cr.dbname, self.env.uid, buffer_size, slow_count, log_export)
+        probe.attach()
+        return probe
+
+    @api.model
+    def _finish(self, probe):
+        """Detach ``probe`` and store its profile; runs no SQL so it is safe after a failed request"""
+        probe.detach()
+        profile = probe.to_dict()
+        with _PROFILES_LOCK:
+            buffer = _PROFILES.get(probe.dbname)
+            if buffer is None or buffer.maxlen != probe.buffer_size:
+                buffer = _PROFILES[probe.dbname] = deque(buffer or (), maxlen=probe.buffer_size)
+            buffer.append(profile)
+        if probe.log_export:
+            _export_logger.info(json.dumps(profile, default=str))
+        return profile
+
+    @api.model
+    def get_profiles(self, route=None, limit=None):
+        """Most recent profiles first, optionally of one route"""
+        with _PROFILES_LOCK:
+            profiles = list(_PROFILES.get(self.env.cr.dbname, ()))
+        profiles.reverse()
+        if route:
+            profiles = [profile for profile in profiles if profile['route'] == route]
+        return profiles[:limit] if limit else profiles
+
+    @api.model
+    def get_route_summary(self):
+        """Per-route aggregates of the buffered profiles, most total wall time first"""
+        routes = {}
+        for profile in self.get_profiles():
+            row = routes.setdefault(profile['route'], {
+                'route': profile['route'], 'count': 0, 'errors': 0,
+                'wall_ms': 0.0, 'max_wall_ms': 0.0, 'queries': 0, 'max_queries': 0,
+                'query_ms': 0.0, 'cache_misses': 0, 'top_repeat': 0, 'top_repeat_query': '',
+            })
+            row['count'] += 1
+            row['errors'] += profile['status'] != 'ok'
+            row['wall_ms'] += profile['wall_ms']
+            row['max_wall_ms'] = max(row['max_wall_ms'], profile['wall_ms'])
+            row['queries'] += profile['query_count']
+            row['max_queries'] = max(row['max_queries'], profile['query_count'])
+            row['query_ms'] += profile['query_ms']
+            row['cache_misses'] += profile['cache_misses'] or 0
+            if profile['top_repeat'] > row['top_repeat']:
+                row['top_repeat'] = profile['top_repeat']
+                row['top_repeat_query'] = profile['top_repeat_query']
+        summary = []
+        for row in routes.values():
+            count = row['count']
+            row.update({
+                'avg_wall_ms': row['wall_ms'] / count,
+                'avg_queries': row['queries'] / count,
+                'avg_query_ms': row['query_ms'] / count,
+                'avg_cache_misses': row['cache_misses'] / count,
+                'n_plus_one': row['top_repeat'] >= self.N_PLUS_ONE_THRESHOLD,
+            })
+            summary.append(row)
+        summary.sort(key=lambda row: row['wall_ms'], reverse=True)
+        return summary
+
+    @api.model
+    def clear(self):
+        with _PROFILES_LOCK:
+            _PROFILES.pop(self.env.cr.dbname, None)
+        _logger.info(f"[PERF] Request profiles cleared by uid={self.env.uid}")
+        return True
@@ -179,6 +179,35 @@ class StockPosition(models.Model):
             if position.blocked_quantity > position.quantity:
                 raise ValidationError("Blocked quantity cannot exceed total quantity.")
     
+    @api.model_create_multi
+    def create(self, vals_list):
+        positions = super().create(vals_list)
+        held = positions.filtered(lambda p: p.quantity > 0)
+        if held:
+            self.env['stock.news.interest'].sudo()._refresh_users(held.user_id.ids)
+        return positions
+    
+    def write(self, vals):
+        if not {'quantity', 'security_id', 'user_id'} & vals.keys():
+            return super().write(vals)
+        # News interest profiles follow positions opening, closing and changing hands
+        was_held = {position.id: position.quantity > 0 for position in self}
+        old_users = {position.id: position.user_id.id for position in self}
+        res = super().write(vals)
+        changed = self.filtered(
+            lambda p: 'security_id' in vals or 'user_id' in vals or (p.quantity > 0) != was_held[p.id]
+        )
+        if changed:
+            user_ids = set(changed.user_id.ids) | {old_users[p.id] for p in changed if old_users[p.id]}
+            self.env['stock.news.interest'].sudo()._refresh_users(list(user_ids))
+        return res
+    
+    def unlink(self):
+        user_ids = self.user_id.ids
+        res = super().unlink()
+        self.env['stock.news.interest'].sudo()._refresh_users(user_ids)
+        return res
+    
     def update_position(self, quantity_change, price, transaction_type='buy'):
         """
         Update position after a trade
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api
+import math
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class StockPriceBar(models.Model):
+    """OHLCV bars per security, filled incrementally from executed trades"""
+    _name = 'stock.price.bar'
+    _description = 'Stock Price Bar (OHLCV)'
+    _order = 'security_id, timeframe, bar_start'
+    _rec_name = 'bar_start'
+
+    # The unique constraint doubles as the (security_id, timeframe, bar_start)
+    # index used by range queries and as the upsert target of _record_trade
+    _sql_constraints = [
+        ('bar_unique',
+         'UNIQUE(security_id, timeframe, bar_start)',
+         'Only one bar per security, timeframe and start time is allowed.')
+    ]
+
+    security_id = fields.Many2one(
+        'stock.security',
+        string='Security',
+        required=True,
+        ondelete='cascade'
+    )
+
+    session_id = fields.Many2one(
+        'stock.session',
+        string='Trading Session',
+        index=True,
+        help='Session of the first trade in the bar'
+    )
+
+    timeframe = fields.Selection([
+        ('1m', '1 Minute'),
+        ('session', 'Session'),
+        ('1d', 'Daily'),
+    ], string='Timeframe', required=True)
+
+    bar_start = fields.Datetime(string='Bar Start', required=True)
+
+    open = fields.Float(string='Open', digits=(16, 4), required=True)
+    high = fields.Float(string='High', digits=(16, 4), required=True)
+    low = fields.Float(string='Low', digits=(16, 4), required=True)
+    close = fields.Float(string='Close', digits=(16, 4), required=True)
+    volume = fields.Integer(string='Volume', default=0)
+    value = fields.Float(string='Value Traded', digits='Product Price', default=0.0)
+    trade_count = fields.Integer(string='Trades', default=0)
+
+    vwap = fields.Float(
+        string='VWAP',
+        compute='_compute_vwap',
+        digits=(16, 4)
+    )
+
+    # Column order returned by get_series
+    _SERIES_COLUMNS = ('bar_start', 'open', 'high', 'low', 'close', 'volume', 'value', 'trade_count')
+
+    @api.depends('volume', 'value', 'close')
+    def _compute_vwap(self):
+        for bar in self:
+            bar.vwap = bar.value / bar.volume if bar.volume else bar.close
+
+    @api.model
+    def _bar_starts(self, trade_date, session):
+        """Start time of the 1m, session and daily buckets containing ``trade_date``"""
+        return {
+            '1m': trade_date.replace(second=0, microsecond=0),
+            'session': (session.actual_start_date if session and session.actual_start_date
+                        else trade_date.replace(hour=0, minute=0, second=0, microsecond=0)),
+            '1d': trade_date.replace(hour=0, minute=0, second=0, microsecond=0),
+        }
+
+    @api.model
+    def _record_trade(self, security_id, session, price, quantity, trade_date=None):
+        """Fold one trade into the 1m, session and daily bars with a single upsert"""
+        trade_date = trade_date or fields.Datetime.now()
+        starts = self._bar_starts(trade_date, session)
+        value = price * quantity
+        params = []
+        for timeframe, bar_start in starts.items():
+            params += [security_id, session.id if session else None, timeframe, bar_start,
+                       price, price, price, price, quantity, value, self.env.uid, self.env.uid]
+        self.env.cr.execute("""
+            INSERT INTO stock_price_bar
+                (security_id, session_id, timeframe, bar_start, open, high, low, close,
+                 volume, value, trade_count, create_uid, create_date, write_uid, write_date)
+            SELECT v.security_id, v.session_id, v.timeframe, v.bar_start, v.open, v.high, v.low, v.close,
+                   v.volume, v.value, 1, v.uid, now() at time zone 'UTC', v.wuid, now() at time zone 'UTC'
+              FROM (VALUES """ + ", ".join(
+                  ["(%s, %s, %s, %s::timestamp, %s::numeric, %s::numeric, %s::numeric, %s::numeric, %s, %s::numeric, %s, %s)"] * len(starts)
+              ) + """) AS v(security_id, session_id, timeframe, bar_start, open, high, low, close, volume, value, uid, wuid)
+            ON CONFLICT (security_id, timeframe, bar_start) DO UPDATE
+               SET high = GREATEST(stock_price_bar.high, EXCLUDED.high),
+                   low = LEAST(stock_price_bar.low, EXCLUDED.low),
+                   close = EXCLUDED.close,
+                   volume = stock_price_bar.volume + EXCLUDED.volume,
+                   value = stock_price_bar.value + EXCLUDED.value,
+                   trade_count = stock_price_bar.trade_count + 1,
+                   write_date = EXCLUDED.write_date
+        """, params)
+        self.env['stock.session.analytics'].sudo()._record_trade(security_id, session, price, quantity)
+
+    @api.model
+    def get_series(self, security_id, timeframe='1d', start=None, end=None, limit=None):
+        """
+        Columnar OHLCV history for one security.
+
+        Returns a dict of parallel lists keyed by column name (bar_start, open,
+        high, low, close, volume, value, trade_count), read with one index range scan.
+        """
+        query = ("SELECT " + ", ".join(self._SERIES_COLUMNS) +
+                 " FROM stock_price_bar WHERE security_id = %s AND timeframe = %s")
+        params = [security_id, timeframe]
+        if start:
+            query += " AND bar_start >= %s"
+            params.append(start)
+        if end:
+            query += " AND bar_start <= %s"
+            params.append(end)
+        if limit:
+            # Latest ``limit`` bars, still returned in ascending order
+            query = f"SELECT * FROM ({query} ORDER BY bar_start DESC LIMIT %s) latest"
+            params.append(limit)
+        query += " ORDER BY bar_start"
+        self.env.cr.execute(query, params)
+        rows = self.env.cr.fetchall()
+        columns = list(zip(*rows)) if rows else [()] * len(self._SERIES_COLUMNS)
+        return {name: list(col) for name, col in zip(self._SERIES_COLUMNS, columns)}
+
+    @api.model
+    def get_session_volumes(self, session):
+        """{security_id: (volume, value)} traded in ``session``, read from the session bars"""
+        if not session:
+            return {}
+        self.env.cr.execute("""
+            SELECT security_id, volume, value
+              FROM stock_price_bar
+             WHERE session_id = %s AND timeframe = 'session'
+        """, [session.id])
+        return {security_id: (volume, value) for security_id, volume, value in self.env.cr.fetchall()}
+
+    @api.model
+    def compute_returns(self, closes, log=False):
+        """Period-over-period returns of a close-price array"""
+        pairs = [(prev, curr) for prev, curr in zip(closes, closes[1:]) if prev and prev > 0]
+        if log:
+            return [math.log(curr / prev) for prev, curr in pairs if curr > 0]
+        return [(curr - prev) / prev for prev, curr in pairs]
+
+    @api.model
+    def compute_volatility(self, closes, periods_per_year=252):
+        """Annualized volatility (%) of a close-price array"""
+        returns = self.compute_returns(closes)
+        if not returns:
+            return 0.0
+        mean_return = sum(returns) / len(returns)
+        variance = sum((r - mean_return) ** 2 for r in returns) / len(returns)
+        return math.sqrt(variance) * math.sqrt(periods_per_year) * 100
+
+    @api.model
+    def rebuild_from_trades(self, security_ids=None):
+        """Rebuild all bars from stock.trade with grouped SQL (backfill for existing history)"""
+        where = "WHERE t.security_id IN %s" if security_ids else ""
+        params = [tuple(security_ids)] if security_ids else []
+        self.env.cr.execute(
+            f"DELETE FROM stock_price_bar {'WHERE security_id IN %s' if security_ids else ''}", params
+        )
+        buckets = {
+            '1m': "date_trunc('minute', t.trade_date)",
+            '1d': "date_trunc('day', t.trade_date)",
+            'session': "COALESCE(s.actual_start_date, date_trunc('day', t.trade_date))",
+        }
+        for timeframe, bucket in buckets.items():
+            self.env.cr.execute(f"""
+                INSERT INTO stock_price_bar
+                    (security_id, session_id, timeframe, bar_start, open, high, low, close,
+                     volume, value, trade_count, create_uid, create_date, write_uid, write_date)
+                SELECT t.security_id,
+                       MIN(t.session_id),
+                       %s,
+                       {bucket} AS bar_start,
+                       (ARRAY_AGG(t.price ORDER BY t.trade_date, t.id))[1],
+                       MAX(t.price),
+                       MIN(t.price),
+                       (ARRAY_AGG(t.price ORDER BY t.trade_date DESC, t.id DESC))[1],
+                       SUM(t.quantity),
+                       SUM(t.quantity * t.price),
+                       COUNT(*),
+                       %s, now() at time zone 'UTC', %s, now() at time zone 'UTC'
+                  FROM stock_trade t
+             LEFT JOIN stock_session s ON s.id = t.session_id
+                  {where}
+              GROUP BY t.security_id, {bucket}
+            """, [timeframe, self.env.uid, self.env.uid] + params)
+        self.invalidate_model()
+        _logger.info("[BARS] Rebuilt OHLCV bars from trade history")
+        return True
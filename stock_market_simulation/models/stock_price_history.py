@@ -81,6 +81,7 @@ class StockPriceHistory(models.Model):
         ('corporate', 'Corporate Action'),
         ('circuit', 'Circuit Breaker'),
         ('session_end', 'Session End Snapshot'),
+        ('news', 'News Impact'),
     ], string='Change Reason', default='trade')
     
     notes = fields.Text(
@@ -155,32 +156,25 @@ class StockPriceHistory(models.Model):
     def calculate_volatility(self, security_id, days=30):
         """Calculate price volatility over a period"""
         from datetime import timedelta
-        import math
         
         end_date = fields.Datetime.now()
         start_date = end_date - timedelta(days=days)
         
-        price_changes = self.get_price_range(security_id, start_date, end_date)
+        Bar = self.env['stock.price.bar']
         
-        if len(price_changes) < 2:
-            return 0.0
+        # Daily closes from the OHLCV bar store (single index range scan)
+        closes = Bar.get_series(security_id, '1d', start_date, end_date)['close']
         
-        # Calculate daily returns
-        returns = []
-        for i in range(1, len(price_changes)):
-            prev_price = price_changes[i-1].new_price
-            curr_price = price_changes[i].new_price
-            
-            if prev_price > 0:
-                daily_return = (curr_price - prev_price) / prev_price
-                returns.append(daily_return)
+        if len(closes) < 2:
+            # No bar history yet: fall back to the sparse price change events
+            self.env.cr.execute("""
+                SELECT new_price FROM stock_price_history
+                 WHERE security_id = %s AND change_date >= %s AND change_date <= %s
+              ORDER BY change_date
+            """, [security_id, start_date, end_date])
+            closes = [row[0] for row in self.env.cr.fetchall()]
         
-        if not returns:
+        if len(closes) < 2:
             return 0.0
         
-        # Calculate standard deviation of returns
-        mean_return = sum(returns) / len(returns)
-        variance = sum((r - mean_return) ** 2 for r in returns) / len(returns)
-        volatility = math.sqrt(variance) * math.sqrt(252)  # Annualized
-        
-        return volatility * 100  # As percentage 
\ No newline at end of file
+        return Bar.compute_volatility(closes)
@@ -1,9 +1,25 @@
 # -*- coding: utf-8 -*-
 
-from decimal import Decimal
-from odoo import models, fields, api
+from collections import namedtuple
+from decimal import Decimal, ROUND_CEILING, ROUND_FLOOR, ROUND_HALF_UP
+from odoo import models, fields, api, tools
 from odoo.exceptions import ValidationError
 
+# One row of the cached security directory (see StockSecurity._get_directory)
+SecurityEntry = namedtuple('SecurityEntry', [
+    'id', 'symbol', 'name', 'sector', 'sector_label', 'security_type', 'status', 'ipo_status',
+    'tick_size', 'lot_size', 'max_order_size', 'total_shares',
+    'current_price', 'ipo_price', 'session_start_price', 'previous_close',
+    'change_amount', 'change_percentage', 'logo_url',
+])
+
+# Writes to any of these fields bump directory_version, which keys the directory cache
+DIRECTORY_FIELDS = {
+    'symbol', 'name', 'sector', 'security_type', 'status', 'ipo_status', 'active',
+    'tick_size', 'lot_size', 'max_order_size', 'total_shares',
+    'current_price', 'ipo_price', 'session_start_price', 'previous_close', 'logo',
+}
+
 class StockSecurity(models.Model):
     _name = 'stock.security'
     _description = 'Tradeable Security'
@@ -52,6 +68,14 @@ class StockSecurity(models.Model):
         help='Company logo image'
     )
     
+    directory_version = fields.Integer(
+        string='Directory Version',
+        default=1,
+        readonly=True,
+        copy=False,
+        help='Bumped whenever listing data or price changes; keys the cached directory'
+    )
+    
     logo_filename = fields.Char(
         string='Logo Filename'
     )
@@ -351,47 +375,229 @@ class StockSecurity(models.Model):
                         f"Price {security.current_price} is not valid for tick size {security.tick_size}"
                     )
     
-    def update_price(self, new_price):
+    def update_price(self, new_price, reason='trade'):
         """Update security price with validation"""
         self.ensure_one()
+        self.update_prices({self.id: new_price}, reason=reason)
+    
+    @api.model
+    def _snap_price(self, price, tick_size, direction=0):
+        """``price`` on the tick grid: nearest tick, or the tick below/above for direction -1/+1"""
+        if tick_size <= 0:
+            return price
+        ticks = Decimal(str(price)) / Decimal(str(tick_size))
+        rounding = {-1: ROUND_FLOOR, 1: ROUND_CEILING}.get(direction, ROUND_HALF_UP)
+        return float(ticks.to_integral_value(rounding=rounding) * Decimal(str(tick_size)))
+    
+    @api.model
+    def update_prices(self, prices, reason='manual', notes=None, clamp=False):
+        """
+        Batched price update: one UPDATE of the securities and one INSERT of their history.
         
-        # Check tick size
-        if self.tick_size > 0:
-            # Use Decimal for precise validation
-            price_decimal = Decimal(str(new_price))
-            tick_decimal = Decimal(str(self.tick_size))
-            remainder = price_decimal % tick_decimal
-            if remainder > Decimal('0.000001'):
-                raise ValidationError(
-                    f"Price {new_price} is not valid for tick size {self.tick_size}"
-                )
+        ``prices`` maps security ids to new prices. Each price must sit on the
+        tick grid and inside the open session's circuit breaker band; with
+        ``clamp`` it is snapped to the grid and held at the band edge instead of
+        raising. Returns {security_id: (old_price, new_price)} for the prices
+        that actually moved.
+        """
+        if not prices:
+            return {}
+        session = self.env['stock.session'].search([('state', '=', 'open')], limit=1)
+        breakers = session and self.env['stock.config'].get_config().circuit_breaker_enabled
         
-        # Check circuit breakers
-        active_session = self.env['stock.session'].search([('state', '=', 'open')], limit=1)
-        if active_session and self.session_start_price:
-            change_pct = abs((new_price - self.session_start_price) / self.session_start_price * 100)
+        moves = {}
+        for security in self.browse(list(prices)):
+            new_price = prices[security.id]
+            tick = security.tick_size
+            if clamp:
+                new_price = self._snap_price(new_price, tick)
+            elif tick > 0:
+                # Use Decimal for precise validation
+                remainder = Decimal(str(new_price)) % Decimal(str(tick))
+                if remainder > Decimal('0.000001'):
+                    raise ValidationError(
+                        f"Price {new_price} is not valid for tick size {tick}"
+                    )
             
-            if new_price > self.session_start_price:
-                limit = active_session.circuit_breaker_upper
-            else:
-                limit = active_session.circuit_breaker_lower
+            # Check circuit breakers
+            start_price = security.session_start_price
+            if breakers and start_price:
+                limit = session.circuit_breaker_upper if new_price > start_price else session.circuit_breaker_lower
+                change_pct = abs((new_price - start_price) / start_price * 100)
+                if change_pct > limit:
+                    if not clamp:
+                        raise ValidationError(
+                            f"Price change exceeds circuit breaker limit of {limit}%"
+                        )
+                    if new_price > start_price:
+                        new_price = self._snap_price(start_price * (1 + limit / 100), tick, -1)
+                    else:
+                        new_price = self._snap_price(start_price * (1 - limit / 100), tick, 1)
             
-            if change_pct > limit:
-                raise ValidationError(
-                    f"Price change exceeds circuit breaker limit of {limit}%"
-                )
+            if new_price <= 0:
+                if not clamp:
+                    raise ValidationError("Price must be greater than zero.")
+                new_price = tick if tick > 0 else security.current_price
+            if new_price != security.current_price:
+                moves[security.id] = (security.current_price, new_price)
+        if not moves:
+            return moves
         
-        # Record price history
-        self.env['stock.price.history'].create({
-            'security_id': self.id,
-            'old_price': self.current_price,
-            'new_price': new_price,
-            'session_id': active_session.id if active_session else False,
-        })
+        self.flush_model()
+        params = [value for security_id, (old, new) in moves.items() for value in (security_id, new)]
+        self.env.cr.execute("""
+            UPDATE stock_security s
+               SET current_price = v.price, directory_version = s.directory_version + 1,
+                   write_uid = %s, write_date = now() at time zone 'UTC'
+              FROM (VALUES """ + ", ".join(["(%s, %s::numeric)"] * len(moves)) + """) AS v(id, price)
+             WHERE s.id = v.id
+        """, [self.env.uid] + params)
         
-        # Update price
-        self.current_price = new_price
-    
+        # Price history in bulk, stored computes (change, display name) filled in SQL
+        params = [value for security_id, (old, new) in moves.items() for value in (security_id, old, new)]
+        self.env.cr.execute("""
+            INSERT INTO stock_price_history
+                (security_id, old_price, new_price, change_amount, change_percentage, display_name,
+                 session_id, change_date, change_reason, notes, create_uid, create_date, write_uid, write_date)
+            SELECT v.security_id, v.old_price, v.new_price, v.new_price - v.old_price,
+                   CASE WHEN v.old_price != 0 THEN (v.new_price - v.old_price) / v.old_price * 100 ELSE 0 END,
+                   s.symbol || ' - ' || to_char(now() at time zone 'UTC', 'YYYY-MM-DD HH24:MI:SS'),
+                   %s, now() at time zone 'UTC', %s, %s, %s, now() at time zone 'UTC', %s, now() at time zone 'UTC'
+              FROM (VALUES """ + ", ".join(["(%s, %s::numeric, %s::numeric)"] * len(moves)) + """)
+                   AS v(security_id, old_price, new_price)
+              JOIN stock_security s ON s.id = v.security_id
+        """, [session.id or None, reason, notes or None, self.env.uid, self.env.uid] + params)
+        
+        self.invalidate_model(['current_price', 'change_amount', 'change_percentage', 'directory_version'])
+        self.env['stock.price.history'].invalidate_model()
+        securities = self.browse(list(moves))
+        reason_label = dict(self.env['stock.price.history']._fields['change_reason'].selection).get(reason, reason)
+        securities.log_action("Price updated", f"Reason: {reason_label}" + (f" - {notes}" if notes else ""))
+        
+        # Margin monitor: fire the margin calls crossed by the new prices
+        self.env['stock.loan'].sudo()._on_collateral_price_update(
+            {security_id: new for security_id, (old, new) in moves.items()}
+        )
+        return moves
+    
+    def write(self, vals):
+        res = super().write(vals)
+        if DIRECTORY_FIELDS.intersection(vals):
+            # Listing data or price changed: move the directory stamp of these rows only
+            self.flush_model(['directory_version'])
+            self.env.cr.execute(
+                "UPDATE stock_security SET directory_version = directory_version + 1 WHERE id IN %s",
+                [tuple(self.ids)],
+            )
+            self.invalidate_recordset(['directory_version'])
+        if 'sector' in vals:
+            # Holders' news interest profiles carry the sector
+            self.env['stock.news.interest'].sudo()._refresh_security(self.ids)
+        if 'current_price' in vals:
+            # Margin monitor: fire the margin calls crossed by the new price
+            self.env['stock.loan'].sudo()._on_collateral_price_update(
+                {security.id: security.current_price for security in self}
+            )
+        return res
+
+    @api.model
+    def _get_directory_stamp(self):
+        """
+        (count, max id, sum of versions) of all securities, in one aggregate query.
+
+        Creates move the max id, deletes the count and every listing or price
+        change bumps a row version, so the stamp changes with any committed
+        change and is read from the same snapshot as the data it keys.
+        """
+        self.flush_model()
+        self.env.cr.execute("SELECT COUNT(*), MAX(id), SUM(directory_version) FROM stock_security")
+        return self.env.cr.fetchone()
+
+    @api.model
+    def _get_directory(self):
+        """Active securities as immutable SecurityEntry rows, in symbol order (see _build_directory)"""
+        return self._build_directory(self._get_directory_stamp())
+
+    @api.model
+    @tools.ormcache('stamp')
+    def _build_directory(self, stamp):
+        """
+        Active securities as immutable SecurityEntry rows, in symbol order.
+
+        Serves the listing pages and order-entry forms without loading records;
+        logo URLs carry the attachment checksum so browsers can cache them for good.
+        """
+        securities = self.sudo().search_fetch([('active', '=', True)], [
+            'symbol', 'name', 'sector', 'security_type', 'status', 'ipo_status', 'tick_size', 'lot_size',
+            'max_order_size', 'total_shares', 'current_price', 'ipo_price', 'session_start_price', 'previous_close',
+        ])
+        self.env.cr.execute("""
+            SELECT res_id, checksum
+              FROM ir_attachment
+             WHERE res_model = 'stock.security' AND res_field = 'logo' AND res_id IN %s
+        """, [tuple(securities.ids) or (0,)])
+        checksums = dict(self.env.cr.fetchall())
+        sector_labels = dict(self._fields['sector'].selection)
+        entries = []
+        for security in securities:
+            start_price = security.session_start_price
+            change_amount = security.current_price - start_price if start_price else 0.0
+            checksum = checksums.get(security.id)
+            entries.append(SecurityEntry(
+                id=security.id,
+                symbol=security.symbol,
+                name=security.name,
+                sector=security.sector,
+                sector_label=sector_labels.get(security.sector, ''),
+                security_type=security.security_type,
+                status=security.status,
+                ipo_status=security.ipo_status,
+                tick_size=security.tick_size,
+                lot_size=security.lot_size,
+                max_order_size=security.max_order_size,
+                total_shares=security.total_shares,
+                current_price=security.current_price,
+                ipo_price=security.ipo_price,
+                session_start_price=start_price,
+                previous_close=security.previous_close,
+                change_amount=change_amount,
+                # Same ratio as change_percentage (not multiplied by 100)
+                change_percentage=change_amount / start_price if start_price else 0.0,
+                logo_url=checksum and f"/web/image/stock.security/{security.id}/logo?unique={checksum}",
+            ))
+        return tuple(entries)
+
+    @api.model
+    def _get_movers_index(self):
+        """Directory entries that moved this session, sorted by change_percentage descending"""
+        return self._build_movers_index(self._get_directory_stamp())
+
+    @api.model
+    @tools.ormcache('stamp')
+    def _build_movers_index(self, stamp):
+        return tuple(sorted(
+            (entry for entry in self._build_directory(stamp) if entry.change_percentage),
+            key=lambda entry: entry.change_percentage,
+            reverse=True,
+        ))
+
+    @api.model
+    def get_directory(self, ipo_status=None):
+        """Cached directory entries, optionally restricted to one or more ipo_status values"""
+        entries = self._get_directory()
+        if ipo_status:
+            statuses = {ipo_status} if isinstance(ipo_status, str) else set(ipo_status)
+            entries = tuple(entry for entry in entries if entry.ipo_status in statuses)
+        return entries
+
+    @api.model
+    def get_top_movers(self, limit=5):
+        """(gainers, losers): the ``limit`` largest rises and falls, read off the movers index"""
+        index = self._get_movers_index()
+        gainers = [entry for entry in index[:limit] if entry.change_percentage > 0]
+        losers = [entry for entry in index[::-1][:limit] if entry.change_percentage < 0]
+        return gainers, losers
+
     def action_view_order_book(self):
         """View order book for this security"""
         self.ensure_one()
@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
+from odoo.tools import frozendict
 from odoo.exceptions import ValidationError, UserError
 from datetime import datetime, timedelta
+from bisect import bisect_left, bisect_right
 import logging
 
 _logger = logging.getLogger(__name__)
@@ -27,6 +29,7 @@ class StockSession(models.Model):
         required=True,
         readonly=True,
         copy=False,
+        index=True,
         help='Sequential session number for ordering and calculations'
     )
     
@@ -184,32 +187,95 @@ class StockSession(models.Model):
     def create(self, vals):
         """Auto-generate session name with serial number in format 'Session 01', 'Session 02', etc."""
         if not vals.get('name') or not vals.get('session_number'):
-            # Get the last session number by searching for sessions with Session pattern
-            last_session = self.search([
-                ('name', 'like', 'Session %')
-            ], order='id desc', limit=1)
-            
-            if last_session:
-                try:
-                    # Extract number from "Session 01", "Session 02", etc.
-                    session_parts = last_session.name.split(' ')
-                    if len(session_parts) >= 2:
-                        last_num = int(session_parts[1])
-                        new_num = last_num + 1
-                    else:
-                        new_num = 1
-                except (ValueError, IndexError):
-                    # If parsing fails, default to 1
-                    new_num = 1
-            else:
-                new_num = 1
+            # Next number on the session clock (index scan on session_number)
+            last_session = self.search([], order='session_number desc', limit=1)
+            new_num = (last_session.session_number or 0) + 1
             
             if not vals.get('name'):
                 vals['name'] = f'Session {new_num:02d}'
             if not vals.get('session_number'):
                 vals['session_number'] = new_num
         
-        return super(StockSession, self).create(vals)
+        session = super(StockSession, self).create(vals)
+        self.env.registry.clear_cache()
+        return session
+    
+    def write(self, vals):
+        res = super().write(vals)
+        if {'state', 'session_number', 'planned_start_date', 'planned_end_date',
+                'actual_start_date', 'actual_end_date'}.intersection(vals):
+            # The session clock or calendar moved
+            self.env.registry.clear_cache()
+        return res
+    
+    @api.model
+    @tools.ormcache()
+    def _get_session_clock(self):
+        """(open session number, latest session number); 0 when there is none"""
+        self.env.cr.execute("""
+            SELECT COALESCE(MAX(session_number) FILTER (WHERE state = 'open'), 0),
+                   COALESCE(MAX(session_number), 0)
+              FROM stock_session
+        """)
+        return tuple(self.env.cr.fetchone())
+    
+    @api.model
+    def _get_current_session_number(self):
+        """Number of the open session, 0 when no session is open"""
+        return self._get_session_clock()[0]
+    
+    @api.model
+    def _get_clock_session_number(self):
+        """Number of the open session, or of the latest session when none is open"""
+        open_number, latest_number = self._get_session_clock()
+        return open_number or latest_number
+    
+    @api.model
+    @tools.ormcache()
+    def _get_session_calendar(self):
+        """
+        Session calendar: (numbers, entries, number_by_id).
+
+        ``entries`` is sorted by session number, one (session_number, id, start, end)
+        tuple per session, start/end being the actual dates or else the planned ones;
+        ``numbers`` is the parallel tuple of session numbers used for bisection.
+        Kept until a session is created or its number, state or dates change.
+        """
+        self.env.cr.execute("""
+            SELECT session_number, id,
+                   COALESCE(actual_start_date, planned_start_date),
+                   COALESCE(actual_end_date, planned_end_date)
+              FROM stock_session
+             WHERE session_number IS NOT NULL
+          ORDER BY session_number, id
+        """)
+        entries = tuple(tuple(row) for row in self.env.cr.fetchall())
+        return (
+            tuple(entry[0] for entry in entries),
+            entries,
+            frozendict({entry[1]: entry[0] for entry in entries}),
+        )
+    
+    @api.model
+    def _calendar_session(self, session_number):
+        """Calendar entry of the session numbered ``session_number``, or None"""
+        numbers, entries, _by_id = self._get_session_calendar()
+        index = bisect_left(numbers, session_number)
+        if index < len(numbers) and numbers[index] == session_number:
+            return entries[index]
+        return None
+    
+    @api.model
+    def _calendar_nth_after(self, session_number, n=1):
+        """Calendar entry of the ``n``-th session after ``session_number`` (n=1: the next one), or None"""
+        numbers, entries, _by_id = self._get_session_calendar()
+        index = bisect_right(numbers, session_number) + n - 1
+        return entries[index] if 0 <= index < len(entries) else None
+    
+    @api.model
+    def _calendar_session_number(self, session_id):
+        """Session number of ``session_id`` from the calendar (0 when unknown)"""
+        return self._get_session_calendar()[2].get(session_id, 0)
     
     @api.model
     def _ensure_initial_session_exists(self):
@@ -300,6 +366,9 @@ class StockSession(models.Model):
             'actual_start_date': now,
         })
         
+        # Snapshot bond prices and yields once for the whole session
+        self.env['stock.bond.analytics']._build_for_session(self)
+        
         # Log the action using centralized method
         self.log_action("Session started", f"Started at {now.strftime('%Y-%m-%d %H:%M:%S')}")
         
@@ -333,6 +402,7 @@ class StockSession(models.Model):
     def _perform_session_close(self):
         """Perform the actual session close operations"""
         self.ensure_one()
+        self = self.with_engine_context()
         
         # Set actual end date to current time
         now = fields.Datetime.now()
@@ -341,12 +411,8 @@ class StockSession(models.Model):
         # This covers cases where securities were manually changed to trading status
         self._handle_orphaned_submitted_orders()
         
-        # Cancel all pending orders EXCEPT IPO orders (they carry over)
-        pending_orders = self.order_ids.filtered(
-            lambda o: o.status in ['draft', 'pending', 'partial'] and o.order_type != 'ipo'
-        )
-        for order in pending_orders:
-            order.action_cancel()
+        # Expire day orders and cancel the rest of the book in batches EXCEPT IPO orders (they carry over)
+        self.env['stock.order']._close_session_orders(self)
             
         # Log IPO orders that are carrying over
         ipo_orders = self.order_ids.filtered(
@@ -384,6 +450,9 @@ class StockSession(models.Model):
             })
             history_count += 1
         
+        # Final per-security statistics for the session report
+        self.env['stock.session.analytics']._refresh(self)
+        
         # Process interest calculations for deposits and loans
         self._process_session_interest()
         
@@ -418,54 +487,19 @@ class StockSession(models.Model):
         """Handle submitted orders for securities that are now in trading status"""
         self.ensure_one()
         
-        # Find submitted orders for securities that are now trading
-        submitted_orders = self.env['stock.order'].search([
-            ('status', '=', 'submitted'),
-            ('security_id.status', '=', 'trade')  # Security is now trading
-        ])
-        
-        if submitted_orders:
-            _logger.info(f"Found {len(submitted_orders)} submitted orders for trading securities - promoting to open")
-            
-            for order in submitted_orders:
-                if order.order_type == 'ipo':
-                    # IPO orders for trading securities should be cancelled/rejected
-                    order.write({
-                        'status': 'rejected',
-                        'rejection_reason': 'IPO order for security that is already trading'
-                    })
-                    order.log_action("Order rejected", "IPO order rejected - security already trading")
-                else:
-                    # Regular orders should be promoted to open
-                    order.write({'status': 'open'})
-                    order.log_action("Order promoted", "Promoted from Submitted to Open - security now trading")
+        # Regular orders are promoted to open, IPO orders for trading securities are rejected
+        promoted, rejected = self.env['stock.order']._promote_orphaned_orders()
+        if promoted or rejected:
+            _logger.info(f"Orphaned submitted orders: promoted {promoted} to open, rejected {rejected} IPO orders")
     
     @api.model 
     def cleanup_orphaned_orders(self):
         """Utility method to clean up orphaned submitted orders across all sessions"""
-        # Find submitted orders for securities that are now trading
-        submitted_orders = self.env['stock.order'].search([
-            ('status', '=', 'submitted'),
-            ('security_id.status', '=', 'trade')  # Security is now trading
-        ])
+        promoted, rejected = self.env['stock.order']._promote_orphaned_orders()
         
-        if submitted_orders:
-            _logger.info(f"Cleanup: Found {len(submitted_orders)} submitted orders for trading securities")
-            
-            for order in submitted_orders:
-                if order.order_type == 'ipo':
-                    # IPO orders for trading securities should be cancelled/rejected
-                    order.write({
-                        'status': 'rejected',
-                        'rejection_reason': 'IPO order for security that is already trading'
-                    })
-                    order.log_action("Order rejected", "IPO order rejected - security already trading (cleanup)")
-                else:
-                    # Regular orders should be promoted to open
-                    order.write({'status': 'open'})
-                    order.log_action("Order promoted", "Promoted from Submitted to Open - security now trading (cleanup)")
-            
-            return f"Cleaned up {len(submitted_orders)} orphaned orders"
+        if promoted or rejected:
+            _logger.info(f"Cleanup: promoted {promoted} and rejected {rejected} orphaned submitted orders")
+            return f"Cleaned up {promoted + rejected} orphaned orders"
         else:
             return "No orphaned orders found"
     
@@ -595,4 +629,15 @@ class StockSession(models.Model):
             'view_mode': 'list,form',
             'domain': [('session_id', '=', self.id)],
             'context': {'default_session_id': self.id}
+        }
+    
+    def action_view_analytics(self):
+        """View per-security statistics of this session"""
+        self.ensure_one()
+        return {
+            'name': f'Analytics - {self.name}',
+            'type': 'ir.actions.act_window',
+            'res_model': 'stock.session.analytics',
+            'view_mode': 'list',
+            'domain': [('session_id', '=', self.id)],
         } 
\ No newline at end of file
@@ -0,0 +1,280 @@
+# -*- coding: utf-8 -*-
+
+from odoo import models, fields, api
+import json
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class StockSessionAnalytics(models.Model):
+    """Per-security session statistics, maintained by order and trade deltas and rebuilt at session close"""
+    _name = 'stock.session.analytics'
+    _description = 'Session Analytics per Security'
+    _order = 'session_id desc, volume desc'
+    _rec_name = 'security_id'
+
+    _sql_constraints = [
+        ('session_security_unique', 'UNIQUE(session_id, security_id)',
+         'Only one analytics row per session and security is allowed.')
+    ]
+
+    session_id = fields.Many2one('stock.session', string='Session', required=True, ondelete='cascade', index=True)
+    security_id = fields.Many2one('stock.security', string='Security', required=True, ondelete='cascade')
+
+    # Price action (from the session OHLCV bar)
+    open = fields.Float(string='Open', digits=(16, 4), readonly=True)
+    high = fields.Float(string='High', digits=(16, 4), readonly=True)
+    low = fields.Float(string='Low', digits=(16, 4), readonly=True)
+    close = fields.Float(string='Close', digits=(16, 4), readonly=True)
+    volume = fields.Integer(string='Volume', readonly=True)
+    value = fields.Float(string='Value Traded', digits='Product Price', readonly=True)
+    trade_count = fields.Integer(string='Trades', readonly=True)
+    vwap = fields.Float(string='VWAP', compute='_compute_rates', digits=(16, 4))
+
+    # Order flow
+    order_count = fields.Integer(string='Orders', readonly=True)
+    submitted_count = fields.Integer(string='Submitted Orders', readonly=True)
+    filled_count = fields.Integer(string='Filled Orders', readonly=True)
+    cancelled_count = fields.Integer(string='Cancelled Orders', readonly=True)
+    order_type_stats = fields.Json(string='Orders by Type', readonly=True,
+                                   help='{order_type: {"count": n, "total_quantity": q}}')
+    fill_rate = fields.Float(string='Fill Rate (%)', compute='_compute_rates', digits=(5, 2))
+
+    @api.depends('value', 'volume', 'close', 'filled_count', 'submitted_count')
+    def _compute_rates(self):
+        for row in self:
+            row.vwap = row.value / row.volume if row.volume else row.close
+            row.fill_rate = (row.filled_count / row.submitted_count * 100) if row.submitted_count else 0.0
+
+    def init(self):
+        # Backfill sessions closed before the table was maintained, then rebase the
+        # open session so the incremental deltas apply on top of exact counts
+        self.env.cr.execute("""
+            SELECT s.id, s.state
+              FROM stock_session s
+             WHERE s.state = 'open'
+                OR (s.state IN ('closed', 'settled')
+                    AND NOT EXISTS (SELECT 1 FROM stock_session_analytics a WHERE a.session_id = s.id)
+                    AND (EXISTS (SELECT 1 FROM stock_trade t WHERE t.session_id = s.id)
+                         OR EXISTS (SELECT 1 FROM stock_order o WHERE o.session_id = s.id)))
+          ORDER BY s.id
+        """)
+        sessions = self.env.cr.fetchall()
+        missing = [session_id for session_id, state in sessions if state != 'open']
+        if missing:
+            self.env.cr.execute("""
+                SELECT 1 FROM stock_trade t
+                 WHERE t.session_id IN %s
+                   AND NOT EXISTS (SELECT 1 FROM stock_price_bar b
+                                    WHERE b.session_id = t.session_id AND b.timeframe = 'session')
+                 LIMIT 1
+            """, [tuple(missing)])
+            if self.env.cr.fetchone():
+                self.env['stock.price.bar'].rebuild_from_trades()
+        for session in self.env['stock.session'].browse([session_id for session_id, _state in sessions]):
+            self._refresh(session)
+        if sessions:
+            _logger.info(f"[ANALYTICS] Backfilled session analytics for {len(sessions)} sessions")
+
+    # Order columns an order's contribution to the statistics depends on
+    ORDER_FIELDS = ('session_id', 'security_id', 'order_type', 'status', 'quantity')
+
+    @api.model
+    def _order_contributions(self, orders):
+        """(session_id, security_id, order_type, status, quantity) of each order, as counted by _refresh"""
+        return [
+            (order.session_id.id, order.security_id.id, order.order_type, order.status, order.quantity)
+            for order in orders
+        ]
+
+    @api.model
+    def _apply_order_deltas(self, removed=(), added=()):
+        """
+        Fold order contributions into the session rows with one additive upsert.
+
+        ``removed`` and ``added`` are _order_contributions lists taken before and
+        after a change (create: only added, unlink: only removed, transition: both).
+        Increments are applied in SQL, so concurrent writers never lose updates.
+        """
+        deltas = {}
+        for sign, contributions in ((-1, removed), (1, added)):
+            for session_id, security_id, order_type, status, quantity in contributions:
+                if not session_id or not security_id:
+                    continue
+                row = deltas.setdefault((session_id, security_id), {
+                    'order_count': 0, 'submitted_count': 0, 'filled_count': 0, 'cancelled_count': 0, 'types': {},
+                })
+                row['order_count'] += sign
+                row['submitted_count'] += sign * (status != 'draft')
+                row['filled_count'] += sign * (status == 'filled')
+                row['cancelled_count'] += sign * (status == 'cancelled')
+                type_stats = row['types'].setdefault(order_type or 'unknown', {'count': 0, 'total_quantity': 0})
+                type_stats['count'] += sign
+                type_stats['total_quantity'] += sign * (quantity or 0)
+        params = []
+        for (session_id, security_id), row in deltas.items():
+            types = {key: value for key, value in row['types'].items() if value['count'] or value['total_quantity']}
+            if not (types or row['submitted_count'] or row['filled_count'] or row['cancelled_count']):
+                continue
+            params += [session_id, security_id, row['order_count'], row['submitted_count'], row['filled_count'],
+                       row['cancelled_count'], json.dumps(types), self.env.uid, self.env.uid]
+        if not params:
+            return
+        self.env.cr.execute("""
+            INSERT INTO stock_session_analytics AS a
+                (session_id, security_id, open, high, low, close, volume, value, trade_count,
+                 order_count, submitted_count, filled_count, cancelled_count, order_type_stats,
+                 create_uid, create_date, write_uid, write_date)
+            SELECT v.session_id, v.security_id, 0, 0, 0, 0, 0, 0, 0,
+                   v.order_count, v.submitted_count, v.filled_count, v.cancelled_count, v.order_type_stats::jsonb,
+                   v.uid, now() at time zone 'UTC', v.wuid, now() at time zone 'UTC'
+              FROM (VALUES """ + ", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s, %s)"] * (len(params) // 9)) + """)
+                   AS v(session_id, security_id, order_count, submitted_count, filled_count, cancelled_count,
+                        order_type_stats, uid, wuid)
+            ON CONFLICT (session_id, security_id) DO UPDATE
+               SET order_count = COALESCE(a.order_count, 0) + EXCLUDED.order_count,
+                   submitted_count = COALESCE(a.submitted_count, 0) + EXCLUDED.submitted_count,
+                   filled_count = COALESCE(a.filled_count, 0) + EXCLUDED.filled_count,
+                   cancelled_count = COALESCE(a.cancelled_count, 0) + EXCLUDED.cancelled_count,
+                   order_type_stats = (
+                       SELECT COALESCE(jsonb_object_agg(t.key, jsonb_build_object(
+                                  'count', t.count, 'total_quantity', t.total_quantity)), '{}'::jsonb)
+                         FROM (SELECT e.key,
+                                      SUM((e.value->>'count')::int) AS count,
+                                      SUM((e.value->>'total_quantity')::int) AS total_quantity
+                                 FROM (SELECT * FROM jsonb_each(COALESCE(a.order_type_stats, '{}'::jsonb))
+                                       UNION ALL
+                                       SELECT * FROM jsonb_each(EXCLUDED.order_type_stats)) e
+                             GROUP BY e.key) t
+                        WHERE t.count != 0 OR t.total_quantity != 0
+                   ),
+                   write_date = EXCLUDED.write_date
+        """, params)
+        self.invalidate_model()
+
+    @api.model
+    def _record_trade(self, security_id, session, price, quantity):
+        """Fold one trade into the session row's price statistics (same rules as the session bar)"""
+        if not session:
+            return
+        self.env.cr.execute("""
+            INSERT INTO stock_session_analytics AS a
+                (session_id, security_id, open, high, low, close, volume, value, trade_count,
+                 order_count, submitted_count, filled_count, cancelled_count, order_type_stats,
+                 create_uid, create_date, write_uid, write_date)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 1, 0, 0, 0, 0, '{}'::jsonb,
+                    %s, now() at time zone 'UTC', %s, now() at time zone 'UTC')
+            ON CONFLICT (session_id, security_id) DO UPDATE
+               SET open = CASE WHEN COALESCE(a.trade_count, 0) = 0 THEN EXCLUDED.open ELSE a.open END,
+                   high = CASE WHEN COALESCE(a.trade_count, 0) = 0 THEN EXCLUDED.high
+                               ELSE GREATEST(a.high, EXCLUDED.high) END,
+                   low = CASE WHEN COALESCE(a.trade_count, 0) = 0 THEN EXCLUDED.low
+                              ELSE LEAST(a.low, EXCLUDED.low) END,
+                   close = EXCLUDED.close,
+                   volume = COALESCE(a.volume, 0) + EXCLUDED.volume,
+                   value = COALESCE(a.value, 0) + EXCLUDED.value,
+                   trade_count = COALESCE(a.trade_count, 0) + 1,
+                   write_date = EXCLUDED.write_date
+        """, [session.id, security_id, price, price, price, price, quantity, price * quantity,
+              self.env.uid, self.env.uid])
+        self.invalidate_model()
+
+    @api.model
+    def _refresh(self, session):
+        """
+        Rebuild the rows of ``session`` with two grouped reads and one upsert.
+
+        Reconciles the incrementally maintained rows at session close and
+        backfills sessions that predate them: price statistics come from the
+        session bars (stock.price.bar), order statistics from one GROUP BY on
+        the session's orders.
+        """
+        self.env['stock.order'].flush_model(['session_id', 'security_id', 'order_type', 'status', 'quantity'])
+        self.env.cr.execute("""
+            SELECT security_id, order_type, status, COUNT(*), COALESCE(SUM(quantity), 0)
+              FROM stock_order
+             WHERE session_id = %s AND security_id IS NOT NULL
+          GROUP BY security_id, order_type, status
+        """, [session.id])
+        stats = {}
+        for security_id, order_type, status, count, quantity in self.env.cr.fetchall():
+            row = stats.setdefault(security_id, {
+                'order_count': 0, 'submitted_count': 0, 'filled_count': 0, 'cancelled_count': 0, 'types': {},
+            })
+            row['order_count'] += count
+            if status != 'draft':
+                row['submitted_count'] += count
+            if status == 'filled':
+                row['filled_count'] += count
+            elif status == 'cancelled':
+                row['cancelled_count'] += count
+            type_stats = row['types'].setdefault(order_type or 'unknown', {'count': 0, 'total_quantity': 0})
+            type_stats['count'] += count
+            type_stats['total_quantity'] += quantity
+
+        self.env.cr.execute("""
+            SELECT security_id, open, high, low, close, volume, value, trade_count
+              FROM stock_price_bar
+             WHERE session_id = %s AND timeframe = 'session'
+        """, [session.id])
+        bars = {row[0]: row[1:] for row in self.env.cr.fetchall()}
+
+        security_ids = set(stats) | set(bars)
+        if not security_ids:
+            return 0
+        empty_orders = {'order_count': 0, 'submitted_count': 0, 'filled_count': 0, 'cancelled_count': 0, 'types': {}}
+        params = []
+        for security_id in security_ids:
+            open_, high, low, close, volume, value, trade_count = bars.get(security_id, (0, 0, 0, 0, 0, 0, 0))
+            orders = stats.get(security_id, empty_orders)
+            params += [session.id, security_id, open_, high, low, close, volume, value, trade_count,
+                       orders['order_count'], orders['submitted_count'], orders['filled_count'],
+                       orders['cancelled_count'], json.dumps(orders['types']), self.env.uid, self.env.uid]
+        self.env.cr.execute("""
+            INSERT INTO stock_session_analytics
+                (session_id, security_id, open, high, low, close, volume, value, trade_count,
+                 order_count, submitted_count, filled_count, cancelled_count, order_type_stats,
+                 create_uid, create_date, write_uid, write_date)
+            SELECT v.session_id, v.security_id, v.open, v.high, v.low, v.close, v.volume, v.value, v.trade_count,
+                   v.order_count, v.submitted_count, v.filled_count, v.cancelled_count, v.order_type_stats::jsonb,
+                   v.uid, now() at time zone 'UTC', v.wuid, now() at time zone 'UTC'
+              FROM (VALUES """ + ", ".join(
+                  ["(%s, %s, %s::numeric, %s::numeric, %s::numeric, %s::numeric, %s, %s::numeric, %s, "
+                   "%s, %s, %s, %s, %s, %s, %s)"] * len(security_ids)
+              ) + """) AS v(session_id, security_id, open, high, low, close, volume, value, trade_count,
+                           order_count, submitted_count, filled_count, cancelled_count, order_type_stats, uid, wuid)
+            ON CONFLICT (session_id, security_id) DO UPDATE
+               SET open = EXCLUDED.open, high = EXCLUDED.high, low = EXCLUDED.low, close = EXCLUDED.close,
+                   volume = EXCLUDED.volume, value = EXCLUDED.value, trade_count = EXCLUDED.trade_count,
+                   order_count = EXCLUDED.order_count, submitted_count = EXCLUDED.submitted_count,
+                   filled_count = EXCLUDED.filled_count, cancelled_count = EXCLUDED.cancelled_count,
+                   order_type_stats = EXCLUDED.order_type_stats, write_date = EXCLUDED.write_date
+        """, params)
+        self.invalidate_model()
+        return len(security_ids)
+
+    @api.model
+    def get_session_summary(self, session):
+        """Session totals and per-security rows, read from the materialized table"""
+        rows = self.search([('session_id', '=', session.id)])
+        order_stats = {}
+        for row in rows:
+            for order_type, type_stats in (row.order_type_stats or {}).items():
+                total = order_stats.setdefault(order_type, {'count': 0, 'total_quantity': 0})
+                total['count'] += type_stats.get('count', 0)
+                total['total_quantity'] += type_stats.get('total_quantity', 0)
+        submitted = sum(rows.mapped('submitted_count'))
+        filled = sum(rows.mapped('filled_count'))
+        return {
+            'rows': rows,
+            'total_orders': sum(rows.mapped('order_count')),
+            'total_trades': sum(rows.mapped('trade_count')),
+            'total_volume': sum(rows.mapped('volume')),
+            'total_value': sum(rows.mapped('value')),
+            'submitted_orders': submitted,
+            'filled_orders': filled,
+            'cancelled_orders': sum(rows.mapped('cancelled_count')),
+            'fill_rate': (filled / submitted * 100) if submitted else 0,
+            'order_stats': order_stats,
+        }
@@ -26,7 +26,8 @@ class StockTrade(models.Model):
         string='Buy Order',
         required=True,
         readonly=True,
-        ondelete='restrict'
+        ondelete='restrict',
+        index=True
     )
     
     sell_order_id = fields.Many2one(
@@ -34,6 +35,7 @@ class StockTrade(models.Model):
         string='Sell Order',
         readonly=True,
         ondelete='restrict',
+        index=True,
         help='Empty for IPO trades'
     )
     
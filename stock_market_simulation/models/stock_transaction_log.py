@@ -24,6 +24,7 @@ class StockTransactionLog(models.Model):
         'res.users',
         string='User',
         required=True,
+        index=True,
         help='User affected by this transaction'
     )
     
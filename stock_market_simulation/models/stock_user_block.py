@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
+from odoo.tools import frozendict
 from odoo.exceptions import ValidationError, UserError
 from datetime import datetime, timedelta
 import logging
@@ -28,6 +29,7 @@ class StockUserBlock(models.Model):
         string='Blocked User',
         required=True,
         ondelete='cascade',
+        index=True,
         tracking=True
     )
     
@@ -73,6 +75,7 @@ class StockUserBlock(models.Model):
     # Session-based blocking
     blocked_until_session = fields.Integer(
         string='Blocked Until Session',
+        index=True,
         help='For session-based blocks: session number when block expires'
     )
     
@@ -118,13 +121,8 @@ class StockUserBlock(models.Model):
                     block.is_expired = False
             elif block.block_type == 'session':
                 if block.blocked_until_session:
-                    # Get current session number
-                    current_session = self.env['stock.session'].search([('state', '=', 'open')], limit=1)
-                    if current_session:
-                        session_num = int(current_session.name.split(' ')[-1]) if current_session.name.startswith('Session ') else 0
-                        block.is_expired = session_num >= block.blocked_until_session
-                    else:
-                        block.is_expired = False
+                    session_num = self.env['stock.session']._get_current_session_number()
+                    block.is_expired = bool(session_num) and session_num >= block.blocked_until_session
                 else:
                     block.is_expired = False
             else:
@@ -153,9 +151,8 @@ class StockUserBlock(models.Model):
                 else:
                     block.remaining_time = 'Expired'
             elif block.block_type == 'session' and block.blocked_until_session:
-                current_session = self.env['stock.session'].search([('state', '=', 'open')], limit=1)
-                if current_session:
-                    session_num = int(current_session.name.split(' ')[-1]) if current_session.name.startswith('Session ') else 0
+                session_num = self.env['stock.session']._get_current_session_number()
+                if session_num:
                     remaining_sessions = block.blocked_until_session - session_num
                     if remaining_sessions > 0:
                         block.remaining_time = f"{remaining_sessions} session(s)"
@@ -183,6 +180,54 @@ class StockUserBlock(models.Model):
             if block.user_id.user_type == 'superadmin' and block.blocked_by_id.user_type != 'superadmin':
                 raise ValidationError("SuperAdmin users can only be blocked by other SuperAdmin users.")
     
+    @api.model
+    @tools.ormcache()
+    def _get_active_block_index(self):
+        """
+        Active blocks keyed by user id: {user_id: ((block_id, blocked_to_date, blocked_until_session), ...)}
+        
+        Loaded once from the status index and kept until a block changes, so
+        block checks are dictionary lookups. Expiry stays with cron_expire_blocks;
+        the stored bounds let lookups ignore blocks that are past due but not swept yet.
+        """
+        self.env.cr.execute("""
+            SELECT user_id, id, block_type, blocked_to_date, blocked_until_session
+              FROM stock_user_block
+             WHERE status = 'active'
+          ORDER BY create_date DESC, id DESC
+        """)
+        index = {}
+        for user_id, block_id, block_type, blocked_to_date, blocked_until_session in self.env.cr.fetchall():
+            bounds = (
+                block_id,
+                blocked_to_date if block_type == 'time' else None,
+                blocked_until_session if block_type == 'session' else None,
+            )
+            index.setdefault(user_id, []).append(bounds)
+        return frozendict({user_id: tuple(blocks) for user_id, blocks in index.items()})
+    
+    @api.model
+    def _get_blocking_block_ids(self, user_ids):
+        """Most recent effective block id per blocked user among ``user_ids``"""
+        index = self._get_active_block_index()
+        if not index:
+            return {}
+        now = fields.Datetime.now()
+        session_num = None
+        result = {}
+        for user_id in user_ids:
+            for block_id, blocked_to_date, blocked_until_session in index.get(user_id, ()):
+                if blocked_to_date and blocked_to_date <= now:
+                    continue
+                if blocked_until_session:
+                    if session_num is None:
+                        session_num = self.env['stock.session']._get_current_session_number()
+                    if session_num and session_num >= blocked_until_session:
+                        continue
+                result[user_id] = block_id
+                break
+        return result
+    
     @api.model
     def create(self, vals):
         # Set blocked_to_date based on duration_minutes if provided
@@ -192,6 +237,7 @@ class StockUserBlock(models.Model):
             vals['blocked_to_date'] = fields.Datetime.to_string(from_date + duration)
         
         block = super(StockUserBlock, self).create(vals)
+        self.env.registry.clear_cache()
         
         # Log the blocking action
         block.message_post(
@@ -203,6 +249,17 @@ class StockUserBlock(models.Model):
         
         return block
     
+    def write(self, vals):
+        res = super().write(vals)
+        if {'status', 'user_id', 'block_type', 'blocked_to_date', 'blocked_until_session'} & set(vals):
+            self.env.registry.clear_cache()
+        return res
+    
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+    
     def action_cancel_block(self):
         """Cancel the block manually"""
         self.ensure_one()
@@ -237,9 +294,9 @@ class StockUserBlock(models.Model):
             block.action_expire_block()
         
         # Find expired session-based blocks
-        current_session = self.env['stock.session'].search([('state', '=', 'open')], limit=1)
-        if current_session:
-            session_num = int(current_session.name.split(' ')[-1]) if current_session.name.startswith('Session ') else 0
+        session_num = self.env['stock.session']._get_current_session_number()
+        session_blocks = self.browse()
+        if session_num:
             session_blocks = self.search([
                 ('status', '=', 'active'),
                 ('block_type', '=', 'session'),
@@ -249,22 +306,14 @@ class StockUserBlock(models.Model):
             for block in session_blocks:
                 block.action_expire_block()
         
-        _logger.info(f"Expired {len(time_blocks)} time-based blocks and {len(session_blocks) if current_session else 0} session-based blocks")
+        _logger.info(f"Expired {len(time_blocks)} time-based blocks and {len(session_blocks)} session-based blocks")
     
     @api.model
     def check_user_blocked(self, user_id):
-        """Check if a user is currently blocked"""
-        # Run expiry check first
-        self.cron_expire_blocks()
-        
-        # Check for active blocks
-        active_blocks = self.search([
-            ('user_id', '=', user_id),
-            ('status', '=', 'active')
-        ])
-        
-        if active_blocks:
-            block = active_blocks[0]  # Get the most recent active block
+        """Check if a user is currently blocked (cached lookup, no expiry sweep)"""
+        block_id = self._get_blocking_block_ids([user_id]).get(user_id)
+        if block_id:
+            block = self.browse(block_id)
             return {
                 'is_blocked': True,
                 'block_id': block.id,
@@ -274,4 +323,4 @@ class StockUserBlock(models.Model):
                 'remaining_time': block.remaining_time
             }
         
-        return {'is_blocked': False}
\ No newline at end of file
+        return {'is_blocked': False}
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-from odoo import api, models, fields
+from odoo import api, models
 from datetime import datetime
 
 
@@ -12,41 +12,26 @@ class BankerPortfolioReport(models.AbstractModel):
     def _get_report_values(self, docids, data=None):
         banker = self.env['res.users'].browse(docids[0])
         
-        # Get all deposits managed by banker
+        # Deposits and loans managed by banker (listed in the report)
         deposits = self.env['stock.deposit'].search([
             ('banker_id', '=', banker.id),
-            ('status', 'in', ['active', 'pending'])
+            ('status', '=', 'active')
         ])
-        
-        # Get all loans managed by banker
         loans = self.env['stock.loan'].search([
             ('banker_id', '=', banker.id),
-            ('status', 'in', ['active', 'pending'])
+            ('status', 'in', ['active', 'defaulted'])
         ])
         
-        # Calculate totals
-        total_deposits = sum(deposits.mapped('current_value'))
-        total_loans = sum(loans.mapped('principal_outstanding'))
-        total_interest_earned = sum(deposits.mapped('interest_earned'))
-        total_interest_to_pay = sum(loans.mapped('total_interest'))
-        
-        # Group deposits by type
-        deposit_summary = {
-            'savings': deposits.filtered(lambda d: d.deposit_type == 'savings'),
-            'fixed': deposits.filtered(lambda d: d.deposit_type == 'fixed'),
-            'recurring': deposits.filtered(lambda d: d.deposit_type == 'recurring'),
-        }
+        # Totals, per-type summaries and risk buckets come from grouped SQL
+        exposure = self.env['stock.banker.exposure'].get_exposure(banker.id)
         
-        # Group loans by type
-        loan_summary = {
-            'personal': loans.filtered(lambda l: l.loan_type == 'personal'),
-            'secured': loans.filtered(lambda l: l.loan_type == 'secured'),
-            'margin': loans.filtered(lambda l: l.loan_type == 'margin'),
-        }
+        # Interest still due on the loan book, from the amortization schedules
+        active_loans = loans.filtered(lambda l: l.status == 'active')
+        book = self.env['stock.loan.amortization'].project_book(active_loans)
         
         # Calculate risk metrics
-        overdue_loans = loans.filtered(lambda l: l.next_payment_date and l.next_payment_date < fields.Date.today())
-        defaulted_loans = loans.filtered(lambda l: l.status == 'defaulted')
+        overdue_loans = active_loans._filter_overdue()
+        defaulted_loans = loans - active_loans
         
         return {
             'doc_ids': docids,
@@ -55,14 +40,17 @@ class BankerPortfolioReport(models.AbstractModel):
             'data': data,
             'deposits': deposits,
             'loans': loans,
-            'total_deposits': total_deposits,
-            'total_loans': total_loans,
-            'total_interest_earned': total_interest_earned,
-            'total_interest_to_pay': total_interest_to_pay,
-            'net_interest_margin': total_interest_to_pay - total_interest_earned,
-            'deposit_summary': deposit_summary,
-            'loan_summary': loan_summary,
+            'total_deposits': exposure['total_deposits'],
+            'total_loans': exposure['total_loans'],
+            'total_interest_earned': exposure['deposit_interest'],
+            'total_interest_to_pay': book['total_interest'],
+            'net_interest_margin': exposure['net_interest_margin'],
+            'deposit_summary': exposure['deposits_by_type'],
+            'loan_summary': exposure['loans_by_type'],
+            'overdue_buckets': exposure['overdue_buckets'],
+            'ltv_buckets': exposure['ltv_buckets'],
             'overdue_loans': overdue_loans,
             'defaulted_loans': defaulted_loans,
+            'book_projection': book,
             'report_date': datetime.now(),
         } 
\ No newline at end of file
@@ -16,37 +16,40 @@ class BrokerCommissionReport(models.AbstractModel):
         date_from = data.get('date_from') if data else (datetime.now() - timedelta(days=30)).date()
         date_to = data.get('date_to') if data else datetime.now().date()
         
-        # Get all trades for broker's clients
-        trades = self.env['stock.trade'].search([
-            ('buy_order_id.broker_id', '=', broker.id),
-            ('trade_date', '>=', date_from),
-            ('trade_date', '<=', date_to)
-        ])
+        # Per-client totals of the legs this broker entered, aggregated in SQL
+        self.env['stock.trade'].flush_model()
+        self.env['stock.order'].flush_model(['entered_by_id', 'user_id'])
+        self.env.cr.execute("""
+            SELECT client_id, SUM(volume), SUM(commission), ARRAY_AGG(DISTINCT trade_id)
+              FROM (
+                    SELECT o.user_id AS client_id, t.id AS trade_id, t.value AS volume, t.buy_commission AS commission
+                      FROM stock_trade t
+                      JOIN stock_order o ON o.id = t.buy_order_id
+                     WHERE o.entered_by_id = %(broker)s
+                       AND t.trade_date::date BETWEEN %(date_from)s AND %(date_to)s
+                    UNION ALL
+                    SELECT o.user_id, t.id, t.value, t.sell_commission
+                      FROM stock_trade t
+                      JOIN stock_order o ON o.id = t.sell_order_id
+                     WHERE o.entered_by_id = %(broker)s
+                       AND t.trade_date::date BETWEEN %(date_from)s AND %(date_to)s
+                   ) legs
+          GROUP BY client_id
+        """, {'broker': broker.id, 'date_from': date_from, 'date_to': date_to})
         
-        # Calculate commissions by client
-        client_commissions = {}
+        client_commissions = []
         total_commission = 0.0
         total_volume = 0.0
         
-        for trade in trades:
-            client = trade.buyer_id
-            if client.id not in client_commissions:
-                client_commissions[client.id] = {
-                    'client': client,
-                    'trades': [],
-                    'total_volume': 0.0,
-                    'total_commission': 0.0
-                }
-            
-            trade_value = trade.quantity * trade.price
-            commission = trade_value * (trade.commission_rate / 100)
-            
-            client_commissions[client.id]['trades'].append(trade)
-            client_commissions[client.id]['total_volume'] += trade_value
-            client_commissions[client.id]['total_commission'] += commission
-            
-            total_volume += trade_value
-            total_commission += commission
+        for client_id, volume, commission, trade_ids in self.env.cr.fetchall():
+            client_commissions.append({
+                'client': self.env['res.users'].browse(client_id),
+                'trades': self.env['stock.trade'].browse(trade_ids).sorted('trade_date'),
+                'total_volume': volume or 0.0,
+                'total_commission': commission or 0.0,
+            })
+            total_volume += volume or 0.0
+            total_commission += commission or 0.0
         
         return {
             'doc_ids': docids,
@@ -55,8 +58,8 @@ class BrokerCommissionReport(models.AbstractModel):
             'data': data,
             'date_from': date_from,
             'date_to': date_to,
-            'client_commissions': list(client_commissions.values()),
+            'client_commissions': client_commissions,
             'total_commission': total_commission,
             'total_volume': total_volume,
-            'commission_rate': broker.broker_commission_rate,
+            'commission_rate': self.env['stock.session'].search([], limit=1).broker_commission_rate,
         } 
\ No newline at end of file
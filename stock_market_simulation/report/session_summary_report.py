@@ -11,77 +11,53 @@ class SessionSummaryReport(models.AbstractModel):
     @api.model
     def _get_report_values(self, docids, data=None):
         session = self.env['stock.session'].browse(docids[0])
-        
-        # Get all trades in session
-        trades = session.trade_ids
-        
-        # Get all orders in session
-        orders = session.order_ids
-        
-        # Calculate session metrics
-        total_trades = len(trades)
-        total_volume = sum(trades.mapped('quantity'))
-        total_value = sum(t.quantity * t.price for t in trades)
-        
-        # Calculate order statistics
-        submitted_orders = orders.filtered(lambda o: o.status != 'draft')
-        filled_orders = orders.filtered(lambda o: o.status == 'filled')
-        cancelled_orders = orders.filtered(lambda o: o.status == 'cancelled')
-        
-        fill_rate = (len(filled_orders) / len(submitted_orders) * 100) if submitted_orders else 0
-        
-        # Group trades by security
-        security_summary = defaultdict(lambda: {
-            'trades': 0,
-            'volume': 0,
-            'value': 0,
-            'high': 0,
-            'low': float('inf'),
-            'open': 0,
-            'close': 0
-        })
-        
-        for trade in trades.sorted('trade_date'):
-            security = trade.security_id
-            summary = security_summary[security]
-            
-            summary['trades'] += 1
-            summary['volume'] += trade.quantity
-            summary['value'] += trade.quantity * trade.price
-            
-            if trade.price > summary['high']:
-                summary['high'] = trade.price
-            if trade.price < summary['low']:
-                summary['low'] = trade.price
-            
-            if summary['open'] == 0:
-                summary['open'] = trade.price
-            summary['close'] = trade.price
-        
-        # Calculate top traders by volume
-        trader_volumes = defaultdict(float)
-        for trade in trades:
-            trader_volumes[trade.buyer_id] += trade.quantity * trade.price
-            trader_volumes[trade.seller_id] += trade.quantity * trade.price
-        
-        top_traders = sorted(
-            trader_volumes.items(), 
-            key=lambda x: x[1], 
-            reverse=True
-        )[:10]
+        # Rows are kept current by order and trade deltas, and reconciled at close
+        summary = self.env['stock.session.analytics'].get_session_summary(session)
+        
+        # Per-security OHLC, keyed by security as before
+        security_summary = defaultdict(dict)
+        for row in summary['rows']:
+            security_summary[row.security_id] = {
+                'trades': row.trade_count,
+                'volume': row.volume,
+                'value': row.value,
+                'high': row.high,
+                'low': row.low,
+                'open': row.open,
+                'close': row.close,
+                'vwap': row.vwap,
+            }
+        
+        # Calculate top traders by volume (grouped in SQL over the session's trades)
+        self.env['stock.trade'].flush_model(['session_id', 'buyer_id', 'seller_id', 'quantity', 'price'])
+        self.env.cr.execute("""
+            SELECT trader_id, SUM(traded) FROM (
+                SELECT buyer_id AS trader_id, quantity * price AS traded FROM stock_trade WHERE session_id = %(session)s
+                UNION ALL
+                SELECT seller_id, quantity * price FROM stock_trade WHERE session_id = %(session)s
+            ) legs
+            WHERE trader_id IS NOT NULL
+            GROUP BY trader_id
+            ORDER BY SUM(traded) DESC
+            LIMIT 10
+        """, {'session': session.id})
+        top_traders = [
+            (self.env['res.users'].browse(trader_id), traded)
+            for trader_id, traded in self.env.cr.fetchall()
+        ]
         
         return {
             'doc_ids': docids,
             'doc_model': 'stock.session',
             'docs': session,
             'data': data,
-            'total_trades': total_trades,
-            'total_volume': total_volume,
-            'total_value': total_value,
-            'submitted_orders': len(submitted_orders),
-            'filled_orders': len(filled_orders),
-            'cancelled_orders': len(cancelled_orders),
-            'fill_rate': fill_rate,
+            'total_trades': summary['total_trades'],
+            'total_volume': summary['total_volume'],
+            'total_value': summary['total_value'],
+            'submitted_orders': summary['submitted_orders'],
+            'filled_orders': summary['filled_orders'],
+            'cancelled_orders': summary['cancelled_orders'],
+            'fill_rate': summary['fill_rate'],
             'security_summary': dict(security_summary),
             'top_traders': top_traders,
-        } 
\ No newline at end of file
+        }
@@ -2,59 +2,163 @@
 
 from odoo import api, models
 from datetime import datetime
+import csv
+import io
+import json
 
 
 class TradeBlotterReport(models.AbstractModel):
     _name = 'report.stock.trade_blotter_report'
     _description = 'Trade Blotter Report'
-    
+
+    # Trades fetched per round trip when exporting
+    _EXPORT_CHUNK_SIZE = 2000
+
+    # Exported columns, in output order
+    _EXPORT_COLUMNS = (
+        'trade', 'trade_date', 'session', 'symbol', 'trade_type', 'quantity', 'price',
+        'value', 'buy_commission', 'sell_commission', 'buyer', 'seller',
+    )
+
+    @api.model
+    def _get_blotter_filter(self, user, date_from=False, date_to=False):
+        """SQL condition and params restricting stock_trade ``t`` to what ``user`` may see"""
+        conditions = []
+        params = []
+        is_admin = user.user_type in ('admin', 'superadmin') or user.has_group('base.group_system')
+        if not is_admin:
+            if user.user_type == 'broker':
+                # Broker sees trades on either side of orders they entered
+                conditions.append("""(
+                    EXISTS (SELECT 1 FROM stock_order o WHERE o.id = t.buy_order_id AND o.entered_by_id = %s)
+                    OR EXISTS (SELECT 1 FROM stock_order o WHERE o.id = t.sell_order_id AND o.entered_by_id = %s)
+                )""")
+                params += [user.id, user.id]
+            else:
+                # Investors (and everyone else) see their own trades
+                conditions.append("(t.buyer_id = %s OR t.seller_id = %s)")
+                params += [user.id, user.id]
+        if date_from:
+            conditions.append("t.trade_date >= %s")
+            params.append(date_from)
+        if date_to:
+            conditions.append("t.trade_date <= %s")
+            params.append(date_to)
+        return " AND ".join(conditions) or "TRUE", params
+
+    @api.model
+    def _get_daily_summary(self, user, date_from=False, date_to=False):
+        """{date: {'trades', 'volume', 'value'}} rolled up in SQL, most recent day first"""
+        self.env['stock.trade'].flush_model()
+        where, params = self._get_blotter_filter(user, date_from, date_to)
+        self.env.cr.execute(f"""
+            SELECT t.trade_date::date, COUNT(*), COALESCE(SUM(t.quantity), 0), COALESCE(SUM(t.quantity * t.price), 0)
+              FROM stock_trade t
+             WHERE {where}
+          GROUP BY t.trade_date::date
+          ORDER BY t.trade_date::date DESC
+        """, params)
+        return {
+            day: {'trades': count, 'volume': volume, 'value': value}
+            for day, count, volume, value in self.env.cr.fetchall()
+        }
+
+    @api.model
+    def _iter_blotter_chunks(self, user, date_from=False, date_to=False, chunk_size=None):
+        """
+        Yield blotter rows in fixed-size chunks, newest trade first.
+
+        Each chunk is one keyset query on the primary key (``t.id < last id``),
+        so memory stays flat and late chunks cost the same as the first.
+        """
+        chunk_size = chunk_size or self._EXPORT_CHUNK_SIZE
+        self.env['stock.trade'].flush_model()
+        where, params = self._get_blotter_filter(user, date_from, date_to)
+        last_id = None
+        while True:
+            keyset = "AND t.id < %s" if last_id else ""
+            self.env.cr.execute(f"""
+                SELECT t.id, t.name, t.trade_date, s.name, sec.symbol, t.trade_type, t.quantity, t.price,
+                       t.value, t.buy_commission, t.sell_commission, bu.login, su.login
+                  FROM stock_trade t
+             LEFT JOIN stock_session s ON s.id = t.session_id
+             LEFT JOIN stock_security sec ON sec.id = t.security_id
+             LEFT JOIN res_users bu ON bu.id = t.buyer_id
+             LEFT JOIN res_users su ON su.id = t.seller_id
+                 WHERE {where} {keyset}
+              ORDER BY t.id DESC
+                 LIMIT %s
+            """, params + ([last_id] if last_id else []) + [chunk_size])
+            rows = self.env.cr.fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [row[1:] for row in rows]
+            if len(rows) < chunk_size:
+                return
+
+    @api.model
+    def export_blotter_csv(self, user, date_from=False, date_to=False):
+        """Generator of CSV text blocks, one per chunk (header first)"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(self._EXPORT_COLUMNS)
+        for chunk in self._iter_blotter_chunks(user, date_from, date_to):
+            writer.writerows(
+                (name, trade_date and trade_date.isoformat(sep=' '), *rest)
+                for name, trade_date, *rest in chunk
+            )
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    @api.model
+    def export_blotter_columnar(self, user, date_from=False, date_to=False):
+        """
+        Generator of newline-delimited JSON record batches.
+
+        The first line holds the schema; every following line is one chunk laid
+        out column-wise ({"num_rows": n, "columns": {"price": [...], ...}}).
+        """
+        yield json.dumps({'schema': list(self._EXPORT_COLUMNS)}) + "\n"
+        for chunk in self._iter_blotter_chunks(user, date_from, date_to):
+            columns = list(zip(*chunk))
+            columns[1] = [value and value.isoformat(sep=' ') for value in columns[1]]
+            yield json.dumps({
+                'num_rows': len(chunk),
+                'columns': {name: list(values) for name, values in zip(self._EXPORT_COLUMNS, columns)},
+            }) + "\n"
+
+    @api.model
+    def export_daily_summary_csv(self, user, date_from=False, date_to=False):
+        """Daily roll-up as a single CSV text block"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(('date', 'trades', 'volume', 'value'))
+        for day, summary in self._get_daily_summary(user, date_from, date_to).items():
+            writer.writerow((day.isoformat(), summary['trades'], summary['volume'], summary['value']))
+        yield buffer.getvalue()
+
     @api.model
     def _get_report_values(self, docids, data=None):
         # Get user and date range
         user = self.env['res.users'].browse(docids[0])
         date_from = data.get('date_from') if data else False
         date_to = data.get('date_to') if data else False
-        
-        # Build domain based on user role
-        domain = []
-        if user.has_group('stock.group_stock_investor'):
-            # Investor sees their own trades
-            domain.extend(['|', ('buyer_id', '=', user.id), ('seller_id', '=', user.id)])
-        elif user.has_group('stock.group_stock_broker'):
-            # Broker sees trades of their clients
-            domain.extend(['|', 
-                ('buy_order_id.broker_id', '=', user.id),
-                ('sell_order_id.broker_id', '=', user.id)
-            ])
-        # Admin sees all trades (no additional domain)
-        
-        if date_from:
-            domain.append(('trade_date', '>=', date_from))
-        if date_to:
-            domain.append(('trade_date', '<=', date_to))
-        
-        # Get trades
-        trades = self.env['stock.trade'].search(domain, order='trade_date desc')
-        
+
+        # Daily roll-ups and totals come from SQL; only the listed trades are loaded
+        daily_summary = self._get_daily_summary(user, date_from, date_to)
+        where, params = self._get_blotter_filter(user, date_from, date_to)
+        self.env.cr.execute(f"SELECT t.id FROM stock_trade t WHERE {where} ORDER BY t.trade_date DESC, t.id DESC", params)
+        trades = self.env['stock.trade'].browse([row[0] for row in self.env.cr.fetchall()])
+
         # Calculate summary statistics
-        total_trades = len(trades)
-        total_volume = sum(trades.mapped('quantity'))
-        total_value = sum(t.quantity * t.price for t in trades)
-        
-        # Group trades by date for daily summary
-        daily_summary = {}
-        for trade in trades:
-            date = trade.trade_date.date()
-            if date not in daily_summary:
-                daily_summary[date] = {
-                    'trades': 0,
-                    'volume': 0,
-                    'value': 0
-                }
-            daily_summary[date]['trades'] += 1
-            daily_summary[date]['volume'] += trade.quantity
-            daily_summary[date]['value'] += trade.quantity * trade.price
-        
+        total_trades = sum(day['trades'] for day in daily_summary.values())
+        total_volume = sum(day['volume'] for day in daily_summary.values())
+        total_value = sum(day['value'] for day in daily_summary.values())
+
         return {
             'doc_ids': docids,
             'doc_model': 'res.users',
@@ -68,4 +172,4 @@ class TradeBlotterReport(models.AbstractModel):
             'date_from': date_from,
             'date_to': date_to,
             'report_date': datetime.now(),
-        } 
\ No newline at end of file
+        }
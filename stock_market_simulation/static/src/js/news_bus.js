@@ -0,0 +1,75 @@
+/** @odoo-module **/
+
+import { registry } from "@web/core/registry";
+import { rpc } from "@web/core/network/rpc";
+
+// Refetch the dashboard news panel whenever the news scheduler publishes or expires news
+export const stockNewsBusService = {
+    dependencies: ["bus_service"],
+
+    start(env, { bus_service }) {
+        let refreshing = false;
+        let pending = false;
+
+        function renderNews(panel, items) {
+            panel.replaceChildren();
+            if (!items.length) {
+                const empty = document.createElement("li");
+                empty.className = "list-group-item text-muted";
+                empty.textContent = "No market news";
+                panel.appendChild(empty);
+                return;
+            }
+            for (const item of items) {
+                const row = document.createElement("li");
+                row.className = "list-group-item";
+                row.dataset.newsId = item.id;
+                const priority = document.createElement("span");
+                priority.className = "me-2";
+                priority.textContent = item.display_priority || "";
+                row.appendChild(priority);
+                if (item.symbol) {
+                    const symbol = document.createElement("strong");
+                    symbol.className = "me-2";
+                    symbol.textContent = item.symbol;
+                    row.appendChild(symbol);
+                }
+                row.appendChild(document.createTextNode(item.headline));
+                panel.appendChild(row);
+            }
+        }
+
+        async function refreshNews(payload) {
+            const panel = document.getElementById("stock_news_panel");
+            if (!panel) {
+                return;
+            }
+            if (refreshing) {
+                // Refetch once more after the running request, it may predate this update
+                pending = true;
+                return;
+            }
+            refreshing = true;
+            try {
+                renderNews(panel, await rpc("/market/news/feed", {}));
+            } catch (error) {
+                console.warn("Failed to refresh market news:", error);
+            } finally {
+                refreshing = false;
+            }
+            const notifications = window.stockPortal && window.stockPortal.notifications;
+            if (notifications && payload.published && payload.published.length) {
+                notifications.show(`${payload.published.length} new market news`, "info");
+            }
+            if (pending) {
+                pending = false;
+                refreshNews({});
+            }
+        }
+
+        bus_service.subscribe("stock_news/updated", refreshNews);
+        bus_service.start();
+    },
+};
+
+registry.category("services").add("stock_news_bus", stockNewsBusService);
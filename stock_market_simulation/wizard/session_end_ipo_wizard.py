@@ -2,6 +2,7 @@
 
 from odoo import models, fields, api
 from odoo.exceptions import UserError
+from ..models.stock_message_mixin import ENGINE_CONTEXT
 import logging
 
 _logger = logging.getLogger(__name__)
@@ -203,6 +204,7 @@ class SessionEndIpoWizard(models.TransientModel):
     
     def action_process(self):
         """Process the IPO status changes"""
+        self = self.with_context(**ENGINE_CONTEXT)
         _logger.info(f"Processing wizard with {len(self.line_ids)} lines")
 
         # Ensure lines are populated and consistent server-side